@@ -0,0 +1,134 @@
+from datetime import datetime
+
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth, TruncWeek
+from django.http import StreamingHttpResponse
+from rest_framework import permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet
+
+from portal.apps.analytics.models import UsageDailyRollup
+from portal.apps.analytics.rollups import SESSION_TOTALS_RESOURCE_TYPE
+from portal.apps.mixins.api.exports import stream_csv
+
+# constants
+SECONDS_PER_HOUR = 3600
+USAGE_GROUP_BY = {
+    'project': 'project_id',
+    'resource_type': 'resource_type',
+    'session_type': 'session_type'
+}
+USAGE_OUTPUT_FORMATS = ['csv', 'json']
+USAGE_PERIODS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth
+}
+
+
+def _int_param(name: str, value: str) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(
+            detail="{0}: must be an integer".format(name))
+
+
+def _parse_date(name: str, value: str):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError(
+            detail="{0}: must be a date formatted as YYYY-MM-DD".format(name))
+
+
+class UsageViewSet(GenericViewSet):
+    """
+    Testbed Usage Analytics
+    - usage
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    queryset = UsageDailyRollup.objects.all().order_by('usage_date')
+
+    def get_queryset(self):
+        queryset = UsageDailyRollup.objects.all()
+        start = self.request.query_params.get('start', None)
+        end = self.request.query_params.get('end', None)
+        project_id = self.request.query_params.get('project_id', None)
+        if start:
+            queryset = queryset.filter(usage_date__gte=_parse_date('start', start))
+        if end:
+            queryset = queryset.filter(usage_date__lte=_parse_date('end', end))
+        if project_id:
+            queryset = queryset.filter(project__id=_int_param('project_id', project_id))
+        return queryset
+
+    @action(detail=False, methods=['get'])
+    def usage(self, request, *args, **kwargs):
+        """
+        GET: testbed usage hours aggregated from the daily rollups
+        - period_start           - string
+        - project_id             - int (group_by=project)
+        - resource_hours         - float
+        - resource_type          - string (group_by=resource_type, session totals on the '' row)
+        - session_count          - int (session-days)
+        - session_hours          - float
+        - session_type           - string (group_by=session_type)
+
+        Parameters (optional):
+        - start, end             - YYYY-MM-DD (inclusive)
+        - group_by               - comma separated list of project, resource_type, session_type
+        - period                 - day, week (default), month
+        - project_id             - int
+        - output                 - json (default), csv
+
+        Permission:
+        - user is_operator
+        """
+        if not request.user.is_operator():
+            raise PermissionDenied(
+                detail="PermissionDenied: unable to GET /analytics/usage")
+        period = request.query_params.get('period', 'week')
+        if period not in USAGE_PERIODS:
+            raise ValidationError(
+                detail="period: valid choices are {0}".format(list(USAGE_PERIODS.keys())))
+        group_by = [g for g in request.query_params.get('group_by', '').split(',') if g]
+        if any(g not in USAGE_GROUP_BY for g in group_by):
+            raise ValidationError(
+                detail="group_by: valid choices are {0}".format(list(USAGE_GROUP_BY.keys())))
+        output = request.query_params.get('output', 'json')
+        if output not in USAGE_OUTPUT_FORMATS:
+            raise ValidationError(
+                detail="output: valid choices are {0}".format(USAGE_OUTPUT_FORMATS))
+        group_fields = [USAGE_GROUP_BY[g] for g in group_by]
+        # session totals and resource seconds are summed from their own rollup rows
+        session_rows = Q(resource_type=SESSION_TOTALS_RESOURCE_TYPE)
+        queryset = self.get_queryset().annotate(
+            period_start=USAGE_PERIODS[period]('usage_date')
+        ).values('period_start', *group_fields).annotate(
+            session_count=Coalesce(Sum('session_count', filter=session_rows), 0),
+            session_seconds=Coalesce(Sum('session_seconds', filter=session_rows), 0),
+            resource_seconds=Coalesce(Sum('resource_seconds', filter=~session_rows), 0)
+        ).order_by('period_start', *group_fields)
+        columns = ['period_start'] + group_fields + ['session_count', 'session_hours', 'resource_hours']
+
+        def rows():
+            for du in queryset.iterator():
+                row = {'period_start': str(du.get('period_start'))}
+                for field in group_fields:
+                    row[field] = du.get(field)
+                row['session_count'] = du.get('session_count')
+                row['session_hours'] = round(du.get('session_seconds') / SECONDS_PER_HOUR, 2)
+                row['resource_hours'] = round(du.get('resource_seconds') / SECONDS_PER_HOUR, 2)
+                yield row
+
+        if output == 'csv':
+            response = StreamingHttpResponse(
+                stream_csv(columns, ([row.get(c) for c in columns] for row in rows())),
+                content_type='text/csv'
+            )
+            response['Content-Disposition'] = 'attachment; filename="usage-{0}.csv"'.format(period)
+            return response
+        return Response(list(rows()))
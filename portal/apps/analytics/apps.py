@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class AnalyticsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'portal.apps.analytics'
+
+    def ready(self):
+        from portal.apps.analytics import signals  # noqa: F401
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from portal.apps.analytics.rollups import refresh_usage_rollups
+
+
+class Command(BaseCommand):
+    help = 'Refresh the materialized daily usage rollups from experiment sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='rebuild all rollups instead of changed days only')
+
+    def handle(self, *args, **options):
+        written = refresh_usage_rollups(full=options.get('full'))
+        self.stdout.write('refresh_usage_rollups: {0} rollup rows written'.format(written))
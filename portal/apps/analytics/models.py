@@ -0,0 +1,70 @@
+from django.db import models
+
+from portal.apps.experiments.models import ExperimentSession
+from portal.apps.mixins.models import BaseModel, BaseTimestampModel
+from portal.apps.projects.models import AerpawProject
+from portal.apps.resources.models import AerpawResource
+
+
+class UsageDailyRollup(BaseModel, BaseTimestampModel, models.Model):
+    """
+    Usage Daily Rollup (materialized from ExperimentSession)
+    - archived
+    - created (from BaseTimestampModel)
+    - id (from Basemodel)
+    - modified (from BaseTimestampModel)
+    - project
+    - resource_seconds
+    - resource_type
+    - session_count
+    - session_seconds
+    - session_type
+    - usage_date
+    """
+
+    project = models.ForeignKey(
+        AerpawProject,
+        related_name='usage_rollup_project',
+        on_delete=models.PROTECT
+    )
+    # blank resource_type: session_count / session_seconds of all sessions (counted once per session),
+    # rows of a resource type only hold the resource_seconds of that type
+    resource_type = models.CharField(
+        max_length=255,
+        choices=AerpawResource.ResourceType.choices,
+        blank=True
+    )
+    # usage of archived sessions: kept by refreshes, which only recompute rows of live sessions
+    archived = models.BooleanField(default=False)
+    resource_seconds = models.BigIntegerField(default=0)
+    session_count = models.IntegerField(default=0)
+    session_seconds = models.BigIntegerField(default=0)
+    session_type = models.CharField(
+        max_length=255,
+        choices=ExperimentSession.SessionType.choices
+    )
+    usage_date = models.DateField()
+
+    class Meta:
+        verbose_name = 'Usage Daily Rollup'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['usage_date', 'project', 'resource_type', 'session_type', 'archived'],
+                name='unique_usage_daily_rollup'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['usage_date', 'project']),
+        ]
+
+
+class UsageRollupCheckpoint(BaseModel, BaseTimestampModel, models.Model):
+    """
+    Usage Rollup Checkpoint (single row)
+    - created (from BaseTimestampModel)
+    - id (from Basemodel)
+    - last_refresh
+    - modified (from BaseTimestampModel)
+    """
+
+    last_refresh = models.DateTimeField(blank=True, null=True)
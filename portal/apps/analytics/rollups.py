@@ -0,0 +1,186 @@
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from portal.apps.analytics.models import UsageDailyRollup, UsageRollupCheckpoint
+from portal.apps.experiments.models import AerpawExperiment, ExperimentSession
+
+# constants
+ROLLUP_BATCH_SIZE = 1000
+ROLLUP_CHUNK_SIZE = 2000
+SESSION_TOTALS_RESOURCE_TYPE = ''
+
+
+def _split_by_day(start: datetime, end: datetime):
+    """
+    yield (local date, seconds) for each calendar day covered by [start, end)
+    """
+    start = timezone.localtime(start)
+    end = timezone.localtime(end)
+    while start < end:
+        next_midnight = timezone.make_aware(
+            datetime.combine(start.date() + timedelta(days=1), time.min), start.tzinfo)
+        day_end = min(next_midnight, end)
+        yield start.date(), int((day_end - start).total_seconds())
+        start = day_end
+
+
+def _day_bounds(days: set) -> (datetime, datetime):
+    tz = timezone.get_current_timezone()
+    range_start = timezone.make_aware(datetime.combine(min(days), time.min), tz)
+    range_end = timezone.make_aware(datetime.combine(max(days) + timedelta(days=1), time.min), tz)
+    return range_start, range_end
+
+
+def _experiment_resource_types(experiment_ids: set) -> dict:
+    """
+    experiment_id -> Counter of resource_type, in a single query
+    """
+    resource_types = defaultdict(Counter)
+    rows = AerpawExperiment.resources.through.objects.filter(
+        aerpawexperiment_id__in=experiment_ids
+    ).values_list('aerpawexperiment_id', 'aerpawresource__resource_type')
+    for experiment_id, resource_type in rows:
+        resource_types[experiment_id][resource_type] += 1
+    return resource_types
+
+
+def session_days(session: ExperimentSession, now: datetime = None) -> set:
+    """
+    calendar days touched by a session (open sessions count up to now)
+    """
+    end = session.end_date_time or now or timezone.now()
+    return {day for day, _ in _split_by_day(session.created, end)}
+
+
+def _session_rows(sessions) -> list:
+    return list(sessions.values_list(
+        'created', 'end_date_time', 'experiment_id', 'experiment__project_id', 'session_type'
+    ).iterator(chunk_size=ROLLUP_CHUNK_SIZE))
+
+
+def _usage_totals(sessions: list, days: set = None, now: datetime = None) -> dict:
+    """
+    (usage_date, project_id, resource_type, session_type) -> [session_count, session_seconds, resource_seconds]
+    - session totals are only kept on the SESSION_TOTALS_RESOURCE_TYPE row, counted once per session
+    - resource seconds are kept per resource type
+    """
+    resource_types = _experiment_resource_types({s[2] for s in sessions})
+    totals = defaultdict(lambda: [0, 0, 0])
+    for created, end_date_time, experiment_id, project_id, session_type in sessions:
+        counts = resource_types.get(experiment_id) or Counter()
+        for day, seconds in _split_by_day(created, end_date_time or now):
+            if days is not None and day not in days:
+                continue
+            total = totals[(day, project_id, SESSION_TOTALS_RESOURCE_TYPE, session_type)]
+            total[0] += 1
+            total[1] += seconds
+            for resource_type, resource_count in counts.items():
+                totals[(day, project_id, resource_type, session_type)][2] += seconds * resource_count
+    return totals
+
+
+def refresh_usage_days(days: set = None, now: datetime = None) -> int:
+    """
+    recompute the daily rollups for the given days (None = all days)
+    - rows of archived sessions (archived=True) are kept, there are no sessions left to recompute them
+    - returns the number of rollup rows written
+    """
+    now = now or timezone.now()
+    sessions = ExperimentSession.objects.all()
+    if days is not None:
+        if not days:
+            return 0
+        range_start, range_end = _day_bounds(days)
+        sessions = sessions.filter(
+            Q(created__lt=range_end) & (Q(end_date_time__isnull=True) | Q(end_date_time__gt=range_start))
+        )
+    totals = _usage_totals(_session_rows(sessions), days, now)
+    rollups = [
+        UsageDailyRollup(
+            usage_date=day,
+            project_id=project_id,
+            resource_type=resource_type,
+            session_type=session_type,
+            session_count=total[0],
+            session_seconds=total[1],
+            resource_seconds=total[2]
+        ) for (day, project_id, resource_type, session_type), total in totals.items()
+    ]
+    with transaction.atomic():
+        if days is None:
+            UsageDailyRollup.objects.filter(archived=False).delete()
+        else:
+            UsageDailyRollup.objects.filter(archived=False, usage_date__in=days).delete()
+        UsageDailyRollup.objects.bulk_create(rollups, batch_size=ROLLUP_BATCH_SIZE)
+    return len(rollups)
+
+
+def archive_experiment_usage(experiment_ids: [int], now: datetime = None) -> set:
+    """
+    add the usage of the sessions of experiments about to be archived to the archived rollup rows
+    - call before the sessions and resource links are archived, in the same transaction
+    - returns the days covered: refresh them once the sessions are archived (no longer counted twice)
+    """
+    now = now or timezone.now()
+    totals = _usage_totals(_session_rows(ExperimentSession.objects.filter(experiment_id__in=experiment_ids)), now=now)
+    if not totals:
+        return set()
+    existing = {
+        (r.usage_date, r.project_id, r.resource_type, r.session_type): r
+        for r in UsageDailyRollup.objects.filter(
+            archived=True, usage_date__in={key[0] for key in totals}, project_id__in={key[1] for key in totals})
+    }
+    created, updated = [], []
+    for (day, project_id, resource_type, session_type), total in totals.items():
+        rollup = existing.get((day, project_id, resource_type, session_type))
+        if rollup is None:
+            created.append(UsageDailyRollup(
+                archived=True,
+                usage_date=day,
+                project_id=project_id,
+                resource_type=resource_type,
+                session_type=session_type,
+                session_count=total[0],
+                session_seconds=total[1],
+                resource_seconds=total[2]
+            ))
+        else:
+            rollup.session_count += total[0]
+            rollup.session_seconds += total[1]
+            rollup.resource_seconds += total[2]
+            updated.append(rollup)
+    UsageDailyRollup.objects.bulk_create(created, batch_size=ROLLUP_BATCH_SIZE)
+    UsageDailyRollup.objects.bulk_update(
+        updated, ['session_count', 'session_seconds', 'resource_seconds'], batch_size=ROLLUP_BATCH_SIZE)
+    return {key[0] for key in totals}
+
+
+def refresh_usage_rollups(full: bool = False) -> int:
+    """
+    incremental refresh: only days touched by sessions modified since the last
+    refresh, and the days since the last refresh of sessions still open, are recomputed
+    - returns the number of rollup rows written
+    """
+    now = timezone.now()
+    checkpoint, _ = UsageRollupCheckpoint.objects.get_or_create(pk=1)
+    if full or checkpoint.last_refresh is None:
+        written = refresh_usage_days(None, now=now)
+    else:
+        changed = ExperimentSession.objects.filter(
+            Q(modified__gte=checkpoint.last_refresh) | Q(end_date_time__isnull=True)
+        ).only('created', 'end_date_time', 'modified')
+        days = set()
+        for session in changed.iterator(chunk_size=ROLLUP_CHUNK_SIZE):
+            if session.end_date_time is None and session.modified < checkpoint.last_refresh:
+                # unchanged open session: only the days since the last refresh grew
+                days |= {day for day, _ in _split_by_day(max(session.created, checkpoint.last_refresh), now)}
+            else:
+                days |= session_days(session, now=now)
+        written = refresh_usage_days(days, now=now)
+    checkpoint.last_refresh = now
+    checkpoint.save()
+    return written
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from portal.apps.analytics.rollups import session_days
+from portal.apps.analytics.tasks import refresh_usage_days_task
+from portal.apps.experiments.models import ExperimentSession
+
+
+@receiver(post_save, sender=ExperimentSession)
+def refresh_rollups_on_session_close(sender, instance, **kwargs):
+    """
+    closed sessions update the rollups for the days they covered (background task, once per close)
+    """
+    if instance.end_date_time:
+        refresh_usage_days_task.enqueue(
+            {'days': sorted(day.isoformat() for day in session_days(instance))},
+            idempotency_key='usage-rollups:session:{0}:{1}'.format(instance.pk, instance.end_date_time.isoformat())
+        )
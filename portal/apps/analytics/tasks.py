@@ -0,0 +1,12 @@
+from datetime import date
+
+from portal.apps.analytics.rollups import refresh_usage_days
+from portal.apps.tasks.queue import task
+
+
+@task(queue='rollups', max_attempts=5)
+def refresh_usage_days_task(days: list):
+    """
+    recompute the daily rollups of the given days (ISO dates)
+    """
+    refresh_usage_days({date.fromisoformat(day) for day in days})
@@ -0,0 +1 @@
+# Create your tests here.
@@ -0,0 +1,128 @@
+from datetime import datetime
+
+from rest_framework import permissions
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet
+
+from portal.apps.audit.models import AuditRecord
+
+# constants
+AUDIT_DEFAULT_LIMIT = 100
+AUDIT_MAX_LIMIT = 1000
+AUDIT_MODELS = {
+    'credentials': 'profiles.publiccredentials',
+    'experiment': 'experiments.aerpawexperiment',
+    'profile': 'profiles.aerpawuserprofile',
+    'project': 'projects.aerpawproject',
+    'resource': 'resources.aerpawresource',
+    'user': 'users.aerpawuser'
+}
+AUDIT_MODEL_NAMES = {label: name for name, label in AUDIT_MODELS.items()}
+
+
+def _int_param(name: str, value: str) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(
+            detail="{0}: must be an integer".format(name))
+
+
+def _parse_date(name: str, value: str):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError(
+            detail="{0}: must be a date formatted as YYYY-MM-DD".format(name))
+
+
+class AuditViewSet(GenericViewSet):
+    """
+    Audit History (field level changes of experiments, projects, resources, users, profiles)
+    - list
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    queryset = AuditRecord.objects.all().order_by('-id')
+    pagination_class = None
+
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = AuditRecord.objects.all()
+        model = params.get('model', None)
+        if model:
+            if model not in AUDIT_MODELS:
+                raise ValidationError(
+                    detail="model: valid choices are {0}".format(list(AUDIT_MODELS.keys())))
+            queryset = queryset.filter(model_label=AUDIT_MODELS.get(model))
+        if params.get('object_id', None):
+            if not model:
+                raise ValidationError(
+                    detail="object_id: requires model")
+            queryset = queryset.filter(object_id=_int_param('object_id', params.get('object_id')))
+        if params.get('changed_by', None):
+            queryset = queryset.filter(changed_by=params.get('changed_by'))
+        if params.get('field', None):
+            queryset = queryset.filter(changes__has_key=params.get('field'))
+        if params.get('request_id', None):
+            queryset = queryset.filter(request_id=params.get('request_id'))
+        if params.get('start', None):
+            queryset = queryset.filter(changed__date__gte=_parse_date('start', params.get('start')))
+        if params.get('end', None):
+            queryset = queryset.filter(changed__date__lte=_parse_date('end', params.get('end')))
+        if params.get('before', None):
+            queryset = queryset.filter(id__lt=_int_param('before', params.get('before')))
+        return queryset.order_by('-id')
+
+    def list(self, request, *args, **kwargs):
+        """
+        GET: audit records, newest first (keyset pages)
+        - next                   - int, `before` cursor of the next page (None on the last page)
+        - results                - array of records
+            - action             - string (created, updated, deleted)
+            - audit_id           - int
+            - changed_by         - string (username of the request user, modified_by for tasks / commands)
+            - changed_date       - string
+            - changes            - {field: [old, new]}
+            - model              - string
+            - object_id          - int
+            - request_id         - string
+
+        Parameters (optional):
+        - model                  - credentials, experiment, profile, project, resource, user
+        - object_id              - int (with model)
+        - field                  - records that changed this field
+        - changed_by             - username
+        - request_id             - X-Request-ID of the request that made the change
+        - start, end             - YYYY-MM-DD (inclusive)
+        - before                 - int, `next` of the previous page
+        - limit                  - int, records per page (default 100, at most 1000)
+
+        Permission:
+        - user is_operator
+        """
+        if not request.user.is_operator():
+            raise PermissionDenied(
+                detail="PermissionDenied: unable to GET /audit list")
+        limit = _int_param('limit', request.query_params.get('limit', AUDIT_DEFAULT_LIMIT))
+        if limit < 1 or limit > AUDIT_MAX_LIMIT:
+            raise ValidationError(
+                detail="limit: must be between 1 and {0}".format(AUDIT_MAX_LIMIT))
+        records = list(self.get_queryset()[:limit + 1])
+        has_more = len(records) > limit
+        records = records[:limit]
+        return Response({
+            'next': records[-1].id if has_more else None,
+            'results': [
+                {
+                    'action': r.action,
+                    'audit_id': r.id,
+                    'changed_by': r.changed_by,
+                    'changed_date': r.changed,
+                    'changes': r.changes,
+                    'model': AUDIT_MODEL_NAMES.get(r.model_label, r.model_label),
+                    'object_id': r.object_id,
+                    'request_id': r.request_id
+                } for r in records
+            ]
+        })
@@ -0,0 +1,170 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.utils import timezone
+
+from portal.apps.audit.models import AuditRecord
+from portal.server.logs import request_context
+
+# constants
+AUDIT_BATCH_SIZE = 500
+# bookkeeping and secrets, not part of the history
+AUDIT_EXCLUDED_FIELDS = {'created', 'created_by', 'last_login', 'modified', 'modified_by', 'password', 'token_version'}
+
+# per request buffer of audit records written by autocommit saves
+request_buffer = ContextVar('audit_request_buffer', default=None)
+# request being served, its authenticated user is recorded as changed_by
+current_request = ContextVar('audit_current_request', default=None)
+_audit_fields = {}
+
+
+def audit_fields(model) -> list:
+    """
+    concrete fields of model recorded in the history
+    """
+    fields = _audit_fields.get(model)
+    if fields is None:
+        fields = _audit_fields[model] = [
+            f for f in model._meta.concrete_fields if f.name not in AUDIT_EXCLUDED_FIELDS and not f.primary_key
+        ]
+    return fields
+
+
+def loaded_values(instance) -> dict:
+    return {f.attname: getattr(instance, f.attname) for f in type(instance)._meta.concrete_fields}
+
+
+def _actor(instance) -> str:
+    """
+    username of the authenticated request user
+    - outside requests (tasks, management commands) and before login: modified_by of the row
+    """
+    user = getattr(current_request.get(), 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.username
+    return getattr(instance, 'modified_by', '') or ''
+
+
+def _record(instance, action: str, changes: dict) -> AuditRecord:
+    context = request_context.get() or {}
+    return AuditRecord(
+        action=action,
+        changed=timezone.now(),
+        changed_by=_actor(instance),
+        changes=changes,
+        model_label=instance._meta.label_lower,
+        object_id=instance.pk,
+        request_id=context.get('request_id') or ''
+    )
+
+
+def diff(instance, created: bool, update_fields=None) -> dict:
+    """
+    {field: [old, new]} of the audited fields changed since the instance was loaded
+    - created: the fields set on the new row ([None, value])
+    """
+    fields = audit_fields(type(instance))
+    if update_fields:
+        fields = [f for f in fields if f.name in update_fields or f.attname in update_fields]
+    loaded = instance.__dict__.get('_loaded_values') or {}
+    changes = {}
+    for field in fields:
+        new = getattr(instance, field.attname)
+        if created:
+            if new not in (None, ''):
+                changes[field.name] = [None, new]
+        elif field.attname in loaded and loaded.get(field.attname) != new:
+            changes[field.name] = [loaded.get(field.attname), new]
+    return changes
+
+
+class AuditBatch:
+    """
+    on_commit callback writing the audit records of one transaction (savepoint level) at once
+    - registered with the savepoint ids so Django drops it with a rolled back savepoint
+    """
+
+    def __init__(self, using: str):
+        self.records = []
+        self.using = using
+
+    def __call__(self):
+        write_records(self.records, self.using)
+
+
+def write_records(records: list, using: str = None):
+    """
+    append records: to the request buffer when inside a request, otherwise in one bulk insert
+    """
+    if not records:
+        return
+    buffer = request_buffer.get()
+    if buffer is not None:
+        buffer.extend(records)
+    else:
+        AuditRecord.objects.using(using or 'default').bulk_create(records, batch_size=AUDIT_BATCH_SIZE)
+
+
+def enqueue(records: list, using: str = 'default'):
+    """
+    queue audit records until the current transaction (or request) is committed
+    """
+    if not records:
+        return
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        write_records(records, using)
+        return
+    savepoint_ids = set(connection.savepoint_ids)
+    for callback_savepoint_ids, callback, _ in connection.run_on_commit:
+        if isinstance(callback, AuditBatch) and callback_savepoint_ids == savepoint_ids:
+            callback.records.extend(records)
+            return
+    batch = AuditBatch(using)
+    batch.records.extend(records)
+    transaction.on_commit(batch, using=using)
+
+
+def audit_save(instance, created: bool, update_fields=None, using: str = 'default'):
+    changes = diff(instance, created, update_fields)
+    if created or changes:
+        action = AuditRecord.Action.CREATED if created else AuditRecord.Action.UPDATED
+        enqueue([_record(instance, action, changes)], using)
+    instance._loaded_values = loaded_values(instance)
+
+
+def audit_delete(instance, using: str = 'default'):
+    enqueue([_record(instance, AuditRecord.Action.DELETED, {})], using)
+
+
+def audit_instances(instances: list, created: bool, using: str = 'default'):
+    """
+    history of rows written with bulk_create / bulk_update (no model signals)
+    """
+    records = []
+    for instance in instances:
+        changes = diff(instance, created)
+        if created or changes:
+            action = AuditRecord.Action.CREATED if created else AuditRecord.Action.UPDATED
+            records.append(_record(instance, action, changes))
+        instance._loaded_values = loaded_values(instance)
+    enqueue(records, using)
+
+
+@contextmanager
+def buffered_request(request=None):
+    """
+    collect the audit records of a request and write them in one insert when it ends
+    - changed_by of the records is the request user (resolved when each record is made)
+    """
+    records = []
+    token = request_buffer.set(records)
+    request_token = current_request.set(request)
+    try:
+        yield records
+    finally:
+        current_request.reset(request_token)
+        request_buffer.reset(token)
+        if records:
+            AuditRecord.objects.bulk_create(records, batch_size=AUDIT_BATCH_SIZE)
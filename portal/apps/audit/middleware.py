@@ -0,0 +1,14 @@
+from portal.apps.audit.history import buffered_request
+
+
+class AuditMiddleware:
+    """
+    Write the audit records of a request in a single insert once the response is ready
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with buffered_request(request):
+            return self.get_response(request)
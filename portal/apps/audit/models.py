@@ -0,0 +1,38 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class AuditRecord(models.Model):
+    """
+    Audit Record (append only history of AuditModelMixin models)
+    - action
+    - changed
+    - changed_by
+    - changes                - {field: [old, new]}
+    - id
+    - model_label
+    - object_id
+    - request_id
+    """
+
+    class Action(models.TextChoices):
+        CREATED = 'created', 'Created'
+        UPDATED = 'updated', 'Updated'
+        DELETED = 'deleted', 'Deleted'
+
+    id = models.BigAutoField(primary_key=True)
+    action = models.CharField(max_length=16, choices=Action.choices)
+    changed = models.DateTimeField()
+    changed_by = models.CharField(max_length=255, blank=True)
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    model_label = models.CharField(max_length=255)
+    object_id = models.IntegerField()
+    request_id = models.CharField(max_length=64, blank=True)
+
+    class Meta:
+        verbose_name = 'Audit Record'
+        indexes = [
+            models.Index(fields=['model_label', 'object_id', '-id']),
+            models.Index(fields=['changed_by', '-id']),
+            models.Index(fields=['changed'])
+        ]
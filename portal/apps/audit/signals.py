@@ -0,0 +1,33 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from portal.apps.audit.history import audit_delete, audit_fields, audit_save
+from portal.apps.mixins.models import AuditModelMixin
+
+
+def load_previous_values(sender, instance, raw=False, using=None, **kwargs):
+    """
+    instances that were not loaded from the database (e.g. built with a primary key) are read once
+    """
+    if raw or instance.pk is None or '_loaded_values' in instance.__dict__:
+        return
+    fields = [f.attname for f in audit_fields(sender)]
+    values = sender._base_manager.using(using).filter(pk=instance.pk).values(*fields).first()
+    if values is not None:
+        instance._loaded_values = values
+
+
+def record_save(sender, instance, created, raw=False, using=None, update_fields=None, **kwargs):
+    if not raw:
+        audit_save(instance, created, update_fields, using)
+
+
+def record_delete(sender, instance, using=None, **kwargs):
+    audit_delete(instance, using)
+
+
+for model in apps.get_models():
+    if issubclass(model, AuditModelMixin):
+        pre_save.connect(load_previous_values, sender=model, dispatch_uid='audit_pre_save_{0}'.format(model._meta.label))
+        post_save.connect(record_save, sender=model, dispatch_uid='audit_post_save_{0}'.format(model._meta.label))
+        post_delete.connect(record_delete, sender=model, dispatch_uid='audit_post_delete_{0}'.format(model._meta.label))
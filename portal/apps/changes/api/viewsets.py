@@ -0,0 +1,129 @@
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework import permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet
+
+from portal.apps.changes.feed import CHANGE_FEED_MAX_LIMIT, changes_since, cursor_expired, head_cursor
+from portal.apps.changes.models import ChangeEvent
+from portal.apps.changes.stream import SlotStream, change_stream, stream_slots
+from portal.server.renderers import EventStreamRenderer, FastJSONRenderer
+
+# constants
+CHANGE_FEED_DEFAULT_LIMIT = 100
+CHANGE_STREAM_RETRY_AFTER_SECONDS = 30
+
+
+def _int_param(name: str, value: str, minimum: int) -> int:
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(
+            detail="{0}: must be an integer".format(name))
+    if value < minimum:
+        raise ValidationError(
+            detail="{0}: must be at least {1}".format(name, minimum))
+    return value
+
+
+def _object_types_param(value: str) -> list:
+    object_types = [t for t in value.split(',') if t]
+    if any(t not in ChangeEvent.ObjectType.values for t in object_types):
+        raise ValidationError(
+            detail="types: valid choices are {0}".format(ChangeEvent.ObjectType.values))
+    return object_types
+
+
+class ChangeViewSet(GenericViewSet):
+    """
+    Change Feed (incremental sync)
+    - list
+    - stream
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    queryset = ChangeEvent.objects.all().order_by('id')
+    pagination_class = None
+
+    def list(self, request, *args, **kwargs):
+        """
+        GET: change events after the `since` cursor, in order
+        - cursor                 - int (pass as `since` on the next request)
+        - has_more               - bool (request again right away when True)
+        - results                - array of events
+            - action             - string (created, updated, deleted)
+            - change_id          - int
+            - changed_date       - string
+            - object_id          - int
+            - object_type        - string (experiment, project, resource, session)
+
+        Parameters:
+        - since (optional)       - int, cursor of the previous response; when absent only the
+                                   current cursor is returned (list the objects, then sync from it)
+        - limit (optional)       - int, events per response (default 100, at most 1000)
+        - types (optional)       - comma separated list of object types
+
+        Permission:
+        - user is_operator: all events
+        - user: resources, visible projects, experiments / sessions of the user's projects
+        """
+        limit = _int_param('limit', request.query_params.get('limit', CHANGE_FEED_DEFAULT_LIMIT), 1)
+        if limit > CHANGE_FEED_MAX_LIMIT:
+            raise ValidationError(
+                detail="limit: must be at most {0}".format(CHANGE_FEED_MAX_LIMIT))
+        object_types = _object_types_param(request.query_params.get('types', ''))
+        since = request.query_params.get('since', None)
+        if since is None:
+            return Response({'cursor': head_cursor(), 'has_more': False, 'results': []})
+        since = _int_param('since', since, 0)
+        if cursor_expired(since):
+            raise ValidationError(
+                detail="since: cursor has expired, list the objects again and sync from a new cursor")
+        return Response(changes_since(request.user, since, limit, object_types))
+
+    @action(detail=False, methods=['get'], renderer_classes=[EventStreamRenderer, FastJSONRenderer])
+    def stream(self, request, *args, **kwargs):
+        """
+        GET: server-sent events (text/event-stream) of the change feed, pushed as they are committed
+        - id                     - int (change feed cursor)
+        - event                  - string (experiment, project, resource, session, reset)
+        - data                   - change event as in list, plus the current object fields
+            - experiment: experiment_id, experiment_state, is_retired, modified_date
+            - session: end_date_time, experiment_id, session_type, start_date_time
+            - resource: is_active, name, resource_mode
+
+        Parameters (optional):
+        - since / Last-Event-ID  - int, cursor to resume from (default: only new events)
+        - types                  - comma separated list of object types
+        - experiment_id          - int, experiment and session events of one experiment only
+
+        Permission:
+        - as list
+
+        503 when CHANGE_STREAM_MAX_CONNECTIONS streams are already open in this process
+        """
+        object_types = _object_types_param(request.query_params.get('types', ''))
+        since = request.META.get('HTTP_LAST_EVENT_ID') or request.query_params.get('since', None)
+        if since is not None:
+            since = _int_param('since', since, 0)
+        experiment_id = request.query_params.get('experiment_id', None)
+        if experiment_id is not None:
+            experiment_id = _int_param('experiment_id', experiment_id, 1)
+            object_types = [t for t in object_types or ChangeEvent.ObjectType.values
+                            if t in [ChangeEvent.ObjectType.EXPERIMENT, ChangeEvent.ObjectType.SESSION]]
+            if not object_types:
+                raise ValidationError(
+                    detail="types: experiment_id streams experiment and session events only")
+        if not stream_slots.acquire():
+            response = HttpResponse('too many open change streams, use /api/changes', status=503,
+                                    content_type='text/plain')
+            response['Retry-After'] = CHANGE_STREAM_RETRY_AFTER_SECONDS
+            return response
+        response = StreamingHttpResponse(
+            SlotStream(change_stream(request.user, since, object_types, experiment_id)),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # nginx: pass events through as they are written
+        response['X-Accel-Buffering'] = 'no'
+        return response
@@ -0,0 +1,90 @@
+import logging
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, connections
+
+logger = logging.getLogger(__name__)
+
+# constants
+CHANGE_NOTIFY_CHANNEL = 'portal_changes'
+LISTENER_RETRY_SECONDS = 5
+
+
+class ChangeBroker:
+    """
+    In process wake up of change streams waiting for new change events
+    - publish(cursor): a change event up to `cursor` has been committed
+    - wait(cursor, timeout): block until a cursor after `cursor` is published (True) or timeout (False)
+    - on PostgreSQL a listener thread publishes the NOTIFY of every process, elsewhere only the
+      changes of this process are published and streams fall back to polling the change table
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.latest = 0
+        self.listener = None
+
+    def publish(self, cursor: int):
+        with self.condition:
+            if cursor > self.latest:
+                self.latest = cursor
+                self.condition.notify_all()
+
+    def wait(self, cursor: int, timeout: float) -> bool:
+        with self.condition:
+            return self.condition.wait_for(lambda: self.latest > cursor, timeout=timeout)
+
+    def ensure_listener(self):
+        if not pg_notify_enabled():
+            return
+        with self.condition:
+            if self.listener is None or not self.listener.is_alive():
+                self.listener = threading.Thread(target=self._listen, name='change-listener', daemon=True)
+                self.listener.start()
+
+    def _listen(self):
+        """
+        LISTEN on a dedicated connection (never returned to the request threads)
+        """
+        while True:
+            conn = None
+            try:
+                conn = connections['default'].get_new_connection(connections['default'].get_connection_params())
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute('LISTEN {0}'.format(CHANGE_NOTIFY_CHANNEL))
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    cursors = [int(n.payload) for n in conn.notifies if n.payload.isdigit()]
+                    conn.notifies.clear()
+                    if cursors:
+                        self.publish(max(cursors))
+            except Exception as exc:
+                logger.warning('change listener: %s, reconnecting in %ds', exc, LISTENER_RETRY_SECONDS)
+                time.sleep(LISTENER_RETRY_SECONDS)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+broker = ChangeBroker()
+
+
+def pg_notify_enabled() -> bool:
+    return connection.vendor == 'postgresql' and getattr(settings, 'CHANGE_STREAM_PG_NOTIFY', True)
+
+
+def notify_changes(cursor: int):
+    """
+    wake up the change streams of every process (PostgreSQL NOTIFY) or of this process
+    """
+    if pg_notify_enabled():
+        with connection.cursor() as cursor_:
+            cursor_.execute('SELECT pg_notify(%s, %s)', [CHANGE_NOTIFY_CHANNEL, str(cursor)])
+    else:
+        broker.publish(cursor)
@@ -0,0 +1,127 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from portal.apps.changes.broker import notify_changes
+from portal.apps.changes.models import ChangeEvent
+from portal.apps.projects.models import AerpawProject, UserProject
+
+# constants
+CHANGE_FEED_MAX_LIMIT = 1000
+CHANGE_FEED_PRUNE_BATCH_SIZE = 5000
+CHANGE_FEED_RETENTION_DAYS = 30
+
+
+def record_changes(events: list) -> None:
+    """
+    append (object_type, object_id, action, project_id) events once the current transaction commits
+    - rolled back changes are never published
+    """
+    if not events:
+        return
+    rows = [
+        ChangeEvent(object_type=object_type, object_id=object_id, action=action, project_id=project_id)
+        for object_type, object_id, action, project_id in events
+    ]
+    transaction.on_commit(lambda: _publish(rows))
+
+
+def _publish(rows: list) -> None:
+    ChangeEvent.objects.bulk_create(rows)
+    cursors = [row.id for row in rows if row.id]
+    if cursors:
+        notify_changes(max(cursors))
+
+
+def record_change(object_type: str, object_id: int, action: str, project_id: int = None) -> None:
+    record_changes([(object_type, object_id, action, project_id)])
+
+
+def visible_changes(user):
+    """
+    change events of objects the user can list
+    - operators: all events
+    - resources: all users
+    - projects: public projects and projects the user is a member / creator of
+    - experiments, sessions: projects the user is a member / creator of
+    """
+    if user.is_operator():
+        return ChangeEvent.objects.all()
+    member_projects = list(UserProject.objects.filter(user_id=user.id).values_list('project_id', flat=True)) + \
+        list(AerpawProject.objects.filter(project_creator_id=user.id).values_list('id', flat=True))
+    public_projects = AerpawProject.all_objects.filter(is_public=True).values('id')
+    return ChangeEvent.objects.filter(
+        Q(object_type=ChangeEvent.ObjectType.RESOURCE) |
+        Q(object_type=ChangeEvent.ObjectType.PROJECT, project_id__in=public_projects) |
+        Q(project_id__in=member_projects)
+    )
+
+
+def head_cursor() -> int:
+    """
+    latest published cursor: events younger than CHANGE_FEED_SETTLE_SECONDS are held back so that
+    ids allocated by transactions that commit out of order are never skipped
+    """
+    settled = timezone.now() - timedelta(seconds=getattr(settings, 'CHANGE_FEED_SETTLE_SECONDS', 1))
+    return ChangeEvent.objects.filter(created__lte=settled).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def cursor_expired(since: int) -> bool:
+    """
+    True when events after `since` have been pruned
+    """
+    oldest = ChangeEvent.objects.order_by('id').values_list('id', flat=True).first()
+    return since > 0 and oldest is not None and since < oldest - 1
+
+
+def changes_since(user, since: int, limit: int, object_types: list = None) -> dict:
+    """
+    keyset page of the events after `since` visible to the user (in cursor order)
+    - cursor: resume point for the next request, advanced past events the user can not see
+    - has_more: True when more events are already available
+    """
+    head = head_cursor()
+    queryset = visible_changes(user).filter(id__gt=since, id__lte=head)
+    if object_types:
+        queryset = queryset.filter(object_type__in=object_types)
+    events = list(queryset.order_by('id').values(
+        'id', 'action', 'created', 'object_id', 'object_type')[:limit + 1])
+    has_more = len(events) > limit
+    events = events[:limit]
+    if has_more:
+        cursor = events[-1].get('id')
+    else:
+        cursor = max(since, head)
+    return {
+        'cursor': cursor,
+        'has_more': has_more,
+        'results': [
+            {
+                'action': e.get('action'),
+                'change_id': e.get('id'),
+                'changed_date': e.get('created'),
+                'object_id': e.get('object_id'),
+                'object_type': e.get('object_type')
+            } for e in events
+        ]
+    }
+
+
+def prune_changes(days: int = CHANGE_FEED_RETENTION_DAYS, batch_size: int = CHANGE_FEED_PRUNE_BATCH_SIZE) -> int:
+    """
+    delete events older than `days` in id ranges of batch_size, returns the number of events deleted
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    last_id = ChangeEvent.objects.filter(created__lt=cutoff).order_by('-id').values_list('id', flat=True).first()
+    if last_id is None:
+        return 0
+    deleted = 0
+    first_id = ChangeEvent.objects.order_by('id').values_list('id', flat=True).first()
+    while first_id is not None and first_id <= last_id:
+        count, _ = ChangeEvent.objects.filter(id__gte=first_id, id__lt=min(first_id + batch_size, last_id + 1)).delete()
+        deleted += count
+        first_id += batch_size
+    return deleted
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from portal.apps.changes.feed import CHANGE_FEED_PRUNE_BATCH_SIZE, CHANGE_FEED_RETENTION_DAYS, prune_changes
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed events older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=CHANGE_FEED_RETENTION_DAYS,
+                            help='delete events older than this many days')
+        parser.add_argument('--batch-size', type=int, default=CHANGE_FEED_PRUNE_BATCH_SIZE,
+                            help='event ids deleted per statement')
+
+    def handle(self, *args, **options):
+        deleted = prune_changes(days=options.get('days'), batch_size=options.get('batch_size'))
+        self.stdout.write('prune_changes: {0} events deleted'.format(deleted))
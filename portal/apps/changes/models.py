@@ -0,0 +1,35 @@
+from django.db import models
+
+
+class ChangeEvent(models.Model):
+    """
+    Change Event (append only change log, the id is the change feed cursor)
+    - action
+    - created
+    - id
+    - object_id
+    - object_type
+    - project_id
+    """
+
+    class Action(models.TextChoices):
+        CREATED = 'created', 'Created'
+        UPDATED = 'updated', 'Updated'
+        DELETED = 'deleted', 'Deleted'
+
+    class ObjectType(models.TextChoices):
+        EXPERIMENT = 'experiment', 'Experiment'
+        PROJECT = 'project', 'Project'
+        RESOURCE = 'resource', 'Resource'
+        SESSION = 'session', 'Session'
+
+    id = models.BigAutoField(primary_key=True)
+    action = models.CharField(max_length=16, choices=Action.choices)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    object_id = models.IntegerField()
+    object_type = models.CharField(max_length=32, choices=ObjectType.choices)
+    # plain ids (no foreign keys): events outlive the rows they describe
+    project_id = models.IntegerField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Change Event'
@@ -0,0 +1,126 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from portal.apps.changes.feed import record_change, record_changes
+from portal.apps.changes.models import ChangeEvent
+from portal.apps.experiments.models import AerpawExperiment, CanonicalExperimentResource, ExperimentSession, \
+    UserExperiment
+from portal.apps.projects.models import AerpawProject, UserProject
+from portal.apps.resources.models import AerpawResource
+
+# constants
+M2M_ACTIONS = ['post_add', 'post_remove', 'post_clear']
+
+
+def _save_action(instance, created: bool) -> str:
+    if getattr(instance, 'is_deleted', False):
+        return ChangeEvent.Action.DELETED
+    return ChangeEvent.Action.CREATED if created else ChangeEvent.Action.UPDATED
+
+
+def _live_experiment_project(experiment_id: int):
+    """
+    project id of a live experiment, None when the experiment is (soft) deleted
+    - changes to the children of deleted experiments (archival) are not published
+    """
+    return AerpawExperiment.objects.filter(pk=experiment_id).values_list('project_id', flat=True).first()
+
+
+def _experiment_updated(experiment_id: int):
+    project_id = _live_experiment_project(experiment_id)
+    if project_id is not None:
+        record_change(ChangeEvent.ObjectType.EXPERIMENT, experiment_id, ChangeEvent.Action.UPDATED, project_id)
+
+
+def _project_updated(project_id: int):
+    if AerpawProject.objects.filter(pk=project_id).exists():
+        record_change(ChangeEvent.ObjectType.PROJECT, project_id, ChangeEvent.Action.UPDATED, project_id)
+
+
+@receiver(post_save, sender=AerpawExperiment)
+def experiment_saved(sender, instance, created, **kwargs):
+    record_change(ChangeEvent.ObjectType.EXPERIMENT, instance.id, _save_action(instance, created), instance.project_id)
+
+
+@receiver(post_save, sender=AerpawProject)
+def project_saved(sender, instance, created, **kwargs):
+    record_change(ChangeEvent.ObjectType.PROJECT, instance.id, _save_action(instance, created), instance.id)
+
+
+@receiver(post_save, sender=AerpawResource)
+def resource_saved(sender, instance, created, **kwargs):
+    record_change(ChangeEvent.ObjectType.RESOURCE, instance.id, _save_action(instance, created))
+
+
+@receiver(post_delete, sender=AerpawExperiment)
+@receiver(post_delete, sender=AerpawProject)
+@receiver(post_delete, sender=AerpawResource)
+def object_deleted(sender, instance, **kwargs):
+    # soft deleted rows were published when they were flagged
+    if instance.is_deleted:
+        return
+    object_type = {
+        AerpawExperiment: ChangeEvent.ObjectType.EXPERIMENT,
+        AerpawProject: ChangeEvent.ObjectType.PROJECT,
+        AerpawResource: ChangeEvent.ObjectType.RESOURCE
+    }.get(sender)
+    project_id = getattr(instance, 'project_id', instance.id if sender is AerpawProject else None)
+    record_change(object_type, instance.id, ChangeEvent.Action.DELETED, project_id)
+
+
+@receiver(post_save, sender=ExperimentSession)
+def session_saved(sender, instance, created, **kwargs):
+    project_id = _live_experiment_project(instance.experiment_id)
+    if project_id is not None:
+        record_change(ChangeEvent.ObjectType.SESSION, instance.id, _save_action(instance, created), project_id)
+
+
+@receiver(post_delete, sender=ExperimentSession)
+def session_deleted(sender, instance, **kwargs):
+    project_id = _live_experiment_project(instance.experiment_id)
+    if project_id is not None:
+        record_change(ChangeEvent.ObjectType.SESSION, instance.id, ChangeEvent.Action.DELETED, project_id)
+
+
+@receiver(post_save, sender=CanonicalExperimentResource)
+@receiver(post_delete, sender=CanonicalExperimentResource)
+@receiver(post_save, sender=UserExperiment)
+@receiver(post_delete, sender=UserExperiment)
+def experiment_child_changed(sender, instance, **kwargs):
+    """
+    membership and resource definitions are part of the experiment
+    """
+    _experiment_updated(instance.experiment_id)
+
+
+@receiver(post_save, sender=UserProject)
+@receiver(post_delete, sender=UserProject)
+def project_membership_changed(sender, instance, **kwargs):
+    _project_updated(instance.project_id)
+
+
+@receiver(m2m_changed, sender=AerpawExperiment.resources.through)
+@receiver(m2m_changed, sender=AerpawExperiment.experiment_membership.through)
+def experiment_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in M2M_ACTIONS:
+        return
+    if not reverse:
+        _experiment_updated(instance.id)
+        return
+    # resource.experiment_resources / user.experiment_membership: pk_set holds experiments
+    experiments = AerpawExperiment.objects.filter(pk__in=pk_set or []).values_list('id', 'project_id')
+    record_changes([
+        (ChangeEvent.ObjectType.EXPERIMENT, experiment_id, ChangeEvent.Action.UPDATED, project_id)
+        for experiment_id, project_id in experiments
+    ])
+
+
+@receiver(m2m_changed, sender=AerpawProject.project_membership.through)
+def project_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in M2M_ACTIONS:
+        return
+    project_ids = list(pk_set or []) if reverse else [instance.id]
+    record_changes([
+        (ChangeEvent.ObjectType.PROJECT, project_id, ChangeEvent.Action.UPDATED, project_id)
+        for project_id in AerpawProject.objects.filter(pk__in=project_ids).values_list('id', flat=True)
+    ])
@@ -0,0 +1,166 @@
+import threading
+import time
+
+from django.conf import settings
+
+from portal.apps.changes.broker import broker, pg_notify_enabled
+from portal.apps.changes.feed import CHANGE_FEED_MAX_LIMIT, changes_since, cursor_expired, head_cursor
+from portal.apps.changes.models import ChangeEvent
+from portal.apps.experiments.models import AerpawExperiment, ExperimentSession
+from portal.apps.resources.models import AerpawResource
+from portal.server.renderers import FastJSONRenderer
+
+# constants
+STREAM_RETRY_MS = 3000
+_renderer = FastJSONRenderer()
+
+
+class StreamSlots:
+    """
+    Open change streams of this process, each holds a worker thread (sync WSGI) until it closes
+    - acquire(): take a slot, False when CHANGE_STREAM_MAX_CONNECTIONS are open
+    - release(): give the slot back
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.open = 0
+
+    def acquire(self) -> bool:
+        with self.lock:
+            if self.open >= getattr(settings, 'CHANGE_STREAM_MAX_CONNECTIONS', 10):
+                return False
+            self.open += 1
+            return True
+
+    def release(self):
+        with self.lock:
+            self.open = max(self.open - 1, 0)
+
+
+stream_slots = StreamSlots()
+
+
+class SlotStream:
+    """
+    Iterates a change stream holding a stream slot, released when the response is closed
+    (also when the stream was never iterated)
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.stream)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.stream.close()
+        finally:
+            stream_slots.release()
+
+
+def _object_fields(events: list) -> dict:
+    """
+    current fields of the changed objects, one query per object type
+    - {(object_type, object_id): {...}}
+    """
+    ids = {}
+    for event in events:
+        ids.setdefault(event.get('object_type'), set()).add(event.get('object_id'))
+    fields = {}
+    if ChangeEvent.ObjectType.EXPERIMENT in ids:
+        for e in AerpawExperiment.all_objects.filter(id__in=ids.get(ChangeEvent.ObjectType.EXPERIMENT)).values(
+                'id', 'experiment_state', 'is_retired', 'modified'):
+            fields[(ChangeEvent.ObjectType.EXPERIMENT, e.get('id'))] = {
+                'experiment_id': e.get('id'),
+                'experiment_state': e.get('experiment_state'),
+                'is_retired': e.get('is_retired'),
+                'modified_date': e.get('modified')
+            }
+    if ChangeEvent.ObjectType.SESSION in ids:
+        for s in ExperimentSession.objects.filter(id__in=ids.get(ChangeEvent.ObjectType.SESSION)).values(
+                'id', 'experiment_id', 'session_type', 'created', 'end_date_time'):
+            fields[(ChangeEvent.ObjectType.SESSION, s.get('id'))] = {
+                'end_date_time': s.get('end_date_time'),
+                'experiment_id': s.get('experiment_id'),
+                'session_type': s.get('session_type'),
+                'start_date_time': s.get('created')
+            }
+    if ChangeEvent.ObjectType.RESOURCE in ids:
+        for r in AerpawResource.all_objects.filter(id__in=ids.get(ChangeEvent.ObjectType.RESOURCE)).values(
+                'id', 'name', 'resource_mode', 'is_active'):
+            fields[(ChangeEvent.ObjectType.RESOURCE, r.get('id'))] = {
+                'is_active': r.get('is_active'),
+                'name': r.get('name'),
+                'resource_mode': r.get('resource_mode')
+            }
+    return fields
+
+
+def sse_message(event: str, data, event_id: int = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append('id: {0}'.format(event_id))
+    lines.append('event: {0}'.format(event))
+    lines.append('data: {0}'.format(_renderer.render(data).decode()))
+    return '\n'.join(lines) + '\n\n'
+
+
+def _messages(events: list, experiment_id: int = None) -> list:
+    fields = _object_fields(events)
+    messages = []
+    for event in events:
+        data = dict(event)
+        data.update(fields.get((event.get('object_type'), event.get('object_id')), {}))
+        if experiment_id is not None and data.get('experiment_id') != experiment_id:
+            continue
+        messages.append(sse_message(event.get('object_type'), data, event.get('change_id')))
+    return messages
+
+
+def change_stream(user, since: int = None, object_types: list = None, experiment_id: int = None):
+    """
+    server-sent events of the change feed visible to the user
+    - event: object type, id: change feed cursor (sent back by the browser as Last-Event-ID)
+    - data: the change event plus current object fields (experiment_state, session end_date_time, ...)
+    - `experiment_id` keeps the experiment and session events of a single experiment
+    - an expired cursor sends a `reset` event and continues from the current cursor
+    - a comment is sent every CHANGE_STREAM_HEARTBEAT_SECONDS, the stream closes after
+      CHANGE_STREAM_MAX_SECONDS (the browser reconnects from the last event id)
+    """
+    heartbeat = getattr(settings, 'CHANGE_STREAM_HEARTBEAT_SECONDS', 15)
+    poll = heartbeat if pg_notify_enabled() else getattr(settings, 'CHANGE_STREAM_POLL_SECONDS', 5)
+    settle = getattr(settings, 'CHANGE_FEED_SETTLE_SECONDS', 1)
+    deadline = time.monotonic() + getattr(settings, 'CHANGE_STREAM_MAX_SECONDS', 300)
+    broker.ensure_listener()
+    yield 'retry: {0}\n\n'.format(STREAM_RETRY_MS)
+    if since is None:
+        cursor = head_cursor()
+    elif cursor_expired(since):
+        cursor = head_cursor()
+        yield sse_message('reset', {'cursor': cursor}, cursor)
+    else:
+        cursor = since
+    last_sent = time.monotonic()
+    while time.monotonic() < deadline:
+        page = changes_since(user, cursor, CHANGE_FEED_MAX_LIMIT, object_types)
+        cursor = page.get('cursor')
+        messages = _messages(page.get('results'), experiment_id)
+        if messages:
+            yield ''.join(messages)
+            last_sent = time.monotonic()
+        if page.get('has_more'):
+            continue
+        if broker.latest > cursor:
+            # published but not settled yet
+            time.sleep(settle)
+            continue
+        if not broker.wait(cursor, timeout=min(poll, max(deadline - time.monotonic(), 0))) and \
+                time.monotonic() - last_sent >= heartbeat:
+            yield ': keep-alive\n\n'
+            last_sent = time.monotonic()
@@ -1,7 +1,11 @@
+import logging
+from datetime import datetime, time, timedelta
 from uuid import uuid4
 
+from django.db import transaction
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import permissions
 from rest_framework.decorators import action
 from rest_framework.exceptions import MethodNotAllowed, PermissionDenied, ValidationError
@@ -10,23 +14,46 @@ from rest_framework.response import Response
 from rest_framework.status import HTTP_204_NO_CONTENT
 from rest_framework.viewsets import GenericViewSet
 
+from portal.apps.audit.history import audit_instances
+from portal.apps.changes.feed import record_changes
+from portal.apps.changes.models import ChangeEvent
 from portal.apps.experiments.api.serializers import CanonicalExperimentResourceSerializer, ExperimentSerializerDetail, \
     ExperimentSerializerList, ExperimentSessionSerializer, UserExperimentSerializer
 from portal.apps.experiments.models import AerpawExperiment, CanonicalExperimentResource, ExperimentSession, \
     UserExperiment
-from portal.apps.operations.models import CanonicalNumber, get_current_canonical_number, \
-    increment_current_canonical_number
+from portal.apps.mixins.api.batch import BatchMixin
+from portal.apps.mixins.api.exports import ExportMixin
+from portal.apps.mixins.api.fields import SparseFieldsMixin
+from portal.apps.operations.models import CanonicalNumber, allocate_canonical_numbers, \
+    get_current_canonical_number, increment_current_canonical_number
 from portal.apps.projects.models import AerpawProject
 from portal.apps.resources.api.serializers import ResourceSerializerDetail
 from portal.apps.resources.models import AerpawResource
+from portal.apps.users.dashboard import invalidate_dashboards
 from portal.apps.users.models import AerpawUser
 
+logger = logging.getLogger(__name__)
+
 # constants
 EXPERIMENT_MIN_NAME_LEN = 5
 EXPERIMENT_MIN_DESC_LEN = 5
+EXPERIMENT_MAX_CLONE_COUNT = 100
 
 
-class ExperimentViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateModelMixin):
+def _day_start(name: str, value: str, days: int = 0) -> datetime:
+    """
+    midnight (current time zone) of a YYYY-MM-DD query parameter, `days` later
+    """
+    try:
+        day = datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError(
+            detail="{0}: must be a date formatted as YYYY-MM-DD".format(name))
+    return timezone.make_aware(datetime.combine(day + timedelta(days=days), time.min))
+
+
+class ExperimentViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateModelMixin, ExportMixin,
+                        SparseFieldsMixin, BatchMixin):
     """
     AERPAW Experiments
     - paginated list
@@ -35,10 +62,31 @@ class ExperimentViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, Upda
     - update
     - delete
     - resources
+    - export
+    - clone
+    - batch
     """
     permission_classes = [permissions.IsAuthenticated]
-    queryset = AerpawExperiment.objects.all().order_by('name').distinct()
+    # detail lookups include soft deleted rows (returned flagged is_deleted), lists use get_queryset
+    queryset = AerpawExperiment.all_objects.all().order_by('name').distinct()
     serializer_class = ExperimentSerializerDetail
+    export_name = 'experiments'
+    export_fields = [
+        ('canonical_number', 'canonical_number__canonical_number'),
+        ('created_date', 'created'),
+        ('description', 'description'),
+        ('experiment_creator', 'experiment_creator_id'),
+        ('experiment_id', 'id'),
+        ('experiment_uuid', 'uuid'),
+        ('experiment_state', 'experiment_state'),
+        ('is_canonical', 'is_canonical'),
+        ('is_retired', 'is_retired'),
+        ('name', 'name'),
+        ('project_id', 'project_id')
+    ]
+    sparse_fields = export_fields
+    sparse_id_field = 'experiment_id'
+    expandable = ['members', 'project', 'resources']
 
     def get_queryset(self):
         search = self.request.query_params.get('search', None)
@@ -46,19 +94,18 @@ class ExperimentViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, Upda
         if search:
             if user.is_operator():
                 queryset = AerpawExperiment.objects.filter(
-                    is_deleted=False, name__icontains=search).order_by('name').distinct()
+                    name__icontains=search).order_by('name').distinct()
             else:
                 queryset = AerpawExperiment.objects.filter(
-                    Q(is_deleted=False, name__icontains=search) &
+                    Q(name__icontains=search) &
                     (Q(project__project_membership__email__in=[user.email]) | Q(project__project_creator=user))
                 ).order_by('name').distinct()
         else:
             if user.is_operator():
-                queryset = AerpawExperiment.objects.filter(is_deleted=False).order_by('name').distinct()
+                queryset = AerpawExperiment.objects.all().order_by('name').distinct()
             else:
                 queryset = AerpawExperiment.objects.filter(
-                    Q(is_deleted=False) &
-                    (Q(project__project_membership__email__in=[user.email]) | Q(project__project_creator=user))
+                    Q(project__project_membership__email__in=[user.email]) | Q(project__project_creator=user)
                 ).order_by('name').distinct()
         return queryset
 
@@ -76,12 +123,20 @@ class ExperimentViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, Upda
         - name                   - string
         - project_id             - int
 
+        Parameters (optional):
+        - fields                 - comma separated subset of the fields above (only those columns are read)
+        - expand                 - comma separated: members, project, resources
+
         Permission:
         - user is_experiment_project_member OR
         - user is_experiment_project_creator OR
         - user is_operator
         """
         if request.user.is_active:
+            fields = self.requested_fields(request)
+            expand = self.requested_expand(request)
+            if fields:
+                return self.sparse_list(self.get_queryset(), fields, expand)
             page = self.paginate_queryset(self.get_queryset())
             if page:
                 serializer = ExperimentSerializerList(page, many=True)
@@ -112,6 +167,7 @@ class ExperimentViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, Upda
                         'project_id': du.get('project_id')
                     }
                 )
+            response_data = self.expand_rows(response_data, expand)
             if page:
                 return self.get_paginated_response(response_data)
             else:
@@ -208,6 +264,10 @@ class ExperimentViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, Upda
         - project_id             - int
         - resources              - array of int
 
+        Parameters (optional):
+        - fields                 - comma separated subset of the list fields (only those columns are read)
+        - expand                 - comma separated: members, project, resources
+
         Permission:
         - user is_creator OR
         - user is_project_member OR
@@ -215,9 +275,13 @@ class ExperimentViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, Upda
         - user is_operator
         """
         experiment = get_object_or_404(self.queryset, pk=kwargs.get('pk'))
-        project = get_object_or_404(AerpawProject, pk=experiment.project.id)
+        project = get_object_or_404(AerpawProject.all_objects, pk=experiment.project.id)
         if project.is_creator(request.user) or project.is_member(request.user) or \
                 project.is_owner(request.user) or request.user.is_operator():
+            fields = self.requested_fields(request)
+            expand = self.requested_expand(request)
+            if fields:
+                return self.sparse_retrieve(self.queryset, experiment.id, fields, expand)
             serializer = ExperimentSerializerDetail(experiment)
             du = dict(serializer.data)
             # add experiment membership
@@ -253,12 +317,34 @@ class ExperimentViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, Upda
                 'resources': du.get('resources')
             }
             if experiment.is_deleted:
-                response_data['is_deleted'] = du.get('is_deleted')
-            return Response(response_data)
+                response_data['is_deleted'] = experiment.is_deleted
+            return Response(self.expand_rows([response_data], expand)[0])
         else:
             raise PermissionDenied(
                 detail="PermissionDenied: unable to GET /experiments/{0} details".format(kwargs.get('pk')))
 
+    def expand_members(self, ids: list) -> dict:
+        members = {i: [] for i in ids}
+        for m in UserExperiment.objects.filter(experiment_id__in=ids).order_by('user__display_name').values(
+                'experiment_id', 'user_id', 'user__display_name'):
+            members[m.get('experiment_id')].append(
+                {'display_name': m.get('user__display_name'), 'user_id': m.get('user_id')})
+        return members
+
+    def expand_project(self, ids: list) -> dict:
+        return {
+            e.get('id'): {'name': e.get('project__name'), 'project_id': e.get('project_id')}
+            for e in AerpawExperiment.all_objects.filter(id__in=ids).values('id', 'project_id', 'project__name')
+        }
+
+    def expand_resources(self, ids: list) -> dict:
+        resources = {i: [] for i in ids}
+        for r in AerpawExperiment.resources.through.objects.filter(aerpawexperiment_id__in=ids).order_by(
+                'aerpawresource__name').values('aerpawexperiment_id', 'aerpawresource_id', 'aerpawresource__name'):
+            resources[r.get('aerpawexperiment_id')].append(
+                {'name': r.get('aerpawresource__name'), 'resource_id': r.get('aerpawresource_id')})
+        return resources
+
     def update(self, request, *args, **kwargs):
         """
         PUT: update an existing experiment
@@ -506,6 +592,106 @@ class ExperimentViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, Upda
             raise PermissionDenied(
                 detail="PermissionDenied: unable to GET,PUT,PATCH /experiments/{0}/membership".format(kwargs.get('pk')))
 
+    @action(detail=True, methods=['post'])
+    def clone(self, request, *args, **kwargs):
+        """
+        POST: clone an experiment into new experiments (single transaction)
+        - count                  - int (default = 1)
+        - name_prefix            - string (default = experiment name)
+
+        Each clone copies the resources, canonical-experiment-resource definitions and
+        membership of the source experiment and receives its own canonical_number
+
+        Response: array of
+        - canonical_number       - int
+        - experiment_id          - int
+        - name                   - string
+
+        Permission:
+        - user is_experimenter AND
+            - user is_project_creator OR
+            - user is_project_member OR
+            - user is_project_owner
+        """
+        experiment = get_object_or_404(self.get_queryset(), pk=kwargs.get('pk'))
+        project = experiment.project
+        user = request.user
+        if user.is_experimenter() and (project.is_creator(user) or project.is_member(user) or project.is_owner(user)):
+            try:
+                count = int(request.data.get('count', 1))
+            except (TypeError, ValueError):
+                count = 0
+            if count < 1 or count > EXPERIMENT_MAX_CLONE_COUNT:
+                raise ValidationError(
+                    detail="count: must be an integer between 1 and {0}".format(EXPERIMENT_MAX_CLONE_COUNT))
+            name_prefix = request.data.get('name_prefix', None) or experiment.name
+            if len(name_prefix) < EXPERIMENT_MIN_NAME_LEN:
+                raise ValidationError(
+                    detail="name_prefix: must be at least {0} chars long".format(EXPERIMENT_MIN_NAME_LEN))
+            resource_ids = list(experiment.resources.all().values_list('id', flat=True))
+            cers = list(CanonicalExperimentResource.objects.filter(experiment__id=experiment.id).order_by('created'))
+            member_ids = set(UserExperiment.objects.filter(
+                experiment__id=experiment.id).values_list('user__id', flat=True))
+            member_ids.add(user.id)
+            with transaction.atomic():
+                try:
+                    numbers = allocate_canonical_numbers(count)
+                except ValueError as exc:
+                    raise ValidationError(
+                        detail="canonical_number: {0}".format(exc))
+                canonical_numbers = CanonicalNumber.objects.bulk_create(
+                    [CanonicalNumber(canonical_number=n) for n in numbers])
+                clones = AerpawExperiment.objects.bulk_create([
+                    AerpawExperiment(
+                        canonical_number=canonical_number,
+                        created_by=user.username,
+                        description=experiment.description,
+                        experiment_creator=user,
+                        is_canonical=experiment.is_canonical,
+                        modified_by=user.username,
+                        name='{0} {1}'.format(name_prefix, i + 1),
+                        project=project,
+                        uuid=uuid4()
+                    ) for i, canonical_number in enumerate(canonical_numbers)
+                ])
+                AerpawExperiment.resources.through.objects.bulk_create([
+                    AerpawExperiment.resources.through(aerpawexperiment_id=clone.id, aerpawresource_id=resource_id)
+                    for clone in clones for resource_id in resource_ids
+                ])
+                CanonicalExperimentResource.objects.bulk_create([
+                    CanonicalExperimentResource(
+                        experiment=clone,
+                        experiment_node_number=cer.experiment_node_number,
+                        node_type=cer.node_type,
+                        node_uhd=cer.node_uhd,
+                        node_vehicle=cer.node_vehicle,
+                        resource_id=cer.resource_id,
+                        uuid=uuid4()
+                    ) for clone in clones for cer in cers
+                ])
+                UserExperiment.objects.bulk_create([
+                    UserExperiment(experiment=clone, granted_by=user, user_id=member_id)
+                    for clone in clones for member_id in sorted(member_ids)
+                ])
+                # bulk_create sends no post_save signals
+                transaction.on_commit(lambda: invalidate_dashboards(member_ids))
+                record_changes([(ChangeEvent.ObjectType.EXPERIMENT, clone.id, ChangeEvent.Action.CREATED, project.id)
+                                for clone in clones])
+                audit_instances(clones, created=True)
+            response_data = []
+            for clone in clones:
+                response_data.append(
+                    {
+                        'canonical_number': clone.canonical_number.canonical_number,
+                        'experiment_id': clone.id,
+                        'name': clone.name
+                    }
+                )
+            return Response(response_data)
+        else:
+            raise PermissionDenied(
+                detail="PermissionDenied: unable to POST /experiments/{0}/clone".format(kwargs.get('pk')))
+
 
 class UserExperimentViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateModelMixin):
     """
@@ -628,35 +814,40 @@ class UserExperimentViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin,
         raise MethodNotAllowed(method="DELETE: /user-experiment/{int:pk}")
 
 
-class ExperimentSessionViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateModelMixin):
+class ExperimentSessionViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateModelMixin, ExportMixin):
     """
     Experiment Session
     - paginated list
     - retrieve one
+    - export
     """
     permission_classes = [permissions.IsAuthenticated]
-    queryset = ExperimentSession.objects.all().order_by('-created').distinct()
+    queryset = ExperimentSession.objects.all().order_by('-created')
     serializer_class = ExperimentSessionSerializer
+    export_name = 'sessions'
+    export_fields = [
+        ('end_date_time', 'end_date_time'),
+        ('ended_by', 'ended_by_id'),
+        ('experiment_id', 'experiment_id'),
+        ('session_id', 'id'),
+        ('session_type', 'session_type'),
+        ('start_date_time', 'created'),
+        ('started_by', 'started_by_id')
+    ]
 
     def get_queryset(self):
-        experiment_id = self.request.query_params.get('experiment_id', None)
-        user_id = self.request.query_params.get('user_id', None)
-        if experiment_id and user_id:
-            queryset = ExperimentSession.objects.filter(
-                experiment__id=experiment_id,
-                user__id=user_id
-            ).order_by('-created').distinct()
-        elif experiment_id:
-            queryset = ExperimentSession.objects.filter(
-                experiment__id=experiment_id
-            ).order_by('-created').distinct()
-        elif user_id:
-            queryset = ExperimentSession.objects.filter(
-                user__id=user_id
-            ).order_by('-created').distinct()
-        else:
-            queryset = ExperimentSession.objects.filter().order_by('-created').distinct()
-        return queryset
+        params = self.request.query_params
+        queryset = ExperimentSession.objects.all()
+        if params.get('experiment_id', None):
+            queryset = queryset.filter(experiment__id=params.get('experiment_id'))
+        if params.get('user_id', None):
+            queryset = queryset.filter(started_by__id=params.get('user_id'))
+        # bounds on created itself (not created__date) so PostgreSQL only scans the matching partitions
+        if params.get('start', None):
+            queryset = queryset.filter(created__gte=_day_start('start', params.get('start')))
+        if params.get('end', None):
+            queryset = queryset.filter(created__lt=_day_start('end', params.get('end'), days=1))
+        return queryset.order_by('-created')
 
     def list(self, request, *args, **kwargs):
         """
@@ -669,6 +860,11 @@ class ExperimentSessionViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixi
         - start_date_time        - string
         - started_by (fk)        - user_id
 
+        Parameters (optional):
+        - experiment_id          - int
+        - user_id                - int, sessions started by the user
+        - start, end             - YYYY-MM-DD (inclusive) of start_date_time
+
         Permission:
         - user is_operator
         """
@@ -700,6 +896,9 @@ class ExperimentSessionViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixi
             raise PermissionDenied(
                 detail="PermissionDenied: unable to GET /experiment-session list")
 
+    def has_export_permission(self, request) -> bool:
+        return request.user.is_operator()
+
     def create(self, request):
         """
         POST: create a new experiment-session
@@ -843,13 +1042,13 @@ class CanonicalExperimentResourceViewSet(GenericViewSet, RetrieveModelMixin, Lis
         """
         try:
             experiment_id = self.request.query_params.get('experiment_id', None)
-            experiment = AerpawExperiment.objects.get(pk=experiment_id)
+            experiment = AerpawExperiment.all_objects.get(pk=experiment_id)
             if experiment.is_creator(request.user) or experiment.is_member(request.user):
                 is_experimenter = True
             else:
                 is_experimenter = False
         except Exception as exc:
-            print(exc)
+            logger.warning(exc)
             is_experimenter = False
         if request.user.is_operator() or is_experimenter:
             page = self.paginate_queryset(self.get_queryset())
@@ -911,13 +1110,13 @@ class CanonicalExperimentResourceViewSet(GenericViewSet, RetrieveModelMixin, Lis
         canonical_experiment_resource = get_object_or_404(self.queryset, pk=kwargs.get('pk'))
         try:
             experiment_id = canonical_experiment_resource.experiment.id
-            experiment = AerpawExperiment.objects.get(pk=experiment_id)
+            experiment = AerpawExperiment.all_objects.get(pk=experiment_id)
             if experiment.is_creator(request.user) or experiment.is_member(request.user):
                 is_experimenter = True
             else:
                 is_experimenter = False
         except Exception as exc:
-            print(exc)
+            logger.warning(exc)
             is_experimenter = False
         if request.user.is_operator() or is_experimenter:
             serializer = CanonicalExperimentResourceSerializer(canonical_experiment_resource)
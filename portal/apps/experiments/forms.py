@@ -55,7 +55,7 @@ class ExperimentMembershipForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super(ExperimentMembershipForm, self).__init__(*args, **kwargs)
         exp = kwargs.get('instance')
-        project = AerpawProject.objects.get(id=int(exp.project_id))
+        project = AerpawProject.all_objects.get(id=int(exp.project_id))
         self.fields['experiment_members'].queryset = (project.project_owners() | project.project_members()).distinct()
 
     experiment_members = forms.ModelMultipleChoiceField(
@@ -92,8 +92,8 @@ class ExperimentResourceTargetsForm(forms.ModelForm):
         super(ExperimentResourceTargetsForm, self).__init__(*args, **kwargs)
         self.fields['experiment_resources'].queryset = AerpawResource.objects.filter(
             resource_class=AerpawResource.ResourceClass.ALLOW_CANONICAL,
-            resource_type__in=[AerpawResource.ResourceType.AFRN, AerpawResource.ResourceType.APRN],
-            is_deleted=False).order_by('name')
+            resource_type__in=[AerpawResource.ResourceType.AFRN, AerpawResource.ResourceType.APRN]
+        ).order_by('name')
 
     experiment_resources = forms.ModelMultipleChoiceField(
         queryset=None,
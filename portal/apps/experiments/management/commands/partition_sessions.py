@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from portal.apps.experiments.partitions import SESSION_PARTITION_MONTHS_AHEAD, ensure_session_partitions, \
+    partition_sessions_table, partitioning_supported
+
+
+class Command(BaseCommand):
+    help = 'Partition the experiment session table by month and create the upcoming monthly partitions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=SESSION_PARTITION_MONTHS_AHEAD,
+                            help='create partitions up to this many months after the current month')
+
+    def handle(self, *args, **options):
+        if not partitioning_supported():
+            self.stdout.write('partition_sessions: skipped, table partitioning requires PostgreSQL')
+            return
+        months_ahead = options.get('months_ahead')
+        if partition_sessions_table(months_ahead=months_ahead):
+            self.stdout.write('partition_sessions: session table converted to monthly partitions')
+        created = ensure_session_partitions(months_ahead=months_ahead)
+        self.stdout.write('partition_sessions: {0} partitions created'.format(len(created)))
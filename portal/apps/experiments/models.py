@@ -2,7 +2,7 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
-from portal.apps.mixins.models import AuditModelMixin, BaseModel, BaseTimestampModel
+from portal.apps.mixins.models import AuditModelMixin, BaseModel, BaseTimestampModel, LiveManager
 from portal.apps.operations.models import CanonicalNumber
 from portal.apps.projects.models import AerpawProject
 from portal.apps.resources.models import AerpawResource
@@ -78,7 +78,12 @@ class AerpawExperiment(BaseModel, AuditModelMixin, models.Model):
     )
     uuid = models.CharField(max_length=255, primary_key=False, editable=False)
 
+    objects = LiveManager()
+    all_objects = models.Manager()
+
     class Meta:
+        # reverse relations (experiment.resources, ...), admin and dumpdata include soft deleted rows
+        default_manager_name = 'all_objects'
         verbose_name = 'AERPAW Experiment'
 
     def __str__(self):
@@ -161,6 +166,12 @@ class ExperimentSession(BaseModel, BaseTimestampModel, models.Model):
     )
     uuid = models.CharField(max_length=255, primary_key=False, editable=False)
 
+    class Meta:
+        # time range queries per experiment (the table is partitioned by month of created on PostgreSQL)
+        indexes = [
+            models.Index(fields=['experiment', 'created'])
+        ]
+
 
 class CanonicalExperimentResource(BaseModel, BaseTimestampModel, models.Model):
     """
@@ -0,0 +1,170 @@
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from portal.apps.experiments.models import ExperimentSession
+
+logger = logging.getLogger(__name__)
+
+# constants
+SESSION_PARTITION_MONTHS_AHEAD = 3
+SESSION_PARTITION_KEY = 'created'
+
+
+def _table() -> str:
+    return ExperimentSession._meta.db_table
+
+
+def _month_start(value: datetime) -> datetime:
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _next_month(value: datetime) -> datetime:
+    return (value + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(month: datetime) -> str:
+    return '{0}_p{1:04d}_{2:02d}'.format(_table(), month.year, month.month)
+
+
+def default_partition_name() -> str:
+    return '{0}_default'.format(_table())
+
+
+def partitioning_supported() -> bool:
+    return connection.vendor == 'postgresql'
+
+
+def sessions_partitioned() -> bool:
+    """
+    True when the session table is a declaratively partitioned (PostgreSQL) table
+    """
+    if not partitioning_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [_table()])
+        return cursor.fetchone() is not None
+
+
+def _existing_partitions(cursor) -> set:
+    cursor.execute(
+        'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+        'WHERE i.inhparent = to_regclass(%s)', [_table()])
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _create_partition(cursor, month: datetime):
+    """
+    monthly partition [month, next month) in UTC
+    - rows of the month already in the default partition are moved into it before it is attached
+    """
+    table = connection.ops.quote_name(_table())
+    default = connection.ops.quote_name(default_partition_name())
+    name = connection.ops.quote_name(partition_name(month))
+    key = connection.ops.quote_name(SESSION_PARTITION_KEY)
+    bounds = [month, _next_month(month)]
+    cursor.execute('CREATE TABLE {0} (LIKE {1} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'.format(name, table))
+    cursor.execute(
+        'WITH moved AS (DELETE FROM {0} WHERE {1} >= %s AND {1} < %s RETURNING *) '
+        'INSERT INTO {2} SELECT * FROM moved'.format(default, key, name), bounds)
+    cursor.execute("ALTER TABLE {0} ATTACH PARTITION {1} FOR VALUES FROM ('{2}') TO ('{3}')".format(
+        table, name, bounds[0].isoformat(), bounds[1].isoformat()))
+
+
+def _months(first: datetime, last: datetime) -> list:
+    months = []
+    month = _month_start(first)
+    while month <= last:
+        months.append(month)
+        month = _next_month(month)
+    return months
+
+
+def ensure_session_partitions(months_ahead: int = SESSION_PARTITION_MONTHS_AHEAD, now: datetime = None) -> list:
+    """
+    create the monthly partitions from the current month to `months_ahead` months ahead, and for
+    every month that has rows in the default partition (sessions written before their partition existed)
+    - returns the names of the partitions created
+    """
+    if not sessions_partitioned():
+        return []
+    now = now or datetime.now(dt_timezone.utc)
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        existing = _existing_partitions(cursor)
+        cursor.execute("SELECT DISTINCT date_trunc('month', {0} AT TIME ZONE 'UTC') FROM {1}".format(
+            connection.ops.quote_name(SESSION_PARTITION_KEY), connection.ops.quote_name(default_partition_name())))
+        months = {m[0].replace(tzinfo=dt_timezone.utc) for m in cursor.fetchall()}
+        first = _month_start(now)
+        last = first
+        for _ in range(months_ahead):
+            last = _next_month(last)
+        months.update(_months(first, last))
+        for month in sorted(months):
+            if partition_name(month) not in existing:
+                _create_partition(cursor, month)
+                created.append(partition_name(month))
+    if created:
+        logger.info('session partitions created: %s', ', '.join(created))
+    return created
+
+
+def partition_sessions_table(months_ahead: int = SESSION_PARTITION_MONTHS_AHEAD) -> bool:
+    """
+    convert the session table into a table partitioned by month of `created` (one time, PostgreSQL only)
+    - the rows are copied into the new table, indexes and foreign keys are recreated with their names
+    - the primary key becomes (id, created) as the partition key must be part of it
+    - a default partition keeps inserts working for months without a partition
+    - returns False when the table is already partitioned (or the database is not PostgreSQL)
+    """
+    if not partitioning_supported() or sessions_partitioned():
+        return False
+    quote = connection.ops.quote_name
+    table = _table()
+    old = '{0}_unpartitioned'.format(table)
+    sequence = '{0}_id_seq'.format(table)
+    key = quote(SESSION_PARTITION_KEY)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('LOCK TABLE {0} IN ACCESS EXCLUSIVE MODE'.format(quote(table)))
+        # definitions reference the current table name, replayed on the new table
+        cursor.execute(
+            'SELECT pg_get_indexdef(indexrelid) FROM pg_index '
+            'WHERE indrelid = to_regclass(%s) AND NOT indisprimary AND NOT indisunique', [table])
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'", [table])
+        foreign_keys = cursor.fetchall()
+        cursor.execute('SELECT min({0}) FROM {1}'.format(key, quote(table)))
+        first = cursor.fetchone()[0]
+        cursor.execute('ALTER TABLE {0} RENAME TO {1}'.format(quote(table), quote(old)))
+        cursor.execute('CREATE TABLE {0} (LIKE {1} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+                       'PARTITION BY RANGE ({2})'.format(quote(table), quote(old), key))
+        cursor.execute('CREATE TABLE {0} PARTITION OF {1} DEFAULT'.format(
+            quote(default_partition_name()), quote(table)))
+        now = datetime.now(dt_timezone.utc)
+        last = _month_start(now)
+        for _ in range(months_ahead):
+            last = _next_month(last)
+        for month in _months(first or now, last):
+            cursor.execute("CREATE TABLE {0} PARTITION OF {1} FOR VALUES FROM ('{2}') TO ('{3}')".format(
+                quote(partition_name(month)), quote(table), month.isoformat(), _next_month(month).isoformat()))
+        cursor.execute('INSERT INTO {0} SELECT * FROM {1}'.format(quote(table), quote(old)))
+        # fails (and rolls back) if another table references the sessions
+        cursor.execute('DROP TABLE {0}'.format(quote(old)))
+        cursor.execute('ALTER TABLE {0} ADD CONSTRAINT {1} PRIMARY KEY (id, {2})'.format(
+            quote(table), quote('{0}_pkey'.format(table)), key))
+        for index in indexes:
+            cursor.execute(index)
+        for name, definition in foreign_keys:
+            cursor.execute('ALTER TABLE {0} ADD CONSTRAINT {1} {2}'.format(quote(table), quote(name), definition))
+        # the identity sequence went with the old table
+        cursor.execute('CREATE SEQUENCE {0} AS integer OWNED BY {1}.id'.format(quote(sequence), quote(table)))
+        cursor.execute("ALTER TABLE {0} ALTER COLUMN id SET DEFAULT nextval('{1}')".format(quote(table), sequence))
+        cursor.execute("SELECT setval('{0}', coalesce(max(id), 0) + 1, false) FROM {1}".format(
+            sequence, quote(table)))
+    logger.info('session table %s partitioned by month', table)
+    return True
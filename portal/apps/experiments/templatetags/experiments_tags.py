@@ -1,15 +1,18 @@
+import logging
+
 from django import template
 
 from portal.apps.experiments.models import AerpawExperiment
 
+logger = logging.getLogger(__name__)
 register = template.Library()
 
 
 @register.filter
 def id_to_experiment_name(experiment_id):
     try:
-        experiment = AerpawExperiment.objects.get(pk=int(experiment_id))
+        experiment = AerpawExperiment.all_objects.get(pk=int(experiment_id))
         return experiment.name
     except Exception as exc:
-        print(exc)
+        logger.warning(exc)
         return 'not found'
@@ -1,3 +1,4 @@
+import logging
 from urllib.parse import parse_qs, urlparse
 
 from django.contrib.auth.decorators import login_required
@@ -11,8 +12,11 @@ from portal.apps.experiments.forms import ExperimentCreateForm, ExperimentEditFo
     ExperimentResourceTargetsForm, ExperimentResourceTargetModifyForm
 from portal.apps.experiments.models import AerpawExperiment, CanonicalExperimentResource
 from portal.apps.projects.api.viewsets import ProjectViewSet
+from portal.apps.users.dashboard import PENDING_STATES
 from portal.server.settings import DEBUG, REST_FRAMEWORK
 
+logger = logging.getLogger(__name__)
+
 
 @csrf_exempt
 @login_required
@@ -48,7 +52,7 @@ def experiment_list(request):
                 try:
                     prev_page = prev_dict['page'][0]
                 except Exception as exc:
-                    print(exc)
+                    logger.debug(exc)
                     prev_page = 1
             next_url = experiments.get('next', None)
             if next_url:
@@ -56,7 +60,7 @@ def experiment_list(request):
                 try:
                     next_page = next_dict['page'][0]
                 except Exception as exc:
-                    print(exc)
+                    logger.debug(exc)
                     next_page = 1
             count = int(experiments.get('count'))
             min_range = int(current_page - 1) * int(REST_FRAMEWORK['PAGE_SIZE']) + 1
@@ -94,32 +98,40 @@ def experiment_detail(request, experiment_id):
     try:
         e = ExperimentViewSet(request=request)
         experiment = e.retrieve(request=request, pk=experiment_id).data
+        # the page follows /api/changes/stream only while a deploy is pending
+        follow_state = experiment.get('experiment_state') in PENDING_STATES
         if request.method == "POST":
             if request.POST.get('delete-experiment') == "true":
                 exp = e.destroy(request=request, pk=experiment_id).data
                 return redirect('experiment_list')
-        # get canonical experiment resource definitions
-        try:
-            resources = []
-            request.query_params = QueryDict('', mutable=True)
-            request.query_params.update({'experiment_id': experiment_id})
-            for res_id in experiment.get('resources'):
-                request.query_params.update({'resource_id': res_id})
-                r = CanonicalExperimentResourceViewSet(request=request)
-                res = r.list(request=request)
-                if res.data:
-                    resources.append(res.data.get('results')[0])
-        except Exception as exc:
-            resources = []
-            print(exc)
+        # get canonical experiment resource definitions: first definition per resource, one query
+        resources = []
+        membership = experiment.get('membership', {})
+        if request.user.is_operator() or membership.get('is_experiment_creator') or \
+                membership.get('is_experiment_member'):
+            definitions = {}
+            for cer in CanonicalExperimentResource.objects.filter(
+                    experiment_id=experiment_id, resource_id__in=experiment.get('resources')).order_by('created'):
+                definitions.setdefault(cer.resource_id, {
+                    'canonical_experiment_resource_id': cer.id,
+                    'experiment_id': cer.experiment_id,
+                    'experiment_node_number': cer.experiment_node_number,
+                    'node_type': cer.node_type,
+                    'node_uhd': cer.node_uhd,
+                    'node_vehicle': cer.node_vehicle,
+                    'resource_id': cer.resource_id
+                })
+            resources = [definitions.get(r) for r in experiment.get('resources') if r in definitions]
     except Exception as exc:
         message = exc
         resources = []
+        follow_state = False
     return render(request,
                   'experiment_detail.html',
                   {
                       'user': request.user,
                       'experiment': experiment,
+                      'follow_state': follow_state,
                       'resources': resources,
                       'message': message,
                       'debug': DEBUG
@@ -264,7 +276,7 @@ def experiment_resource_list(request, experiment_id):
                 try:
                     prev_page = prev_dict['page'][0]
                 except Exception as exc:
-                    print(exc)
+                    logger.debug(exc)
                     prev_page = 1
             next_url = resources.get('next', None)
             if next_url:
@@ -272,7 +284,7 @@ def experiment_resource_list(request, experiment_id):
                 try:
                     next_page = next_dict['page'][0]
                 except Exception as exc:
-                    print(exc)
+                    logger.debug(exc)
                     next_page = 1
             count = int(resources.get('count'))
             min_range = int(current_page - 1) * int(REST_FRAMEWORK['PAGE_SIZE']) + 1
@@ -0,0 +1,73 @@
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.response import Response
+
+# constants
+BATCH_MAX_IDS = 100
+
+
+def parse_ids(value) -> list:
+    """
+    ids from a comma separated string (query parameter) or a list (request body), order kept
+    """
+    if isinstance(value, str):
+        value = [v for v in value.split(',') if v.strip()]
+    try:
+        ids = list(dict.fromkeys(int(v) for v in value))
+    except (TypeError, ValueError):
+        raise ValidationError(
+            detail="ids: must be a list of integers")
+    if not ids:
+        raise ValidationError(
+            detail="ids: must provide at least one id")
+    if len(ids) > BATCH_MAX_IDS:
+        raise ValidationError(
+            detail="ids: at most {0} ids per request".format(BATCH_MAX_IDS))
+    return ids
+
+
+class BatchMixin:
+    """
+    Batch retrieve by id (used with SparseFieldsMixin: rows carry the sparse_fields)
+    - GET ?ids=1,2,3 or POST {"ids": [1, 2, 3]} for long lists
+    - rows come from one query on get_queryset(), so visibility matches the list view
+    - ids that are missing or not visible are reported in `not_found`
+    """
+
+    def has_batch_permission(self, request) -> bool:
+        return request.user.is_active
+
+    @action(detail=False, methods=['get', 'post'])
+    def batch(self, request, *args, **kwargs):
+        """
+        GET, POST: list fields of up to BATCH_MAX_IDS records
+        - not_found              - array of int
+        - results                - array of records (in the requested id order)
+
+        Parameters:
+        - ids                    - comma separated ids (GET) or array of ids (POST body)
+        - fields (optional)      - comma separated subset of the list fields
+        - expand (optional)      - comma separated related objects to inline
+        """
+        if not self.has_batch_permission(request):
+            raise PermissionDenied(
+                detail="PermissionDenied: unable to {0} /{1}/batch".format(request.method, self.basename))
+        if request.method == 'POST':
+            if not isinstance(request.data, dict):
+                raise ValidationError(
+                    detail="ids: body must be an object with an array of ids")
+            ids = parse_ids(request.data.get('ids', []))
+        else:
+            ids = parse_ids(request.query_params.get('ids', ''))
+        fields = self.requested_fields(request) or [field for field, _ in self.sparse_fields]
+        expand = self.requested_expand(request)
+        lookup = dict(self.sparse_fields).get(self.sparse_id_field)
+        rows = {
+            row.get(self.sparse_id_field): row for row in self.sparse_rows(
+                self.sparse_values(self.get_queryset().filter(**{'{0}__in'.format(lookup): ids}), fields), fields)
+        }
+        results = self.expand_rows([rows.get(i) for i in ids if i in rows], expand)
+        return Response({
+            'not_found': [i for i in ids if i not in rows],
+            'results': results
+        })
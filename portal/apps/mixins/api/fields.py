@@ -0,0 +1,91 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+
+def _split_param(value: str) -> list:
+    return [v.strip() for v in str(value).split(',') if v.strip()]
+
+
+def _query_params(request):
+    # the html views call the viewsets with the django request
+    return getattr(request, 'query_params', request.GET)
+
+
+class SparseFieldsMixin:
+    """
+    `fields=` and `expand=` query parameters for list and retrieve
+    - sparse_fields: list of (field, model field lookup) tuples selectable with `fields=a,b`, the
+      response is then read with values() so only those columns are selected
+    - sparse_id_field: response field of the primary key, always included
+    - expandable: names accepted by `expand=a,b`; `expand_<name>(ids)` returns {id: value} for all
+      rows in one query and the value is added to each row under <name>
+    """
+    sparse_fields = []
+    sparse_id_field = 'id'
+    expandable = []
+
+    def requested_fields(self, request) -> list:
+        """
+        validated `fields` parameter, None when absent
+        """
+        params = _query_params(request)
+        if not params.get('fields'):
+            return None
+        valid = [field for field, _ in self.sparse_fields]
+        fields = _split_param(params.get('fields'))
+        if not fields or not set(fields).issubset(valid):
+            raise ValidationError(
+                detail="fields: valid choices are {0}".format(valid))
+        return fields
+
+    def requested_expand(self, request) -> list:
+        """
+        validated `expand` parameter, empty when absent
+        """
+        expand = _split_param(_query_params(request).get('expand', ''))
+        if not set(expand).issubset(self.expandable):
+            raise ValidationError(
+                detail="expand: valid choices are {0}".format(self.expandable))
+        return expand
+
+    def sparse_values(self, queryset, fields: list) -> list:
+        """
+        values() queryset of the requested fields, rows are dicts keyed by lookup
+        """
+        lookups = dict(self.sparse_fields)
+        columns = [self.sparse_id_field] + [f for f in fields if f != self.sparse_id_field]
+        return queryset.values(*[lookups.get(column) for column in columns])
+
+    def sparse_rows(self, values, fields: list) -> list:
+        lookups = dict(self.sparse_fields)
+        columns = [self.sparse_id_field] + [f for f in fields if f != self.sparse_id_field]
+        return [{column: row.get(lookups.get(column)) for column in columns} for row in values]
+
+    def expand_rows(self, rows: list, expand: list) -> list:
+        """
+        add the expanded related objects of `expand` to each row (one query per expansion)
+        """
+        ids = [row.get(self.sparse_id_field) for row in rows]
+        for name in expand:
+            values = getattr(self, 'expand_{0}'.format(name))(ids) if ids else {}
+            for row in rows:
+                row[name] = values.get(row.get(self.sparse_id_field))
+        return rows
+
+    def sparse_list(self, queryset, fields: list, expand: list) -> Response:
+        """
+        paginated list of the requested fields only
+        """
+        values = self.sparse_values(queryset, fields)
+        page = self.paginate_queryset(values)
+        rows = self.expand_rows(self.sparse_rows(page if page is not None else values, fields), expand)
+        if page is not None:
+            return self.get_paginated_response(rows)
+        return Response(rows)
+
+    def sparse_retrieve(self, queryset, pk, fields: list, expand: list) -> Response:
+        """
+        single result of the requested fields only
+        """
+        rows = self.expand_rows(self.sparse_rows(self.sparse_values(queryset.filter(pk=pk), fields), fields), expand)
+        return Response(rows[0] if rows else {})
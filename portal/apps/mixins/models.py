@@ -1,6 +1,17 @@
 from django.db import models
 
 
+class LiveManager(models.Manager):
+    """
+    `objects` manager of soft delete models: rows flagged is_deleted are excluded
+    - `all_objects` includes soft deleted rows and stays the default manager
+      (Meta.default_manager_name), so reverse relations are not filtered
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class BaseModel(models.Model):
     id = models.AutoField(
         primary_key=True,
@@ -38,3 +49,10 @@ class AuditModelMixin(BaseTimestampModel, BaseTrackingModel):
 
     class Meta:
         abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # values as loaded, saves are diffed against them for the audit history
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
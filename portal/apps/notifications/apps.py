@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class NotificationsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'portal.apps.notifications'
+
+    def ready(self):
+        from portal.apps.notifications import signals  # noqa: F401
@@ -0,0 +1,63 @@
+import json
+import logging
+import os
+import sys
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class BaseNotificationBackend:
+    """
+    Delivers a digest to one recipient, selected with NOTIFICATION_BACKEND (dotted path)
+    - send(recipient, subject, body, notifications): raise to have the digest retried
+    """
+
+    def send(self, recipient, subject: str, body: str, notifications: list):
+        raise NotImplementedError()
+
+
+class ConsoleBackend(BaseNotificationBackend):
+    """
+    writes the digests to stdout (development)
+    """
+
+    def send(self, recipient, subject: str, body: str, notifications: list):
+        sys.stdout.write('To: {0}\nSubject: {1}\n\n{2}\n{3}\n'.format(recipient.email, subject, body, '-' * 72))
+        sys.stdout.flush()
+
+
+class FileBackend(BaseNotificationBackend):
+    """
+    appends one JSON line per digest to NOTIFICATION_FILE_PATH (local tests)
+    """
+
+    def send(self, recipient, subject: str, body: str, notifications: list):
+        path = getattr(settings, 'NOTIFICATION_FILE_PATH', None) or os.path.join(
+            settings.BASE_DIR, 'notifications.jsonl')
+        with open(path, 'a') as f:
+            f.write(json.dumps({
+                'body': body,
+                'notification_ids': [n.id for n in notifications],
+                'recipient': recipient.email,
+                'sent': timezone.now().isoformat(),
+                'subject': subject
+            }) + '\n')
+
+
+class EmailBackend(BaseNotificationBackend):
+    """
+    sends the digests with Django mail (EMAIL_HOST, EMAIL_PORT, ..., DEFAULT_FROM_EMAIL)
+    """
+
+    def send(self, recipient, subject: str, body: str, notifications: list):
+        send_mail(subject, body, None, [recipient.email], fail_silently=False)
+
+
+def get_backend() -> BaseNotificationBackend:
+    return import_string(getattr(
+        settings, 'NOTIFICATION_BACKEND', 'portal.apps.notifications.backends.ConsoleBackend'))()
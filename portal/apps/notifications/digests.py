@@ -0,0 +1,79 @@
+import logging
+import math
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from portal.apps.notifications.backends import get_backend
+from portal.apps.notifications.models import Notification
+from portal.apps.tasks.queue import enqueue
+from portal.apps.users.models import AerpawUser
+
+logger = logging.getLogger(__name__)
+
+# constants
+DIGEST_SUBJECT = 'AERPAW Portal: {0} update{1}'
+DIGEST_TASK = 'notifications.deliver_digest'
+
+
+def digest_seconds() -> int:
+    return getattr(settings, 'NOTIFICATION_DIGEST_SECONDS', 900)
+
+
+def notify(recipient_ids, kind: str, message: str, object_type: str, object_id: int):
+    """
+    record a notification for each recipient (in the current transaction) and schedule their digests
+    - notifications of a recipient are coalesced over NOTIFICATION_DIGEST_SECONDS windows: one digest
+      task per recipient and window (idempotency key), run when the window closes
+    """
+    recipient_ids = sorted(set(r for r in recipient_ids if r))
+    if not recipient_ids:
+        return
+    Notification.objects.bulk_create([
+        Notification(kind=kind, message=message, object_id=object_id, object_type=object_type, recipient_id=r)
+        for r in recipient_ids
+    ])
+    window = digest_seconds()
+    now = time.time()
+    window_end = math.floor(now / window) * window + window
+    for recipient_id in recipient_ids:
+        enqueue(
+            DIGEST_TASK,
+            {'recipient_id': recipient_id},
+            idempotency_key='notification-digest:{0}:{1}'.format(recipient_id, window_end),
+            delay_seconds=max(int(window_end - now), 0)
+        )
+
+
+def render_digest(notifications: list) -> (str, str):
+    subject = DIGEST_SUBJECT.format(len(notifications), '' if len(notifications) == 1 else 's')
+    lines = ['{0:%Y-%m-%d %H:%M %Z}  {1}'.format(timezone.localtime(n.created), n.message) for n in notifications]
+    return subject, '\n'.join(lines)
+
+
+def deliver_digest(recipient_id: int) -> int:
+    """
+    send the undelivered notifications of a recipient as one digest and mark them delivered
+    - recipients without an email address (or inactive) are marked delivered without a message
+    - delivered notifications older than NOTIFICATION_RETENTION_DAYS are deleted
+    - returns the number of notifications in the digest
+    """
+    notifications = list(Notification.objects.select_for_update().filter(
+        recipient_id=recipient_id, delivered__isnull=True).order_by('id'))
+    if not notifications:
+        return 0
+    recipient = AerpawUser.objects.filter(pk=recipient_id).first()
+    if recipient is not None and recipient.is_active and recipient.email:
+        subject, body = render_digest(notifications)
+        get_backend().send(recipient, subject, body, notifications)
+    else:
+        logger.info('notifications of user %s dropped: no active user with an email address', recipient_id)
+    now = timezone.now()
+    Notification.objects.filter(id__in=[n.id for n in notifications]).update(delivered=now)
+    Notification.objects.filter(
+        recipient_id=recipient_id,
+        delivered__lt=now - timedelta(days=getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 30))
+    ).delete()
+    return len(notifications)
@@ -0,0 +1,37 @@
+from django.db import models
+
+from portal.apps.users.models import AerpawUser
+
+
+class Notification(models.Model):
+    """
+    Notification (event for one recipient, delivered in a digest)
+    - created
+    - delivered
+    - id
+    - kind
+    - message
+    - object_id
+    - object_type
+    - recipient
+    """
+
+    class Kind(models.TextChoices):
+        EXPERIMENT_MEMBERSHIP = 'experiment_membership', 'Experiment Membership'
+        EXPERIMENT_STATE = 'experiment_state', 'Experiment State'
+        PROJECT_MEMBERSHIP = 'project_membership', 'Project Membership'
+
+    id = models.BigAutoField(primary_key=True)
+    created = models.DateTimeField(auto_now_add=True)
+    delivered = models.DateTimeField(blank=True, null=True)
+    kind = models.CharField(max_length=32, choices=Kind.choices)
+    message = models.TextField()
+    object_id = models.IntegerField()
+    object_type = models.CharField(max_length=32)
+    recipient = models.ForeignKey(AerpawUser, related_name='notifications', on_delete=models.CASCADE)
+
+    class Meta:
+        verbose_name = 'Notification'
+        indexes = [
+            models.Index(fields=['recipient', 'delivered', 'id'])
+        ]
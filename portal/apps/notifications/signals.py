@@ -0,0 +1,75 @@
+from django.db.models import Q
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from portal.apps.experiments.models import AerpawExperiment, UserExperiment
+from portal.apps.notifications.digests import notify
+from portal.apps.notifications.models import Notification
+from portal.apps.projects.models import UserProject
+from portal.apps.users.dashboard import experiment_user_ids
+from portal.apps.users.models import AerpawUser
+
+
+@receiver(post_save, sender=UserProject)
+def notify_project_membership(sender, instance, created, **kwargs):
+    """
+    users added to a project by someone else (ProjectViewSet.membership)
+    """
+    if created and instance.granted_by_id != instance.user_id:
+        notify(
+            [instance.user_id], Notification.Kind.PROJECT_MEMBERSHIP,
+            "You were added to project '{0}' as {1} by {2}".format(
+                instance.project.name, instance.get_project_role_display(), instance.granted_by.display_name),
+            'project', instance.project_id
+        )
+
+
+@receiver(post_save, sender=UserExperiment)
+def notify_experiment_membership(sender, instance, created, **kwargs):
+    """
+    users added to an experiment by someone else (ExperimentViewSet.membership)
+    """
+    if created and instance.granted_by_id != instance.user_id:
+        notify(
+            [instance.user_id], Notification.Kind.EXPERIMENT_MEMBERSHIP,
+            "You were added to experiment '{0}' by {1}".format(
+                instance.experiment.name, instance.granted_by.display_name),
+            'experiment', instance.experiment_id
+        )
+
+
+@receiver(pre_save, sender=AerpawExperiment)
+def remember_experiment_state(sender, instance, **kwargs):
+    """
+    state before the save (loaded values are kept by AuditModelMixin, queried otherwise)
+    """
+    if instance.pk is None:
+        instance._previous_state = None
+        return
+    loaded = instance.__dict__.get('_loaded_values') or {}
+    if 'experiment_state' in loaded:
+        instance._previous_state = loaded.get('experiment_state')
+    else:
+        instance._previous_state = AerpawExperiment.all_objects.filter(pk=instance.pk).values_list(
+            'experiment_state', flat=True).first()
+
+
+@receiver(post_save, sender=AerpawExperiment)
+def notify_experiment_state(sender, instance, created, **kwargs):
+    """
+    experiment state changes notify the experiment members (not the user who made the change)
+    """
+    previous = instance.__dict__.get('_previous_state')
+    if created or previous is None or previous == instance.experiment_state:
+        return
+    states = dict(AerpawExperiment.ExperimentState.choices)
+    # modified_by holds the username or the email of the acting user
+    actor_ids = AerpawUser.objects.filter(
+        Q(username=instance.modified_by) | Q(email=instance.modified_by)
+    ).values_list('id', flat=True) if instance.modified_by else []
+    notify(
+        set(experiment_user_ids(instance.pk)).difference(actor_ids), Notification.Kind.EXPERIMENT_STATE,
+        "Experiment '{0}' changed from {1} to {2}".format(
+            instance.name, states.get(previous, previous), states.get(instance.experiment_state)),
+        'experiment', instance.pk
+    )
@@ -0,0 +1,7 @@
+from portal.apps.notifications.digests import DIGEST_TASK, deliver_digest
+from portal.apps.tasks.queue import task
+
+
+@task(name=DIGEST_TASK, queue='notifications', max_attempts=5, retry_seconds=60)
+def deliver_digest_task(recipient_id: int):
+    deliver_digest(recipient_id)
@@ -18,11 +18,12 @@ class CanonicalNumberViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin,
     - current
     """
     permission_classes = [permissions.IsAuthenticated]
-    queryset = CanonicalNumber.objects.all().order_by('-created')
+    # detail lookups include soft deleted rows (returned flagged is_deleted), lists use get_queryset
+    queryset = CanonicalNumber.all_objects.all().order_by('-created')
     serializer_class = CanonicalNumberSerializerDetail
 
     def get_queryset(self):
-        queryset = CanonicalNumber.objects.filter(is_deleted=False).order_by('-created')
+        queryset = CanonicalNumber.objects.all().order_by('-created')
         return queryset
 
     def list(self, request, *args, **kwargs):
@@ -0,0 +1,125 @@
+import json
+from datetime import timedelta
+
+from django.core import serializers
+from django.db import transaction
+from django.utils import timezone
+
+from portal.apps.analytics.models import UsageDailyRollup
+from portal.apps.analytics.rollups import archive_experiment_usage, refresh_usage_days
+from portal.apps.experiments.models import AerpawExperiment, CanonicalExperimentResource, ExperimentSession, \
+    UserExperiment
+from portal.apps.operations.models import ArchivedRecord, CanonicalNumber
+from portal.apps.projects.models import AerpawProject, UserProject
+from portal.apps.resources.models import AerpawResource
+
+# constants
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_DELETED_AFTER_DAYS = 180
+
+
+def _archive(queryset) -> int:
+    """
+    copy the rows of queryset into ArchivedRecord and delete them
+    - returns the number of rows archived
+    """
+    rows = list(queryset)
+    if not rows:
+        return 0
+    records = json.loads(serializers.serialize('json', rows))
+    ArchivedRecord.objects.bulk_create([
+        ArchivedRecord(model_label=r.get('model'), object_id=r.get('pk'), record=r.get('fields'))
+        for r in records
+    ], batch_size=ARCHIVE_BATCH_SIZE)
+    queryset.model._base_manager.filter(pk__in=[row.pk for row in rows]).delete()
+    return len(rows)
+
+
+def _batches(queryset, batch_size: int):
+    """
+    yield lists of primary keys, at most batch_size each
+    """
+    ids = list(queryset.values_list('id', flat=True))
+    for i in range(0, len(ids), batch_size):
+        yield ids[i:i + batch_size]
+
+
+def _archive_experiments(ids: [int]) -> dict:
+    resource_links = AerpawExperiment.resources.through
+    # session usage moves to archived rollup rows while the sessions and resource links are still there,
+    # then the live rows of those days are recomputed without the archived sessions
+    days = archive_experiment_usage(ids)
+    counts = {
+        'experiment_resources': _archive(resource_links.objects.filter(aerpawexperiment_id__in=ids)),
+        'canonical_experiment_resources': _archive(CanonicalExperimentResource.objects.filter(experiment_id__in=ids)),
+        'experiment_sessions': _archive(ExperimentSession.objects.filter(experiment_id__in=ids)),
+        'user_experiments': _archive(UserExperiment.objects.filter(experiment_id__in=ids)),
+        'experiments': _archive(AerpawExperiment.all_objects.filter(id__in=ids))
+    }
+    refresh_usage_days(days)
+    return counts
+
+
+def _archive_projects(ids: [int]) -> dict:
+    return {
+        'user_projects': _archive(UserProject.objects.filter(project_id__in=ids)),
+        'usage_daily_rollups': _archive(UsageDailyRollup.objects.filter(project_id__in=ids)),
+        'projects': _archive(AerpawProject.all_objects.filter(id__in=ids))
+    }
+
+
+def _archive_resources(ids: [int]) -> dict:
+    return {
+        'resources': _archive(AerpawResource.all_objects.filter(id__in=ids))
+    }
+
+
+def _archive_canonical_numbers(ids: [int]) -> dict:
+    return {
+        'canonical_numbers': _archive(CanonicalNumber.all_objects.filter(id__in=ids))
+    }
+
+
+def archive_deleted(days: int = ARCHIVE_DELETED_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE,
+                    dry_run: bool = False) -> dict:
+    """
+    move rows soft deleted more than `days` ago (and their memberships) into ArchivedRecord
+    - experiments first, then projects / resources / canonical numbers no longer referenced
+    - the usage of archived sessions is kept in archived rollup rows (not recomputed by refreshes),
+      the usage rollups of a project are archived with it (its usage history is not dropped)
+    - each batch is archived in its own transaction
+    - returns the number of rows archived (or eligible when dry_run) per table
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    stages = [
+        (
+            AerpawExperiment.all_objects.filter(is_deleted=True, modified__lt=cutoff),
+            _archive_experiments
+        ),
+        (
+            AerpawProject.all_objects.filter(
+                is_deleted=True, modified__lt=cutoff, experiment_project__isnull=True),
+            _archive_projects
+        ),
+        (
+            AerpawResource.all_objects.filter(
+                is_deleted=True, modified__lt=cutoff, cer_resource__isnull=True,
+                experiment_resources__isnull=True),
+            _archive_resources
+        ),
+        (
+            CanonicalNumber.all_objects.filter(
+                is_deleted=True, modified__lt=cutoff, canonical_experiment_number__isnull=True),
+            _archive_canonical_numbers
+        )
+    ]
+    totals = {}
+    for queryset, archive_batch in stages:
+        if dry_run:
+            totals[queryset.model._meta.label] = queryset.count()
+            continue
+        for ids in _batches(queryset.order_by('id'), batch_size):
+            with transaction.atomic():
+                for table, count in archive_batch(ids).items():
+                    totals[table] = totals.get(table, 0) + count
+    return totals
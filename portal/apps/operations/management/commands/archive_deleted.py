@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from portal.apps.operations.archive import ARCHIVE_BATCH_SIZE, ARCHIVE_DELETED_AFTER_DAYS, archive_deleted
+
+
+class Command(BaseCommand):
+    help = 'Move long soft deleted projects, experiments, resources and canonical numbers into the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=ARCHIVE_DELETED_AFTER_DAYS,
+                            help='archive rows deleted more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE,
+                            help='rows archived per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='only report the rows eligible for archival')
+
+    def handle(self, *args, **options):
+        totals = archive_deleted(
+            days=options.get('days'),
+            batch_size=options.get('batch_size'),
+            dry_run=options.get('dry_run')
+        )
+        prefix = 'archive_deleted (dry run)' if options.get('dry_run') else 'archive_deleted'
+        for table, count in totals.items():
+            self.stdout.write('{0}: {1} {2}'.format(prefix, count, table))
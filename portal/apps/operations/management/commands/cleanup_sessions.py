@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from portal.server.sessions import SESSION_CLEANUP_BATCH_SIZE, SessionStore
+
+
+class Command(BaseCommand):
+    help = 'Delete expired login sessions in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SESSION_CLEANUP_BATCH_SIZE,
+                            help='sessions deleted per statement')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='seconds to wait between batches')
+
+    def handle(self, *args, **options):
+        deleted = SessionStore.clear_expired(batch_size=options.get('batch_size'), pause=options.get('pause'))
+        self.stdout.write('cleanup_sessions: {0} expired sessions deleted'.format(deleted))
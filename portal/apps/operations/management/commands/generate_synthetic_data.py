@@ -0,0 +1,357 @@
+import csv
+import io
+import json
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from uuid import UUID
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from portal.apps.analytics.rollups import refresh_usage_rollups
+from portal.apps.experiments.models import AerpawExperiment, CanonicalExperimentResource, ExperimentSession, \
+    UserExperiment
+from portal.apps.operations.models import MAX_CANONICAL_NUMBER, CanonicalNumber, set_current_canonical_number
+from portal.apps.profiles.models import AerpawUserProfile
+from portal.apps.projects.models import AerpawProject, UserProject
+from portal.apps.resources.models import AerpawResource
+from portal.apps.users.authentication import PortalRefreshToken
+from portal.apps.users.models import AerpawRolesEnum, AerpawUser
+
+# constants
+SYNTHETIC_CREATED_BY = 'synthetic@example.org'
+SYNTHETIC_EMAIL = 'synthetic-user-{0:06d}@example.org'
+SYNTHETIC_HISTORY_DAYS = 365
+COPY_MIN_ROWS = 1000
+WORDS = [
+    'aerial', 'antenna', 'array', 'beam', 'channel', 'corridor', 'drone', 'edge', 'field', 'flight', 'grid',
+    'handover', 'link', 'mesh', 'mobility', 'network', 'orbit', 'path', 'radio', 'relay', 'rover', 'sensor',
+    'signal', 'spectrum', 'swarm', 'tower', 'tracking', 'uplink', 'vehicle', 'wireless'
+]
+
+
+@contextmanager
+def _explicit_timestamps(model):
+    """
+    let synthetic created / modified values through (auto_now and auto_now_add are suspended)
+    """
+    fields = [f for f in model._meta.concrete_fields if getattr(f, 'auto_now', False) or
+              getattr(f, 'auto_now_add', False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def _copy(model, objs: list):
+    """
+    PostgreSQL COPY of fully populated (primary keys included) model instances
+    """
+    fields = model._meta.concrete_fields
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for obj in objs:
+        row = []
+        for f in fields:
+            value = f.get_db_prep_save(getattr(obj, f.attname), connection)
+            row.append('\\N' if value is None else value)
+        writer.writerow(row)
+    buffer.seek(0)
+    columns = ', '.join(connection.ops.quote_name(f.column) for f in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            "COPY {0} ({1}) FROM STDIN WITH (FORMAT csv, NULL '\\N')".format(
+                connection.ops.quote_name(model._meta.db_table), columns),
+            buffer
+        )
+
+
+class Command(BaseCommand):
+    help = 'Generate seeded synthetic users, projects, experiments, resources and sessions at configurable scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--projects', type=int, default=100)
+        parser.add_argument('--experiments-per-project', type=int, default=5, help='average')
+        parser.add_argument('--members-per-project', type=int, default=8, help='average')
+        parser.add_argument('--resources', type=int, default=60)
+        parser.add_argument('--resources-per-experiment', type=int, default=3, help='average')
+        parser.add_argument('--sessions-per-experiment', type=int, default=20, help='average')
+        parser.add_argument('--deleted-fraction', type=float, default=0.03,
+                            help='fraction of projects / experiments / resources flagged is_deleted')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--no-copy', action='store_true', help='use bulk_create even on PostgreSQL')
+        parser.add_argument('--no-rollups', action='store_true', help='skip the usage rollup rebuild')
+        parser.add_argument('--tokens-file', type=str, default=None,
+                            help='write API access tokens of synthetic users (JSON) for the load test suite')
+        parser.add_argument('--tokens', type=int, default=50, help='number of users in --tokens-file')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options.get('seed'))
+        self.batch_size = options.get('batch_size')
+        self.use_copy = connection.vendor == 'postgresql' and not options.get('no_copy')
+        self.deleted_fraction = options.get('deleted_fraction')
+        self.now = timezone.now()
+        self.next_ids = {}
+        if AerpawUser.objects.filter(created_by=SYNTHETIC_CREATED_BY).exists():
+            raise CommandError('synthetic data already present (users created_by {0})'.format(SYNTHETIC_CREATED_BY))
+        with transaction.atomic():
+            users = self._users(options.get('users'))
+            resources = self._resources(users, options.get('resources'))
+            projects = self._projects(users, options.get('projects'), options.get('members_per_project'))
+            experiments = self._experiments(
+                users, projects, resources,
+                options.get('experiments_per_project'), options.get('resources_per_experiment'))
+            self._sessions(experiments, options.get('sessions_per_experiment'))
+            self._reset_sequences()
+        if experiments:
+            set_current_canonical_number(self._canonical_number(len(experiments)))
+        if not options.get('no_rollups'):
+            self.stdout.write('generate_synthetic_data: refreshing usage rollups')
+            refresh_usage_rollups(full=True)
+        if options.get('tokens_file'):
+            self._write_tokens(users, options.get('tokens_file'), options.get('tokens'))
+        self.stdout.write('generate_synthetic_data: done')
+
+    # helpers
+
+    def _uuid(self) -> str:
+        return str(UUID(int=self.rng.getrandbits(128), version=4))
+
+    def _words(self, count: int) -> str:
+        return ' '.join(self.rng.choice(WORDS) for _ in range(count))
+
+    def _past(self, days: int = SYNTHETIC_HISTORY_DAYS):
+        return self.now - timedelta(seconds=self.rng.randint(0, days * 86400))
+
+    def _canonical_number(self, index: int) -> int:
+        """
+        canonical number of the index-th synthetic experiment: numbers after the largest one in use,
+        wrapping around at MAX_CANONICAL_NUMBER
+        """
+        return (self.canonical_start + index) % MAX_CANONICAL_NUMBER + 1
+
+    def _deleted(self) -> bool:
+        return self.rng.random() < self.deleted_fraction
+
+    def _assign_ids(self, model, objs: list):
+        if model not in self.next_ids:
+            self.next_ids[model] = (model._base_manager.aggregate(m=Max('id')).get('m') or 0) + 1
+        for obj in objs:
+            obj.id = self.next_ids[model]
+            self.next_ids[model] += 1
+
+    def _insert(self, model, objs: list):
+        """
+        insert with preassigned ids: COPY on PostgreSQL for large sets, bulk_create otherwise
+        """
+        if not objs:
+            return
+        if getattr(objs[0], 'id', None) is None:
+            self._assign_ids(model, objs)
+        for f in model._meta.concrete_fields:
+            if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False):
+                for obj in objs:
+                    if getattr(obj, f.attname) is None:
+                        setattr(obj, f.attname, self.now)
+        with _explicit_timestamps(model):
+            if self.use_copy and len(objs) >= COPY_MIN_ROWS:
+                _copy(model, objs)
+            else:
+                model._base_manager.bulk_create(objs, batch_size=self.batch_size)
+        self.stdout.write('generate_synthetic_data: {0} {1}'.format(len(objs), model._meta.label))
+
+    def _write_tokens(self, users: list, path: str, count: int):
+        """
+        access tokens of a sample of synthetic users (operators first)
+        """
+        ordered = sorted(users, key=lambda u: AerpawRolesEnum.OPERATOR.value not in u.synthetic_roles)
+        tokens = [
+            {
+                'user_id': user.id,
+                'username': user.username,
+                'roles': user.synthetic_roles,
+                'access_token': str(PortalRefreshToken.for_user(user).access_token)
+            } for user in ordered[:count]
+        ]
+        with open(path, 'w') as file:
+            json.dump(tokens, file, indent=2)
+        self.stdout.write('generate_synthetic_data: {0} access tokens written to {1}'.format(len(tokens), path))
+
+    def _reset_sequences(self):
+        statements = connection.ops.sequence_reset_sql(no_style(), list(self.next_ids.keys()))
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    # generators
+
+    def _users(self, count: int) -> [AerpawUser]:
+        password = make_password(None)
+        groups = {g.name: g.id for g in Group.objects.all()}
+        profiles = [
+            AerpawUserProfile(created_by=SYNTHETIC_CREATED_BY, modified_by=SYNTHETIC_CREATED_BY, uuid=self._uuid())
+            for _ in range(count)
+        ]
+        self._insert(AerpawUserProfile, profiles)
+        users = []
+        for i, profile in enumerate(profiles, start=1):
+            email = SYNTHETIC_EMAIL.format(i)
+            first, last = self.rng.choice(WORDS).title(), self.rng.choice(WORDS).title()
+            created = self._past()
+            users.append(AerpawUser(
+                username=email, email=email, password=password, first_name=first, last_name=last,
+                display_name='{0} {1}'.format(first, last), date_joined=created, created=created,
+                created_by=SYNTHETIC_CREATED_BY, modified_by=SYNTHETIC_CREATED_BY, is_active=True,
+                openid_sub='synthetic-{0}'.format(i), profile_id=profile.id, uuid=self._uuid()
+            ))
+        self._insert(AerpawUser, users)
+        user_groups = []
+        for user in users:
+            roles = [AerpawRolesEnum.EXPERIMENTER.value]
+            if self.rng.random() < 0.15:
+                roles.append(AerpawRolesEnum.PI.value)
+            if self.rng.random() < 0.02:
+                roles.append(AerpawRolesEnum.OPERATOR.value)
+            user.synthetic_roles = roles
+            user_groups.extend(
+                AerpawUser.groups.through(aerpawuser_id=user.id, group_id=groups.get(r)) for r in roles
+                if r in groups)
+        self._insert(AerpawUser.groups.through, user_groups)
+        return users
+
+    def _resources(self, users: list, count: int) -> [AerpawResource]:
+        # resources are maintained by the operators, created_by / modified_by hold their username
+        operators = [u for u in users if AerpawRolesEnum.OPERATOR.value in u.synthetic_roles] or users
+        types = [t for t, _ in AerpawResource.ResourceType.choices]
+        resources = []
+        for i in range(1, count + 1):
+            operator = self.rng.choice(operators)
+            resource_type = self.rng.choices(types, weights=[6, 4, 2, 2, 1, 1])[0]
+            resources.append(AerpawResource(
+                name='{0}-{1:04d}'.format(resource_type, i), description=self._words(8),
+                hostname='node-{0:04d}.synthetic.local'.format(i), ip_address='10.{0}.{1}.{2}'.format(
+                    i // 65536 % 256, i // 256 % 256, i % 256),
+                is_active=self.rng.random() < 0.9, is_deleted=self._deleted(), location=self._words(2).title(),
+                resource_class=self.rng.choice([c for c, _ in AerpawResource.ResourceClass.choices]),
+                resource_mode=self.rng.choice([m for m, _ in AerpawResource.ResourceMode.choices]),
+                resource_type=resource_type, created=self._past(), created_by=operator.username,
+                modified_by=operator.username, uuid=self._uuid()
+            ))
+        self._insert(AerpawResource, resources)
+        return resources
+
+    def _projects(self, users: list, count: int, members_per_project: int) -> [AerpawProject]:
+        pis = [u for u in users if AerpawRolesEnum.PI.value in u.synthetic_roles] or users
+        projects = []
+        memberships = []
+        for i in range(1, count + 1):
+            creator = self.rng.choice(pis)
+            projects.append(AerpawProject(
+                name='Project {0} {1:05d}'.format(self._words(2).title(), i), description=self._words(20),
+                is_public=self.rng.random() < 0.3, is_deleted=self._deleted(), project_creator_id=creator.id,
+                created=self._past(), created_by=creator.username, modified_by=creator.username,
+                uuid=self._uuid()
+            ))
+        self._insert(AerpawProject, projects)
+        for project in projects:
+            creator_id = project.project_creator_id
+            members = {creator_id}
+            size = max(1, int(self.rng.expovariate(1 / members_per_project)))
+            members.update(u.id for u in self.rng.sample(users, min(size, len(users))))
+            project.synthetic_members = sorted(members)
+            for user_id in project.synthetic_members:
+                role = UserProject.RoleType.PROJECT_OWNER if user_id == creator_id or self.rng.random() < 0.1 \
+                    else UserProject.RoleType.PROJECT_MEMBER
+                memberships.append(UserProject(
+                    project_id=project.id, user_id=user_id, granted_by_id=creator_id, project_role=role,
+                    granted_date=project.created
+                ))
+        self._insert(UserProject, memberships)
+        return projects
+
+    def _experiments(self, users: list, projects: list, resources: list, per_project: int,
+                     resources_per_experiment: int):
+        states = [s for s, _ in AerpawExperiment.ExperimentState.choices]
+        usernames = {u.id: u.username for u in users}
+        canonical_numbers = []
+        experiments = []
+        self.canonical_start = CanonicalNumber.all_objects.aggregate(
+            m=Max('canonical_number')).get('m') or 0
+        for project in projects:
+            for _ in range(self.rng.randint(0, 2 * per_project)):
+                number = self._canonical_number(len(experiments))
+                canonical_numbers.append(CanonicalNumber(canonical_number=number, created=project.created))
+                creator_id = self.rng.choice(project.synthetic_members)
+                creator = usernames.get(creator_id)
+                experiments.append(AerpawExperiment(
+                    name='Experiment {0} {1:06d}'.format(self._words(2).title(), len(experiments) + 1),
+                    description=self._words(20), project_id=project.id, experiment_creator_id=creator_id,
+                    experiment_state=self.rng.choice(states), is_deleted=project.is_deleted or self._deleted(),
+                    created=self._past(), created_by=creator, modified_by=creator, uuid=self._uuid()
+                ))
+        self._insert(CanonicalNumber, canonical_numbers)
+        for experiment, canonical_number in zip(experiments, canonical_numbers):
+            experiment.canonical_number_id = canonical_number.id
+        self._insert(AerpawExperiment, experiments)
+        links = []
+        cers = []
+        members = []
+        project_members = {p.id: p.synthetic_members for p in projects}
+        for experiment in experiments:
+            chosen = self.rng.sample(resources, min(len(resources), self.rng.randint(1, 2 * resources_per_experiment)))
+            for node_number, resource in enumerate(chosen, start=1):
+                links.append(AerpawExperiment.resources.through(
+                    aerpawexperiment_id=experiment.id, aerpawresource_id=resource.id))
+                cers.append(CanonicalExperimentResource(
+                    experiment_id=experiment.id, resource_id=resource.id, experiment_node_number=node_number,
+                    node_type=self.rng.choice([t for t, _ in CanonicalExperimentResource.NodeType.choices]),
+                    node_uhd=self.rng.choice([u for u, _ in CanonicalExperimentResource.NodeUhd.choices]),
+                    node_vehicle=self.rng.choice([v for v, _ in CanonicalExperimentResource.NodeVehicle.choices]),
+                    created=experiment.created, uuid=self._uuid()
+                ))
+            candidates = project_members.get(experiment.project_id)
+            experiment_members = {experiment.experiment_creator_id}
+            experiment_members.update(self.rng.sample(candidates, self.rng.randint(0, min(4, len(candidates)))))
+            for user_id in sorted(experiment_members):
+                members.append(UserExperiment(
+                    experiment_id=experiment.id, user_id=user_id, granted_by_id=experiment.experiment_creator_id,
+                    granted_date=experiment.created
+                ))
+        self._insert(AerpawExperiment.resources.through, links)
+        self._insert(CanonicalExperimentResource, cers)
+        self._insert(UserExperiment, members)
+        return experiments
+
+    def _sessions(self, experiments: list, per_experiment: int):
+        session_types = [t for t, _ in ExperimentSession.SessionType.choices]
+        sessions = []
+        for experiment in experiments:
+            count = self.rng.randint(0, 2 * per_experiment)
+            for i in range(count):
+                created = self._past((self.now - experiment.created).days or 1)
+                open_session = i == count - 1 and self.rng.random() < 0.1
+                end = None if open_session else min(
+                    self.now, created + timedelta(minutes=self.rng.randint(5, 8 * 60)))
+                sessions.append(ExperimentSession(
+                    experiment_id=experiment.id, session_type=self.rng.choice(session_types),
+                    started_by_id=experiment.experiment_creator_id,
+                    ended_by_id=None if open_session else experiment.experiment_creator_id,
+                    created=created, end_date_time=end, uuid=self._uuid()
+                ))
+                if len(sessions) >= self.batch_size * 10:
+                    self._insert(ExperimentSession, sessions)
+                    sessions = []
+        self._insert(ExperimentSession, sessions)
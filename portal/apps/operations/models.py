@@ -1,13 +1,18 @@
 import json
+import logging
 import os
+import zlib
 from datetime import datetime, timezone
 
-from django.db import models
+from django.db import connection, models
 
-from portal.apps.mixins.models import BaseModel, BaseTimestampModel
+from portal.apps.mixins.models import BaseModel, BaseTimestampModel, LiveManager
 from portal.server.settings import BASE_DIR
 
+logger = logging.getLogger(__name__)
+
 # constants
+CANONICAL_NUMBER_LOCK = zlib.crc32(b'portal.apps.operations.canonical_number')
 MAX_CANONICAL_NUMBER = 9999
 CANONICAL_NUMBER_JSON = 'apps/operations/current-canonical-number.json'
 
@@ -16,7 +21,6 @@ current_canonical_number = 0
 
 
 def _read_current_canonical_number() -> int:
-    print('### read_current_canonical_number()')
     try:
         file_path = os.path.join(BASE_DIR, CANONICAL_NUMBER_JSON)
         with open(file_path, "r") as file:
@@ -24,13 +28,12 @@ def _read_current_canonical_number() -> int:
         if file_dict.get('current_canonical_number', None):
             return int(file_dict.get('current_canonical_number'))
     except Exception as exc:
-        print(exc)
+        logger.warning('unable to read current canonical number: %s', exc)
 
     return 0
 
 
 def _write_current_canonical_number(canonical_number: int):
-    print('### write_current_canonical_number()')
     file_path = os.path.join(BASE_DIR, CANONICAL_NUMBER_JSON)
     file_dict = {
         "current_canonical_number": canonical_number,
@@ -39,12 +42,13 @@ def _write_current_canonical_number(canonical_number: int):
     file_json = json.dumps(file_dict, indent=4)
     with open(file_path, "w") as file:
         file.write(file_json)
+    logger.debug('current canonical number set to %d', canonical_number)
 
 
 def get_current_canonical_number() -> int:
     global current_canonical_number
     current_canonical_number = _read_current_canonical_number()
-    if CanonicalNumber.objects.filter(canonical_number=current_canonical_number, is_deleted=False).exists() or \
+    if CanonicalNumber.objects.filter(canonical_number=current_canonical_number).exists() or \
             int(current_canonical_number) < 1 or int(current_canonical_number) > 9999:
         return increment_current_canonical_number()
     _write_current_canonical_number(current_canonical_number)
@@ -63,12 +67,40 @@ def increment_current_canonical_number() -> int:
     current_canonical_number += 1
     if current_canonical_number < 1 or current_canonical_number > 9999:
         current_canonical_number = 1
-    while CanonicalNumber.objects.filter(canonical_number=current_canonical_number, is_deleted=False).exists():
+    while CanonicalNumber.objects.filter(canonical_number=current_canonical_number).exists():
         current_canonical_number += 1
     _write_current_canonical_number(current_canonical_number)
     return current_canonical_number
 
 
+def allocate_canonical_numbers(count: int) -> [int]:
+    """
+    reserve the next `count` unused canonical numbers
+    - one query for the numbers in use and one read/write of the current number file
+    - call in a transaction that also creates the CanonicalNumber rows: concurrent allocations are
+      serialized until it commits (PostgreSQL advisory lock)
+    """
+    global current_canonical_number
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [CANONICAL_NUMBER_LOCK])
+    used = set(CanonicalNumber.objects.values_list('canonical_number', flat=True))
+    if count > MAX_CANONICAL_NUMBER - len(used):
+        raise ValueError('unable to allocate {0} canonical numbers'.format(count))
+    number = _read_current_canonical_number()
+    numbers = []
+    while len(numbers) < count:
+        if number < 1 or number > MAX_CANONICAL_NUMBER:
+            number = 1
+        if number not in used:
+            numbers.append(number)
+            used.add(number)
+        number += 1
+    current_canonical_number = number
+    _write_current_canonical_number(current_canonical_number)
+    return numbers
+
+
 class CanonicalNumber(BaseModel, BaseTimestampModel, models.Model):
     """
     Canonical Number
@@ -84,5 +116,33 @@ class CanonicalNumber(BaseModel, BaseTimestampModel, models.Model):
     is_deleted = models.BooleanField(default=False)
     is_retired = models.BooleanField(default=False)
 
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        # reverse relations, admin and dumpdata include soft deleted rows
+        default_manager_name = 'all_objects'
+
     def timestamp(self) -> int:
         return int(round(datetime.strptime(str(self.created), "%Y-%m-%d %H:%M:%S.%f%z").timestamp()))
+
+
+class ArchivedRecord(BaseModel, models.Model):
+    """
+    Archived Record: serialized copy of a long soft deleted row (and its memberships)
+    - archived_date
+    - id (from Basemodel)
+    - model_label
+    - object_id
+    - record
+    """
+
+    archived_date = models.DateTimeField(auto_now_add=True)
+    model_label = models.CharField(max_length=255)
+    object_id = models.IntegerField()
+    record = models.JSONField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model_label', 'object_id'])
+        ]
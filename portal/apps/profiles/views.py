@@ -3,7 +3,7 @@ from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
 
 from portal.apps.users.api.viewsets import UserViewSet
-from portal.apps.users.oidc_users import get_tokens_for_user, refresh_access_token_for_user
+from portal.apps.users.tokens import issue_access_token, issue_tokens, token_summary
 from portal.server.settings import DEBUG
 
 
@@ -17,15 +17,17 @@ def profile(request):
     message = None
     user = request.user
     user_data = UserViewSet()
+    # tokens are not stored: newly issued tokens are shown once, otherwise only their expiry
+    user_tokens = token_summary(user)
     if request.method == 'POST':
         try:
             if request.POST.get('display_name'):
                 request.data = {'display_name': request.POST.get('display_name')}
                 user_data.update(request, pk=user.id)
             if request.POST.get('authorization_token'):
-                get_tokens_for_user(user)
+                user_tokens = issue_tokens(user)
             if request.POST.get('refresh_access_token'):
-                refresh_access_token_for_user(user)
+                user_tokens.update(issue_access_token(user))
         except Exception as exc:
             message = exc
     return render(request,
@@ -33,7 +35,7 @@ def profile(request):
                   {
                       'user': user,
                       'user_data': user_data.retrieve(request=request, pk=request.user.id).data,
-                      'user_tokens': user_data.tokens(request=request, pk=request.user.id).data,
+                      'user_tokens': user_tokens,
                       'message': message,
                       'debug': DEBUG
                   })
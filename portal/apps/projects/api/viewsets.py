@@ -12,6 +12,9 @@ from rest_framework.viewsets import GenericViewSet
 
 from portal.apps.experiments.api.serializers import ExperimentSerializerDetail
 from portal.apps.experiments.models import AerpawExperiment
+from portal.apps.mixins.api.batch import BatchMixin
+from portal.apps.mixins.api.exports import ExportMixin
+from portal.apps.mixins.api.fields import SparseFieldsMixin
 from portal.apps.projects.api.serializers import ProjectSerializerDetail, ProjectSerializerList, UserProjectSerializer
 from portal.apps.projects.models import AerpawProject, UserProject
 from portal.apps.users.models import AerpawUser
@@ -21,7 +24,8 @@ PROJECT_MIN_NAME_LEN = 5
 PROJECT_MIN_DESC_LEN = 5
 
 
-class ProjectViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateModelMixin):
+class ProjectViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateModelMixin, ExportMixin,
+                     SparseFieldsMixin, BatchMixin):
     """
     AERPAW Projects
     - paginated list
@@ -30,10 +34,25 @@ class ProjectViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateM
     - update
     - delete
     - experiments
+    - export
+    - batch
     """
     permission_classes = [permissions.IsAuthenticated]
-    queryset = AerpawProject.objects.all().order_by('name').distinct()
+    # detail lookups include soft deleted rows (returned flagged is_deleted), lists use get_queryset
+    queryset = AerpawProject.all_objects.all().order_by('name').distinct()
     serializer_class = ProjectSerializerList
+    export_name = 'projects'
+    export_fields = [
+        ('created_date', 'created'),
+        ('description', 'description'),
+        ('is_public', 'is_public'),
+        ('name', 'name'),
+        ('project_creator', 'project_creator_id'),
+        ('project_id', 'id')
+    ]
+    sparse_fields = export_fields
+    sparse_id_field = 'project_id'
+    expandable = ['creator', 'members']
 
     def get_queryset(self):
         search = self.request.query_params.get('search', None)
@@ -41,19 +60,18 @@ class ProjectViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateM
         if search:
             if user.is_operator():
                 queryset = AerpawProject.objects.filter(
-                    is_deleted=False, name__icontains=search).order_by('name').distinct()
+                    name__icontains=search).order_by('name').distinct()
             else:
                 queryset = AerpawProject.objects.filter(
-                    Q(is_deleted=False, name__icontains=search) &
+                    Q(name__icontains=search) &
                     (Q(is_public=True) | Q(project_membership__email__in=[user.email]) | Q(project_creator=user))
                 ).order_by('name').distinct()
         else:
             if user.is_operator():
-                queryset = AerpawProject.objects.filter(is_deleted=False).order_by('name').distinct()
+                queryset = AerpawProject.objects.all().order_by('name').distinct()
             else:
                 queryset = AerpawProject.objects.filter(
-                    Q(is_deleted=False) &
-                    (Q(is_public=True) | Q(project_membership__email__in=[user.email]) | Q(project_creator=user))
+                    Q(is_public=True) | Q(project_membership__email__in=[user.email]) | Q(project_creator=user)
                 ).order_by('name').distinct()
         return queryset
 
@@ -67,10 +85,18 @@ class ProjectViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateM
         - project_creator (fk)   - user_ID
         - project_id (pk)        - integer
 
+        Parameters (optional):
+        - fields                 - comma separated subset of the fields above (only those columns are read)
+        - expand                 - comma separated: creator, members
+
         Permission:
         - active users
         """
         if request.user.is_active:
+            fields = self.requested_fields(request)
+            expand = self.requested_expand(request)
+            if fields:
+                return self.sparse_list(self.get_queryset(), fields, expand)
             page = self.paginate_queryset(self.get_queryset())
             if page:
                 serializer = ProjectSerializerList(page, many=True)
@@ -99,6 +125,7 @@ class ProjectViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateM
                         'project_id': du.get('project_id')
                     }
                 )
+            response_data = self.expand_rows(response_data, expand)
             if page:
                 return self.get_paginated_response(response_data)
             else:
@@ -167,6 +194,10 @@ class ProjectViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateM
         - project_members (fk)   - array of integer
         - project_owners (fk)    - array of integer
 
+        Parameters (optional, project members and operators):
+        - fields                 - comma separated subset of the list fields (only those columns are read)
+        - expand                 - comma separated: creator, members
+
         Permission:
         - user is_creator OR
         - user is_project_member OR
@@ -176,6 +207,10 @@ class ProjectViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateM
         project = get_object_or_404(self.queryset, pk=kwargs.get('pk'))
         if project.is_creator(request.user) or project.is_member(request.user) or \
                 project.is_owner(request.user) or request.user.is_operator():
+            fields = self.requested_fields(request)
+            expand = self.requested_expand(request)
+            if fields:
+                return self.sparse_retrieve(self.queryset, project.id, fields, expand)
             serializer = ProjectSerializerDetail(project)
             du = dict(serializer.data)
             project_members = []
@@ -213,7 +248,7 @@ class ProjectViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateM
             }
             if project.is_deleted:
                 response_data['is_deleted'] = du.get('is_deleted')
-            return Response(response_data)
+            return Response(self.expand_rows([response_data], expand)[0])
         elif request.user.is_active:
             if project.is_public:
                 serializer = ProjectSerializerDetail(project)
@@ -244,6 +279,29 @@ class ProjectViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateM
             raise PermissionDenied(
                 detail="PermissionDenied: unable to GET /projects/{0} details".format(kwargs.get('pk')))
 
+    def expand_creator(self, ids: list) -> dict:
+        return {
+            p.get('id'): {'display_name': p.get('project_creator__display_name'),
+                          'user_id': p.get('project_creator_id')}
+            for p in AerpawProject.all_objects.filter(id__in=ids).values(
+                'id', 'project_creator_id', 'project_creator__display_name')
+        }
+
+    def expand_members(self, ids: list) -> dict:
+        # membership of public projects is only listed to their members and operators
+        user = self.request.user
+        if not user.is_operator():
+            ids = set(UserProject.objects.filter(project_id__in=ids, user_id=user.id).values_list(
+                'project_id', flat=True)) | set(AerpawProject.all_objects.filter(
+                    id__in=ids, project_creator_id=user.id).values_list('id', flat=True))
+        members = {i: [] for i in ids}
+        for m in UserProject.objects.filter(project_id__in=ids).order_by('user__display_name').values(
+                'project_id', 'project_role', 'user_id', 'user__display_name'):
+            members[m.get('project_id')].append(
+                {'display_name': m.get('user__display_name'), 'project_role': m.get('project_role'),
+                 'user_id': m.get('user_id')})
+        return members
+
     def update(self, request, *args, **kwargs):
         """
         PUT: update existing project
@@ -1,15 +1,18 @@
+import logging
+
 from django import template
 
 from portal.apps.projects.models import AerpawProject
 
+logger = logging.getLogger(__name__)
 register = template.Library()
 
 
 @register.filter
 def id_to_project_name(project_id):
     try:
-        project = AerpawProject.objects.get(pk=int(project_id))
+        project = AerpawProject.all_objects.get(pk=int(project_id))
         return project.name
     except Exception as exc:
-        print(exc)
+        logger.warning(exc)
         return 'not found'
@@ -1,3 +1,4 @@
+import logging
 from urllib.parse import parse_qs, urlparse
 
 from django.contrib.auth.decorators import login_required
@@ -11,6 +12,8 @@ from portal.apps.projects.forms import ProjectCreateForm, ProjectMembershipForm
 from portal.apps.projects.models import AerpawProject
 from portal.server.settings import DEBUG, REST_FRAMEWORK
 
+logger = logging.getLogger(__name__)
+
 
 @csrf_exempt
 @login_required
@@ -51,7 +54,7 @@ def project_list(request):
                 try:
                     prev_page = prev_dict['page'][0]
                 except Exception as exc:
-                    print(exc)
+                    logger.debug(exc)
                     prev_page = 1
             next_url = projects.get('next', None)
             if next_url:
@@ -59,7 +62,7 @@ def project_list(request):
                 try:
                     next_page = next_dict['page'][0]
                 except Exception as exc:
-                    print(exc)
+                    logger.debug(exc)
                     next_page = 1
             count = int(projects.get('count'))
             min_range = int(current_page - 1) * int(REST_FRAMEWORK['PAGE_SIZE']) + 1
@@ -1,15 +1,25 @@
+import csv
+import io
 from uuid import uuid4
 
+from django.db import transaction
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import permissions
 from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.mixins import ListModelMixin, RetrieveModelMixin, UpdateModelMixin
 from rest_framework.response import Response
-from rest_framework.status import HTTP_204_NO_CONTENT
+from rest_framework.status import HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST
 from rest_framework.viewsets import GenericViewSet
 
+from portal.apps.audit.history import audit_instances
+from portal.apps.changes.feed import record_changes
+from portal.apps.changes.models import ChangeEvent
+from portal.apps.mixins.api.batch import BatchMixin
+from portal.apps.mixins.api.exports import ExportMixin
+from portal.apps.mixins.api.fields import SparseFieldsMixin
 from portal.apps.resources.api.serializers import ResourceSerializerDetail, ResourceSerializerList
 from portal.apps.resources.models import AerpawResource
 from portal.apps.users.models import AerpawUser
@@ -19,9 +29,160 @@ RESOURCE_MIN_NAME_LEN = 3
 RESOURCE_MIN_DESC_LEN = 5
 RESOURCE_MIN_HOSTNAME_LEN = 5
 RESOURCE_MIN_LOCATION_LEN = 3
+RESOURCE_BULK_MAX_ROWS = 1000
+RESOURCE_BULK_BATCH_SIZE = 500
+RESOURCE_UPDATE_FIELDS = ['description', 'hostname', 'ip_address', 'is_active', 'location', 'modified',
+                          'modified_by', 'name', 'ops_notes', 'resource_class', 'resource_mode', 'resource_type']
 
 
-class ResourceViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateModelMixin):
+def _validate_new_resource(data) -> dict:
+    """
+    validate the fields of a new resource, returns the cleaned field values
+    - raises ValidationError on the first invalid field
+    """
+    # validate description
+    description = data.get('description', None)
+    if not description or len(description) < RESOURCE_MIN_DESC_LEN:
+        raise ValidationError(
+            detail="description:  must be at least {0} chars long".format(RESOURCE_MIN_DESC_LEN))
+    # validate hostname
+    hostname = data.get('hostname', None)
+    if hostname and len(hostname) < RESOURCE_MIN_HOSTNAME_LEN:
+        raise ValidationError(
+            detail="hostname:  must be at least {0} chars long".format(RESOURCE_MIN_HOSTNAME_LEN))
+    # validate ip_address
+    ip_address = data.get('ip_address', None)
+    # validate is_active
+    is_active = str(data.get('is_active')).casefold() == 'true'
+    # validate location
+    location = data.get('location', None)
+    if location and len(location) < RESOURCE_MIN_LOCATION_LEN:
+        raise ValidationError(
+            detail="location:  must be at least {0} chars long".format(RESOURCE_MIN_LOCATION_LEN))
+    # validate name
+    name = data.get('name', None)
+    if name and len(name) < RESOURCE_MIN_NAME_LEN:
+        raise ValidationError(
+            detail="name: must be at least {0} chars long".format(RESOURCE_MIN_NAME_LEN))
+    # validate ops_notes
+    ops_notes = data.get('ops_notes', None)
+    # validate resource_class
+    resource_class = data.get('resource_class', None)
+    if resource_class not in [c[0] for c in AerpawResource.ResourceClass.choices]:
+        raise ValidationError(
+            detail="resource_class: must be a valid Resource Class value")
+    # validate resource_mode
+    resource_mode = data.get('resource_mode', None)
+    if resource_mode not in [c[0] for c in AerpawResource.ResourceMode.choices]:
+        raise ValidationError(
+            detail="resource_mode: must be a valid Resource Mode value")
+    # validate resource_type
+    resource_type = data.get('resource_type', None)
+    if resource_type not in [c[0] for c in AerpawResource.ResourceType.choices]:
+        raise ValidationError(
+            detail="resource_type: must be a valid Resource Type value")
+    # check if allow_canonical is of type AFRN or APRN
+    if resource_class == AerpawResource.ResourceClass.ALLOW_CANONICAL and \
+            resource_type not in [AerpawResource.ResourceType.AFRN, AerpawResource.ResourceType.APRN]:
+        raise ValidationError(
+            detail="resource_class: ALLOW_CANONICAL must be type AFRN or APRN")
+    # check if UAV or UGV that resource_mode == testbed
+    if resource_type in [AerpawResource.ResourceType.UAV, AerpawResource.ResourceType.UGV] and \
+            resource_mode != AerpawResource.ResourceMode.TESTBED:
+        raise ValidationError(
+            detail="resource_type: UAV/UGV must be mode TESTBED")
+    return {
+        'description': description,
+        'hostname': hostname,
+        'ip_address': ip_address,
+        'is_active': is_active,
+        'location': location,
+        'name': name,
+        'ops_notes': ops_notes,
+        'resource_class': resource_class,
+        'resource_mode': resource_mode,
+        'resource_type': resource_type
+    }
+
+
+def _apply_resource_update(resource: AerpawResource, data) -> bool:
+    """
+    validate and apply updated fields to an existing resource, returns True if modified
+    - raises ValidationError on the first invalid field
+    """
+    modified = False
+    # check for description
+    if data.get('description', None):
+        if len(data.get('description')) < RESOURCE_MIN_DESC_LEN:
+            raise ValidationError(
+                detail="description:  must be at least {0} chars long".format(RESOURCE_MIN_DESC_LEN))
+        resource.description = data.get('description')
+        modified = True
+    # check for hostname
+    if data.get('hostname', None):
+        if len(data.get('hostname')) < RESOURCE_MIN_HOSTNAME_LEN:
+            raise ValidationError(
+                detail="hostname:  must be at least {0} chars long".format(RESOURCE_MIN_HOSTNAME_LEN))
+        resource.hostname = data.get('hostname')
+        modified = True
+    # check for ip_address
+    if data.get('ip_address', None):
+        resource.ip_address = data.get('ip_address')
+        modified = True
+    # check for is_active
+    if str(data.get('is_active')).casefold() in ['true', 'false']:
+        is_active = str(data.get('is_active')).casefold() == 'true'
+        resource.is_active = is_active
+        modified = True
+    # check for location
+    if data.get('location', None):
+        if len(data.get('location')) < RESOURCE_MIN_LOCATION_LEN:
+            raise ValidationError(
+                detail="location:  must be at least {0} chars long".format(RESOURCE_MIN_LOCATION_LEN))
+        resource.location = data.get('location')
+        modified = True
+    # check for name
+    if data.get('name', None):
+        if len(data.get('name')) < RESOURCE_MIN_NAME_LEN:
+            raise ValidationError(
+                detail="name:  must be at least {0} chars long".format(RESOURCE_MIN_NAME_LEN))
+        resource.name = data.get('name')
+        modified = True
+    # check for ops_notes
+    if data.get('ops_notes', None):
+        resource.ops_notes = data.get('ops_notes')
+        modified = True
+    # validate resource_class
+    if data.get('resource_class', None):
+        if data.get('resource_class') not in [c[0] for c in AerpawResource.ResourceClass.choices]:
+            raise ValidationError(
+                detail="resource_class: must be a valid Resource Class value")
+        resource.resource_class = data.get('resource_class')
+        modified = True
+    # check for resource_mode
+    if data.get('resource_mode', None):
+        if data.get('resource_mode') not in [c[0] for c in AerpawResource.ResourceMode.choices]:
+            raise ValidationError(
+                detail="resource_mode: must be a valid Resource Mode value")
+        resource.resource_mode = data.get('resource_mode')
+        modified = True
+    # check for resource_type
+    if data.get('resource_type', None):
+        if data.get('resource_type') not in [c[0] for c in AerpawResource.ResourceType.choices]:
+            raise ValidationError(
+                detail="resource_class: must be a valid Resource Type value")
+        resource.resource_type = data.get('resource_type', None)
+        modified = True
+    # check if UAV or UGV that resource_mode == testbed
+    if resource.resource_type in [AerpawResource.ResourceType.UAV, AerpawResource.ResourceType.UGV] and \
+            resource.resource_mode != AerpawResource.ResourceMode.TESTBED:
+        raise ValidationError(
+            detail="resource_type: UAV/UGV must be mode TESTBED")
+    return modified
+
+
+class ResourceViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateModelMixin, ExportMixin,
+                      SparseFieldsMixin, BatchMixin):
     """
     Resource
     - paginated list
@@ -31,19 +192,36 @@ class ResourceViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, Update
     - delete
     - experiments
     - projects
+    - export
+    - bulk
+    - batch
     """
     permission_classes = [permissions.IsAuthenticated]
-    queryset = AerpawResource.objects.all().order_by('name')
+    # detail lookups include soft deleted rows (returned flagged is_deleted), lists use get_queryset
+    queryset = AerpawResource.all_objects.all().order_by('name')
     serializer_class = ResourceSerializerDetail
+    export_name = 'resources'
+    export_fields = [
+        ('description', 'description'),
+        ('is_active', 'is_active'),
+        ('location', 'location'),
+        ('name', 'name'),
+        ('resource_class', 'resource_class'),
+        ('resource_id', 'id'),
+        ('resource_mode', 'resource_mode'),
+        ('resource_type', 'resource_type')
+    ]
+    sparse_fields = export_fields
+    sparse_id_field = 'resource_id'
 
     def get_queryset(self):
         search = self.request.query_params.get('search', None)
         if search:
             queryset = AerpawResource.objects.filter(
-                Q(is_deleted=False) & (Q(name__icontains=search) | Q(resource_type__icontains=search))
+                Q(name__icontains=search) | Q(resource_type__icontains=search)
             ).order_by('name')
         else:
-            queryset = AerpawResource.objects.filter(is_deleted=False).order_by('name')
+            queryset = AerpawResource.objects.all().order_by('name')
         return queryset
 
     def list(self, request, *args, **kwargs):
@@ -58,10 +236,16 @@ class ResourceViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, Update
         - resource_mode          - string
         - resource_type          - string
 
+        Parameters (optional):
+        - fields                 - comma separated subset of the fields above (only those columns are read)
+
         Permission:
         - user is_active
         """
         if request.user.is_active:
+            fields = self.requested_fields(request)
+            if fields:
+                return self.sparse_list(self.get_queryset(), fields, [])
             page = self.paginate_queryset(self.get_queryset())
             if page:
                 serializer = ResourceSerializerList(page, many=True)
@@ -112,72 +296,10 @@ class ResourceViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, Update
         """
         user = get_object_or_404(AerpawUser.objects.all(), pk=request.user.id)
         if request.user.is_operator():
-            # validate description
-            description = request.data.get('description', None)
-            if not description or len(description) < RESOURCE_MIN_DESC_LEN:
-                raise ValidationError(
-                    detail="description:  must be at least {0} chars long".format(RESOURCE_MIN_DESC_LEN))
-            # validate hostname
-            hostname = request.data.get('hostname', None)
-            if hostname and len(hostname) < RESOURCE_MIN_HOSTNAME_LEN:
-                raise ValidationError(
-                    detail="hostname:  must be at least {0} chars long".format(RESOURCE_MIN_HOSTNAME_LEN))
-            # validate ip_address
-            ip_address = request.data.get('ip_address', None)
-            # validate is_active
-            is_active = str(request.data.get('is_active')).casefold() == 'true'
-            # validate location
-            location = request.data.get('location', None)
-            if location and len(location) < RESOURCE_MIN_LOCATION_LEN:
-                raise ValidationError(
-                    detail="location:  must be at least {0} chars long".format(RESOURCE_MIN_LOCATION_LEN))
-            # validate name
-            name = request.data.get('name', None)
-            if name and len(name) < RESOURCE_MIN_NAME_LEN:
-                raise ValidationError(
-                    detail="name: must be at least {0} chars long".format(RESOURCE_MIN_NAME_LEN))
-            # validate ops_notes
-            ops_notes = request.data.get('ops_notes', None)
-            # validate resource_class
-            resource_class = request.data.get('resource_class', None)
-            if resource_class not in [c[0] for c in AerpawResource.ResourceClass.choices]:
-                raise ValidationError(
-                    detail="resource_class: must be a valid Resource Class value")
-            # validate resource_mode
-            resource_mode = request.data.get('resource_mode', None)
-            if resource_mode not in [c[0] for c in AerpawResource.ResourceMode.choices]:
-                raise ValidationError(
-                    detail="resource_mode: must be a valid Resource Mode value")
-            # validate resource_type
-            resource_type = request.data.get('resource_type', None)
-            if resource_type not in [c[0] for c in AerpawResource.ResourceType.choices]:
-                raise ValidationError(
-                    detail="resource_type: must be a valid Resource Type value")
-            # check if allow_canonical is of type AFRN or APRN
-            if resource_class == AerpawResource.ResourceClass.ALLOW_CANONICAL and \
-                    resource_type not in [AerpawResource.ResourceType.AFRN, AerpawResource.ResourceType.APRN]:
-                raise ValidationError(
-                    detail="resource_class: ALLOW_CANONICAL must be type AFRN or APRN")
-            # check if UAV or UGV that resource_mode == testbed
-            if resource_type in [AerpawResource.ResourceType.UAV, AerpawResource.ResourceType.UGV] and \
-                    resource_mode != AerpawResource.ResourceMode.TESTBED:
-                raise ValidationError(
-                    detail="resource_type: UAV/UGV must be mode TESTBED")
-
             # create resource
-            resource = AerpawResource()
+            resource = AerpawResource(**_validate_new_resource(request.data))
             resource.created_by = user.username
-            resource.description = description
-            resource.hostname = hostname
-            resource.ip_address = ip_address
-            resource.is_active = is_active
-            resource.location = location
             resource.modified_by = user.username
-            resource.name = name
-            resource.ops_notes = ops_notes
-            resource.resource_class = resource_class
-            resource.resource_mode = resource_mode
-            resource.resource_type = resource_type
             resource.uuid = uuid4()
             resource.save()
             return self.retrieve(request, pk=resource.id)
@@ -204,11 +326,17 @@ class ResourceViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, Update
         - resource_mode          - string
         - resource_type          - string
 
+        Parameters (optional):
+        - fields                 - comma separated subset of the list fields (only those columns are read)
+
         Permission:
         - user is_active
         """
         resource = get_object_or_404(self.queryset, pk=kwargs.get('pk'))
         if request.user.is_active:
+            fields = self.requested_fields(request)
+            if fields:
+                return self.sparse_retrieve(self.queryset, resource.id, fields, [])
             serializer = ResourceSerializerDetail(resource)
             du = dict(serializer.data)
             response_data = {
@@ -256,74 +384,7 @@ class ResourceViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, Update
         """
         resource = get_object_or_404(self.queryset, pk=kwargs.get('pk'))
         if not resource.is_deleted and request.user.is_operator():
-            modified = False
-            # check for description
-            if request.data.get('description', None):
-                if len(request.data.get('description')) < RESOURCE_MIN_DESC_LEN:
-                    raise ValidationError(
-                        detail="description:  must be at least {0} chars long".format(RESOURCE_MIN_DESC_LEN))
-                resource.description = request.data.get('description')
-                modified = True
-            # check for hostname
-            if request.data.get('hostname', None):
-                if len(request.data.get('hostname')) < RESOURCE_MIN_HOSTNAME_LEN:
-                    raise ValidationError(
-                        detail="hostname:  must be at least {0} chars long".format(RESOURCE_MIN_HOSTNAME_LEN))
-                resource.hostname = request.data.get('hostname')
-                modified = True
-            # check for ip_address
-            if request.data.get('ip_address', None):
-                resource.ip_address = request.data.get('ip_address')
-                modified = True
-            # check for is_active
-            if str(request.data.get('is_active')).casefold() in ['true', 'false']:
-                is_active = str(request.data.get('is_active')).casefold() == 'true'
-                resource.is_active = is_active
-                modified = True
-            # check for location
-            if request.data.get('location', None):
-                if len(request.data.get('location')) < RESOURCE_MIN_LOCATION_LEN:
-                    raise ValidationError(
-                        detail="location:  must be at least {0} chars long".format(RESOURCE_MIN_LOCATION_LEN))
-                resource.location = request.data.get('location')
-                modified = True
-            # check for name
-            if request.data.get('name', None):
-                if len(request.data.get('name')) < RESOURCE_MIN_NAME_LEN:
-                    raise ValidationError(
-                        detail="name:  must be at least {0} chars long".format(RESOURCE_MIN_NAME_LEN))
-                resource.name = request.data.get('name')
-                modified = True
-            # check for ops_notes
-            if request.data.get('ops_notes', None):
-                resource.ops_notes = request.data.get('ops_notes')
-                modified = True
-            # validate resource_class
-            if request.data.get('resource_class', None):
-                if request.data.get('resource_class') not in [c[0] for c in AerpawResource.ResourceClass.choices]:
-                    raise ValidationError(
-                        detail="resource_class: must be a valid Resource Class value")
-                resource.resource_class = request.data.get('resource_class')
-                modified = True
-            # check for resource_mode
-            if request.data.get('resource_mode', None):
-                if request.data.get('resource_mode') not in [c[0] for c in AerpawResource.ResourceMode.choices]:
-                    raise ValidationError(
-                        detail="resource_mode: must be a valid Resource Mode value")
-                resource.resource_mode = request.data.get('resource_mode')
-                modified = True
-            # check for resource_type
-            if request.data.get('resource_type', None):
-                if request.data.get('resource_type') not in [c[0] for c in AerpawResource.ResourceType.choices]:
-                    raise ValidationError(
-                        detail="resource_class: must be a valid Resource Type value")
-                resource.resource_type = request.data.get('resource_type', None)
-                modified = True
-            # check if UAV or UGV that resource_mode == testbed
-            if resource.resource_type in [AerpawResource.ResourceType.UAV, AerpawResource.ResourceType.UGV] and \
-                    resource.resource_mode != AerpawResource.ResourceMode.TESTBED:
-                raise ValidationError(
-                    detail="resource_type: UAV/UGV must be mode TESTBED")
+            modified = _apply_resource_update(resource, request.data)
             # save if modified
             if modified:
                 resource.modified_by = request.user.email
@@ -418,3 +479,93 @@ class ResourceViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, Update
         else:
             raise PermissionDenied(
                 detail="PermissionDenied: unable to GET /resources/{0}/projects".format(kwargs.get('pk')))
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        """
+        POST: create / update resources in bulk (all rows or none)
+        - resources              - array of resources (rows with resource_id update that resource)
+        - file                   - CSV upload with the same columns (alternative to resources)
+
+        Response:
+        - created                - array of resource_id
+        - updated                - array of resource_id
+        - errors                 - array of {row, resource_id, detail} (400, nothing written)
+
+        Permission:
+        - user is_operator
+        """
+        if not request.user.is_operator():
+            raise PermissionDenied(
+                detail="PermissionDenied: unable to POST /resources/bulk")
+        if request.FILES.get('file'):
+            reader = csv.DictReader(io.TextIOWrapper(request.FILES.get('file'), encoding='utf-8'))
+            # empty CSV cells are treated as missing values
+            try:
+                rows = [{k: v for k, v in row.items() if v not in ['', None]} for row in reader]
+            except (UnicodeDecodeError, csv.Error) as exc:
+                raise ValidationError(
+                    detail="file: must be a UTF-8 encoded CSV file ({0})".format(exc))
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            rows = request.data.get('resources', None)
+        if not isinstance(rows, list) or not rows or not all([isinstance(row, dict) for row in rows]):
+            raise ValidationError(
+                detail="resources: must provide an array of resources or a CSV file")
+        if len(rows) > RESOURCE_BULK_MAX_ROWS:
+            raise ValidationError(
+                detail="resources: at most {0} rows per request".format(RESOURCE_BULK_MAX_ROWS))
+        # existing resources are loaded in a single query
+        update_ids = [row.get('resource_id') for row in rows if row.get('resource_id')]
+        try:
+            existing = AerpawResource.objects.in_bulk([int(pk) for pk in update_ids])
+        except (TypeError, ValueError):
+            raise ValidationError(
+                detail="resource_id: must be an integer")
+        now = timezone.now()
+        created = []
+        updated = []
+        errors = []
+        for index, row in enumerate(rows):
+            try:
+                if row.get('resource_id'):
+                    resource = existing.get(int(row.get('resource_id')))
+                    if not resource:
+                        raise ValidationError(
+                            detail="resource_id: resource {0} not found".format(row.get('resource_id')))
+                    if _apply_resource_update(resource, row):
+                        resource.modified = now
+                        resource.modified_by = request.user.email
+                        updated.append(resource)
+                else:
+                    resource = AerpawResource(**_validate_new_resource(row))
+                    resource.created_by = request.user.username
+                    resource.modified_by = request.user.username
+                    resource.uuid = uuid4()
+                    created.append(resource)
+            except ValidationError as exc:
+                errors.append(
+                    {
+                        'row': index,
+                        'resource_id': row.get('resource_id'),
+                        'detail': str(exc.detail[0]) if isinstance(exc.detail, list) else str(exc.detail)
+                    }
+                )
+        if errors:
+            return Response({'errors': errors}, status=HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            AerpawResource.objects.bulk_create(created, batch_size=RESOURCE_BULK_BATCH_SIZE)
+            AerpawResource.objects.bulk_update(updated, RESOURCE_UPDATE_FIELDS, batch_size=RESOURCE_BULK_BATCH_SIZE)
+            # bulk_create / bulk_update send no post_save signals
+            audit_instances(created, created=True)
+            audit_instances(updated, created=False)
+            record_changes(
+                [(ChangeEvent.ObjectType.RESOURCE, r.id, ChangeEvent.Action.CREATED, None) for r in created] +
+                [(ChangeEvent.ObjectType.RESOURCE, r.id, ChangeEvent.Action.UPDATED, None) for r in updated]
+            )
+        response_data = {
+            'created': [r.id for r in created],
+            'updated': [r.id for r in updated]
+        }
+        return Response(response_data)
@@ -2,7 +2,7 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
-from portal.apps.mixins.models import AuditModelMixin, BaseModel
+from portal.apps.mixins.models import AuditModelMixin, BaseModel, LiveManager
 
 
 class AerpawResource(BaseModel, AuditModelMixin, models.Model):
@@ -68,7 +68,12 @@ class AerpawResource(BaseModel, AuditModelMixin, models.Model):
     )
     uuid = models.CharField(max_length=255, primary_key=False, editable=False)
 
+    objects = LiveManager()
+    all_objects = models.Manager()
+
     class Meta:
+        # reverse relations (experiment.resources, ...), admin and dumpdata include soft deleted rows
+        default_manager_name = 'all_objects'
         verbose_name = 'AERPAW Resource'
 
     def __str__(self):
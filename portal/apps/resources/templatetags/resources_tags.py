@@ -1,15 +1,18 @@
+import logging
+
 from django import template
 
 from portal.apps.resources.models import AerpawResource
 
+logger = logging.getLogger(__name__)
 register = template.Library()
 
 
 @register.filter
 def id_to_resource_name(resource_id):
     try:
-        resource = AerpawResource.objects.get(pk=int(resource_id))
+        resource = AerpawResource.all_objects.get(pk=int(resource_id))
         return resource.name
     except Exception as exc:
-        print(exc)
+        logger.warning(exc)
         return 'not found'
@@ -1,3 +1,4 @@
+import logging
 from urllib.parse import parse_qs, urlparse
 
 from django.contrib.auth.decorators import login_required
@@ -10,6 +11,8 @@ from portal.apps.resources.forms import ResourceCreateForm
 from portal.apps.resources.models import AerpawResource
 from portal.server.settings import DEBUG, REST_FRAMEWORK
 
+logger = logging.getLogger(__name__)
+
 
 @csrf_exempt
 @login_required
@@ -44,7 +47,7 @@ def resource_list(request):
                 try:
                     prev_page = prev_dict['page'][0]
                 except Exception as exc:
-                    print(exc)
+                    logger.debug(exc)
                     prev_page = 1
             next_url = resources.get('next', None)
             if next_url:
@@ -52,7 +55,7 @@ def resource_list(request):
                 try:
                     next_page = next_dict['page'][0]
                 except Exception as exc:
-                    print(exc)
+                    logger.debug(exc)
                     next_page = 1
             count = int(resources.get('count'))
             min_range = int(current_page - 1) * int(REST_FRAMEWORK['PAGE_SIZE']) + 1
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from portal.apps.tasks.queue import prune_tasks, run_worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks (notifications, rollup refreshes, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queues', default='', help='comma separated queues to work on (default: all)')
+        parser.add_argument('--once', action='store_true', help='exit when no task is due instead of polling')
+        parser.add_argument('--poll', type=float, default=None, help='seconds between polls of an idle queue')
+        parser.add_argument('--prune', action='store_true',
+                            help='only delete finished tasks older than TASKS_RETENTION_DAYS')
+
+    def handle(self, *args, **options):
+        if options.get('prune'):
+            self.stdout.write('run_tasks: {0} finished tasks deleted'.format(prune_tasks()))
+            return
+        queues = [q for q in options.get('queues').split(',') if q]
+        processed = run_worker(queues=queues or None, once=options.get('once'), poll_seconds=options.get('poll'))
+        self.stdout.write('run_tasks: {0} tasks run'.format(processed))
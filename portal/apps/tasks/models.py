@@ -0,0 +1,51 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class Task(models.Model):
+    """
+    Background Task (durable queue row, see portal.apps.tasks.queue)
+    - attempts
+    - created
+    - finished
+    - id
+    - idempotency_key
+    - kwargs
+    - last_error
+    - locked_at
+    - locked_by
+    - max_attempts
+    - name
+    - queue
+    - run_after
+    - status
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    id = models.BigAutoField(primary_key=True)
+    attempts = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(blank=True, null=True)
+    # a second enqueue with the same key is ignored while the task row exists
+    idempotency_key = models.CharField(max_length=255, blank=True, null=True, unique=True)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    last_error = models.TextField(blank=True, default='')
+    locked_at = models.DateTimeField(blank=True, null=True)
+    locked_by = models.CharField(max_length=255, blank=True, default='')
+    max_attempts = models.PositiveIntegerField(default=3)
+    name = models.CharField(max_length=255)
+    queue = models.CharField(max_length=64, default='default')
+    run_after = models.DateTimeField()
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.QUEUED)
+
+    class Meta:
+        verbose_name = 'Background Task'
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['status', 'queue'])
+        ]
@@ -0,0 +1,229 @@
+import logging
+import os
+import socket
+import time
+import traceback
+import zlib
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from portal.apps.tasks.models import Task
+
+logger = logging.getLogger(__name__)
+
+# constants
+TASK_CLAIM_LOCK = zlib.crc32(b'portal.apps.tasks.claim')
+TASK_DEFAULT_QUEUE = 'default'
+TASK_ERROR_MAX_LEN = 4000
+TASK_PRUNE_INTERVAL_SECONDS = 3600
+
+_registry = {}
+
+
+class TaskDefinition:
+    """
+    a function registered with @task
+    - queue: concurrency limits (TASK_QUEUE_CONCURRENCY) apply per queue
+    - max_attempts: runs before the task is marked failed
+    - retry_seconds: delay before the first retry, doubled on every further attempt
+    """
+
+    def __init__(self, name: str, func, queue: str, max_attempts: int, retry_seconds: int):
+        self.name = name
+        self.func = func
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+
+
+def task(name: str = None, queue: str = TASK_DEFAULT_QUEUE, max_attempts: int = 3, retry_seconds: int = 30):
+    """
+    register a function as a background task, queued with `func.enqueue(kwargs, idempotency_key=...)`
+
+        @task(queue='rollups')
+        def refresh_usage_rollups_task(days: list):
+            ...
+
+    - keyword arguments are stored as JSON (dates and datetimes arrive as ISO strings)
+    """
+
+    def decorator(func):
+        task_name = name or '{0}.{1}'.format(func.__module__, func.__name__)
+        _registry[task_name] = TaskDefinition(task_name, func, queue, max_attempts, retry_seconds)
+        func.enqueue = partial(enqueue, task_name)
+        return func
+
+    return decorator
+
+
+def registered_tasks() -> dict:
+    return dict(_registry)
+
+
+def tasks_eager() -> bool:
+    return getattr(settings, 'TASKS_EAGER', False)
+
+
+def _run_eager(definition: TaskDefinition, kwargs: dict):
+    try:
+        with transaction.atomic():
+            definition.func(**kwargs)
+    except Exception:
+        logger.exception('task %s failed (eager)', definition.name)
+
+
+def enqueue(name: str, kwargs: dict = None, idempotency_key: str = None, delay_seconds: int = 0) -> Task:
+    """
+    queue a registered task, in the current transaction (the task only becomes visible to the
+    workers, and only runs, when the transaction commits)
+    - idempotency_key: ignored when a task with the same key already exists (queued, running or kept
+      after it ran, see TASKS_RETENTION_DAYS)
+    - TASKS_EAGER: run the task in process once the transaction commits (development, no worker)
+    - returns the queued task, None when it ran eagerly
+    """
+    definition = _registry.get(name)
+    if definition is None:
+        raise LookupError('task {0} is not registered'.format(name))
+    kwargs = kwargs or {}
+    if tasks_eager():
+        transaction.on_commit(partial(_run_eager, definition, kwargs))
+        return None
+    queued = Task(
+        idempotency_key=idempotency_key,
+        kwargs=kwargs,
+        max_attempts=definition.max_attempts,
+        name=name,
+        queue=definition.queue,
+        run_after=timezone.now() + timedelta(seconds=delay_seconds)
+    )
+    if idempotency_key:
+        # ON CONFLICT DO NOTHING: a duplicate neither raises nor aborts the surrounding transaction
+        Task.objects.bulk_create([queued], ignore_conflicts=True)
+    else:
+        queued.save()
+    return queued
+
+
+def _queue_limits() -> dict:
+    return getattr(settings, 'TASK_QUEUE_CONCURRENCY', {})
+
+
+def _requeue_stale(now):
+    """
+    tasks of a worker that died while running them go back to the queue (or fail after max_attempts)
+    """
+    stale = Task.objects.filter(
+        status=Task.Status.RUNNING,
+        locked_at__lt=now - timedelta(seconds=getattr(settings, 'TASKS_LOCK_SECONDS', 600))
+    )
+    stale.filter(attempts__lt=F('max_attempts')).update(
+        status=Task.Status.QUEUED, locked_at=None, locked_by='', last_error='worker lost')
+    stale.update(status=Task.Status.FAILED, finished=now, last_error='worker lost')
+
+
+def claim(worker: str, queues: list = None) -> Task:
+    """
+    take the next due task for `worker`, None when nothing can run now
+    - claims are serialized (PostgreSQL advisory lock) so the running count per queue is exact
+      and TASK_QUEUE_CONCURRENCY holds across all workers
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [TASK_CLAIM_LOCK])
+        _requeue_stale(now)
+        limits = _queue_limits()
+        default_limit = limits.get(TASK_DEFAULT_QUEUE)
+        running = dict(Task.objects.filter(status=Task.Status.RUNNING).values_list('queue').annotate(Count('id')))
+        full = [q for q, count in running.items()
+                if limits.get(q, default_limit) is not None and count >= limits.get(q, default_limit)]
+        candidates = Task.objects.select_for_update(skip_locked=True).filter(
+            status=Task.Status.QUEUED, run_after__lte=now).exclude(queue__in=full)
+        if queues:
+            candidates = candidates.filter(queue__in=queues)
+        claimed = candidates.order_by('run_after', 'id').first()
+        if claimed is None:
+            return None
+        claimed.status = Task.Status.RUNNING
+        claimed.attempts += 1
+        claimed.locked_at = now
+        claimed.locked_by = worker
+        claimed.save(update_fields=['status', 'attempts', 'locked_at', 'locked_by'])
+    return claimed
+
+
+def execute(claimed: Task) -> bool:
+    """
+    run a claimed task in a transaction, retried with exponential backoff until max_attempts
+    - returns True when the task succeeded
+    """
+    definition = _registry.get(claimed.name)
+    try:
+        if definition is None:
+            raise LookupError('task {0} is not registered'.format(claimed.name))
+        with transaction.atomic():
+            definition.func(**claimed.kwargs)
+    except Exception as exc:
+        now = timezone.now()
+        error = traceback.format_exc()[-TASK_ERROR_MAX_LEN:]
+        if definition is not None and claimed.attempts < claimed.max_attempts:
+            delay = definition.retry_seconds * 2 ** (claimed.attempts - 1)
+            logger.warning('task %s (%d) failed, attempt %d of %d, retry in %ds: %s', claimed.name, claimed.pk,
+                           claimed.attempts, claimed.max_attempts, delay, exc)
+            Task.objects.filter(pk=claimed.pk).update(
+                status=Task.Status.QUEUED, run_after=now + timedelta(seconds=delay), locked_at=None,
+                locked_by='', last_error=error)
+        else:
+            logger.error('task %s (%d) failed after %d attempts: %s', claimed.name, claimed.pk, claimed.attempts, exc)
+            Task.objects.filter(pk=claimed.pk).update(status=Task.Status.FAILED, finished=now, last_error=error)
+        return False
+    Task.objects.filter(pk=claimed.pk).update(status=Task.Status.DONE, finished=timezone.now(), last_error='')
+    return True
+
+
+def prune_tasks(days: int = None) -> int:
+    """
+    delete finished (done / failed) tasks older than `days` (TASKS_RETENTION_DAYS), releasing their keys
+    - returns the number of tasks deleted
+    """
+    days = days if days is not None else getattr(settings, 'TASKS_RETENTION_DAYS', 7)
+    return Task.objects.filter(
+        status__in=[Task.Status.DONE, Task.Status.FAILED],
+        finished__lt=timezone.now() - timedelta(days=days)
+    ).delete()[0]
+
+
+def worker_name() -> str:
+    return '{0}:{1}'.format(socket.gethostname(), os.getpid())
+
+
+def run_worker(queues: list = None, once: bool = False, poll_seconds: float = None) -> int:
+    """
+    run queued tasks one at a time until stopped (or, with `once`, until the queue has no due task)
+    - start more worker processes for more throughput, TASK_QUEUE_CONCURRENCY caps each queue
+    - returns the number of tasks run
+    """
+    poll_seconds = poll_seconds if poll_seconds is not None else getattr(settings, 'TASKS_POLL_SECONDS', 2)
+    worker = worker_name()
+    processed = 0
+    pruned = time.monotonic()
+    while True:
+        # a long running worker reconnects after database restarts / CONN_MAX_AGE
+        close_old_connections()
+        claimed = claim(worker, queues)
+        if claimed is not None:
+            execute(claimed)
+            processed += 1
+            continue
+        if once:
+            return processed
+        if time.monotonic() - pruned >= TASK_PRUNE_INTERVAL_SECONDS:
+            prune_tasks()
+            pruned = time.monotonic()
+        time.sleep(poll_seconds)
@@ -28,11 +28,3 @@ class UserSerializerDetail(serializers.ModelSerializer):
         model = AerpawUser
         fields = ['aerpaw_roles', 'display_name', 'email', 'is_active', 'openid_sub', 'user_id', 'username', ]
 
-
-class UserSerializerTokens(serializers.ModelSerializer):
-    access_token = serializers.CharField(source='profile.access_token')
-    refresh_token = serializers.CharField(source='profile.refresh_token')
-
-    class Meta:
-        model = AerpawUser
-        fields = ['access_token', 'refresh_token', ]
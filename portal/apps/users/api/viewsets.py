@@ -7,14 +7,20 @@ from rest_framework.mixins import ListModelMixin, RetrieveModelMixin, UpdateMode
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
-from portal.apps.users.api.serializers import UserSerializerDetail, UserSerializerList, UserSerializerTokens
+from portal.apps.mixins.api.batch import BatchMixin
+from portal.apps.mixins.api.exports import ExportMixin
+from portal.apps.mixins.api.fields import SparseFieldsMixin
+from portal.apps.users.api.serializers import UserSerializerDetail, UserSerializerList
+from portal.apps.users.dashboard import get_dashboard
 from portal.apps.users.models import AerpawUser
+from portal.apps.users.tokens import issue_tokens, token_summary
 
 # constants
 USER_MIN_DISPLAY_NAME_LEN = 5
 
 
-class UserViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateModelMixin):
+class UserViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateModelMixin, ExportMixin,
+                  SparseFieldsMixin, BatchMixin):
     """
     AERPAW Users
     - get list
@@ -22,10 +28,21 @@ class UserViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateMode
     - update
     - get user credentials
     - get user tokens
+    - export
+    - batch
     """
     permission_classes = [permissions.IsAuthenticated]
     queryset = AerpawUser.objects.all().order_by('display_name')
     serializer_class = UserSerializerDetail
+    export_name = 'users'
+    export_fields = [
+        ('display_name', 'display_name'),
+        ('email', 'email'),
+        ('user_id', 'id'),
+        ('username', 'username')
+    ]
+    sparse_fields = export_fields
+    sparse_id_field = 'user_id'
 
     def get_queryset(self):
         """
@@ -49,10 +66,16 @@ class UserViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateMode
         - user_id                - int
         - username               - string
 
+        Parameters (optional):
+        - fields                 - comma separated subset of the fields above (only those columns are read)
+
         Permission:
         - active users
         """
         if request.user.is_active:
+            fields = self.requested_fields(request)
+            if fields:
+                return self.sparse_list(self.get_queryset(), fields, [])
             page = self.paginate_queryset(self.get_queryset())
             if page:
                 serializer = UserSerializerList(page, many=True)
@@ -184,24 +207,42 @@ class UserViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin, UpdateMode
                 detail="PermissionDenied: unable to GET /users/{0}/credentials".format(kwargs.get('pk')))
 
     @action(detail=True, methods=['get'])
+    def dashboard(self, request, *args, **kwargs):
+        """
+        GET: dashboard of the user (cached, replaces the projects / experiments / sessions round-trips)
+        - active_sessions        - array of {experiment_id, session_id, session_type, start_date_time, started_by}
+        - experiments            - array of {experiment_id, experiment_state, is_canonical, is_retired,
+                                   modified_date, name, project_id}
+        - pending_deployments    - array of experiments waiting for deployment (operators: all experiments)
+        - projects               - array of {created_date, is_public, membership, name, project_id}
+
+        Permission:
+        - user is_self
+        """
+        if str(request.user.id) != str(kwargs.get('pk')):
+            raise PermissionDenied(
+                detail="PermissionDenied: unable to GET /users/{0}/dashboard".format(kwargs.get('pk')))
+        return Response(get_dashboard(request.user))
+
+    @action(detail=True, methods=['get', 'post'])
     def tokens(self, request, *args, **kwargs):
         """
-        GET: tokens
-        - access_token           - string
-        - refresh_token          - string
+        GET: issued tokens (metadata only, tokens are not stored)
+        - access_token           - {'token': null, 'issued': datetime, 'expires': datetime} or null
+        - refresh_token          - {'token': null, 'issued': datetime, 'expires': datetime} or null
+
+        POST: issue a new token pair (the tokens are returned once)
+        - access_token           - {'token': string, 'issued': datetime, 'expires': datetime}
+        - refresh_token          - {'token': string, 'issued': datetime, 'expires': datetime}
 
         Permission:
         - user is_self
         """
         user = get_object_or_404(self.queryset, pk=kwargs.get('pk'))
         if request.user.id == user.id:
-            serializer = UserSerializerTokens(user)
-            du = dict(serializer.data)
-            response_data = {
-                'access_token': du.get('access_token'),
-                'refresh_token': du.get('refresh_token')
-            }
-            return Response(response_data)
+            if request.method == 'POST':
+                return Response(issue_tokens(user))
+            return Response(token_summary(user))
         else:
             raise PermissionDenied(
-                detail="PermissionDenied: unable to GET /users/{0}/tokens".format(kwargs.get('pk')))
+                detail="PermissionDenied: unable to {0} /users/{1}/tokens".format(request.method, kwargs.get('pk')))
@@ -0,0 +1,217 @@
+import hashlib
+import time
+
+import jwt
+from django.conf import settings
+from django.core.exceptions import SuspiciousOperation
+from django.core.cache import cache
+from django.db.models import F
+from django.utils.functional import SimpleLazyObject
+from mozilla_django_oidc.contrib.drf import OIDCAuthentication
+from rest_framework import exceptions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from portal.apps.users.models import AerpawRolesEnum, AerpawUser
+
+# constants
+ROLES_CLAIM = 'roles'
+VERSION_CLAIM = 'ver'
+TOKEN_VERSION_CACHE_KEY = 'users:token_version:{0}'
+OIDC_TOKEN_CACHE_KEY = 'users:oidc:token:{0}'
+
+
+def token_version(user_id: int) -> int:
+    """
+    current token version of a user (cached), None when the user does not exist
+    """
+    key = TOKEN_VERSION_CACHE_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = AerpawUser.objects.filter(pk=user_id, is_active=True).values_list(
+            'token_version', flat=True).first()
+        if version is not None:
+            cache.set(key, version, getattr(settings, 'USER_TOKEN_VERSION_CACHE_SECONDS', 30))
+    return version
+
+
+def revoke_user_tokens(user_id: int):
+    """
+    invalidate every access / refresh token issued to the user so far
+    """
+    AerpawUser.objects.filter(pk=user_id).update(token_version=F('token_version') + 1)
+    cache.delete(TOKEN_VERSION_CACHE_KEY.format(user_id))
+
+
+def _add_portal_claims(token, user: AerpawUser):
+    token[ROLES_CLAIM] = sorted(user.role_names())
+    # the in memory user may predate a revocation, use the stored version
+    version = token_version(user.pk)
+    token[VERSION_CLAIM] = version if version is not None else user.token_version
+    return token
+
+
+class PortalRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the user roles and token version (copied into its access tokens)
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        return _add_portal_claims(super().for_user(user), user)
+
+
+class PortalAccessToken(AccessToken):
+    """
+    Access token carrying the user roles and token version
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        return _add_portal_claims(super().for_user(user), user)
+
+
+class TokenUser(SimpleLazyObject):
+    """
+    Request user backed by the access token claims
+    - id, pk, role checks and is_active are answered from the token
+    - any other attribute loads the AerpawUser row (once) on first access
+    """
+
+    def __init__(self, user_id, roles):
+        # simplejwt stores the user id claim as a string
+        user_id = AerpawUser._meta.pk.to_python(user_id)
+        super().__init__(lambda: AerpawUser.objects.get(pk=user_id))
+        # SimpleLazyObject forwards attribute assignment to the wrapped user, bypass it
+        self.__dict__['_token_user_id'] = user_id
+        self.__dict__['_token_roles'] = frozenset(roles)
+
+    @property
+    def id(self):
+        return self.__dict__['_token_user_id']
+
+    @property
+    def pk(self):
+        return self.__dict__['_token_user_id']
+
+    @property
+    def is_active(self):
+        # inactive users have their token version revoked
+        return True
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    def role_names(self) -> frozenset:
+        return self.__dict__['_token_roles']
+
+    def is_experimenter(self):
+        return AerpawRolesEnum.EXPERIMENTER.value in self.role_names()
+
+    def is_pi(self):
+        return AerpawRolesEnum.PI.value in self.role_names()
+
+    def is_operator(self):
+        return AerpawRolesEnum.OPERATOR.value in self.role_names()
+
+    def is_site_admin(self):
+        return AerpawRolesEnum.SITE_ADMIN.value in self.role_names()
+
+
+def _portal_issued(raw_token: bytes) -> bool:
+    try:
+        return jwt.get_unverified_header(raw_token).get('alg') == api_settings.ALGORITHM
+    except jwt.DecodeError:
+        return False
+
+
+class PortalJWTAuthentication(JWTAuthentication):
+    """
+    Stateless JWT authentication: the token version is checked against a cached per user
+    counter and the user row is only loaded when a view needs model fields
+    - tokens issued without roles / ver claims fall back to the default database lookup
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header is not None else None
+        if raw_token is None or not _portal_issued(raw_token):
+            # OpenID provider tokens are left to CachedOIDCAuthentication
+            return None
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if ROLES_CLAIM not in validated_token or VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+        version = token_version(user_id)
+        if version is None:
+            raise AuthenticationFailed('User not found or inactive', code='user_inactive')
+        if validated_token[VERSION_CLAIM] != version:
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return TokenUser(user_id, validated_token[ROLES_CLAIM])
+
+
+class PortalTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = PortalRefreshToken
+
+
+class PortalTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = PortalRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if VERSION_CLAIM in refresh.payload and \
+                refresh.payload.get(VERSION_CLAIM) != token_version(refresh.payload.get(api_settings.USER_ID_CLAIM)):
+            raise InvalidToken('Token has been revoked')
+        return super().validate(attrs)
+
+
+class CachedOIDCAuthentication(OIDCAuthentication):
+    """
+    OpenID provider bearer tokens without a userinfo request per API call
+    - JWT tokens are verified locally against the cached provider JWKS
+    - opaque tokens are resolved once through the userinfo endpoint
+    - token -> user id is cached for OIDC_TOKEN_CACHE_SECONDS (bounded by the token expiry)
+    """
+
+    def authenticate(self, request):
+        access_token = self.get_access_token(request)
+        if not access_token:
+            return None
+        key = OIDC_TOKEN_CACHE_KEY.format(hashlib.sha256(access_token.encode()).hexdigest())
+        user_id = cache.get(key)
+        if user_id is not None:
+            user = AerpawUser.objects.filter(pk=user_id, is_active=True).first()
+            if user is not None:
+                return user, access_token
+        try:
+            claims = self.backend.verify_bearer_token(access_token)
+        except SuspiciousOperation as exc:
+            raise exceptions.AuthenticationFailed('Login failed: {0}'.format(exc))
+        if claims is None:
+            user, access_token = super().authenticate(request)
+        else:
+            try:
+                user = self.backend.get_or_create_user(access_token, None, claims)
+            except SuspiciousOperation as exc:
+                raise exceptions.AuthenticationFailed('Login failed: {0}'.format(exc))
+            if not user:
+                raise exceptions.AuthenticationFailed('Login failed: No user found for the given access token.')
+        timeout = getattr(settings, 'OIDC_TOKEN_CACHE_SECONDS', 300)
+        if claims is not None and claims.get('exp'):
+            timeout = min(timeout, int(claims.get('exp') - time.time()))
+        if timeout > 0:
+            cache.set(key, user.pk, timeout)
+        return user, access_token
@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from portal.apps.experiments.models import AerpawExperiment, ExperimentSession, UserExperiment
+from portal.apps.projects.models import AerpawProject, UserProject
+from portal.apps.users.models import AerpawUser
+
+# constants
+DASHBOARD_CACHE_KEY = 'users:dashboard:{0}'
+PENDING_STATES = [
+    AerpawExperiment.ExperimentState.WAIT_DEVELOPMENT_DEPLOY,
+    AerpawExperiment.ExperimentState.WAIT_EMULATION_DEPLOY,
+    AerpawExperiment.ExperimentState.WAIT_SANDBOX_DEPLOY,
+    AerpawExperiment.ExperimentState.WAIT_TESTBED_DEPLOY
+]
+
+
+def _projects(user: AerpawUser) -> list:
+    roles = {}
+    for project_id, project_role in UserProject.objects.filter(user_id=user.id).values_list('project_id', 'project_role'):
+        roles.setdefault(project_id, set()).add(project_role)
+    projects = AerpawProject.objects.filter(
+        Q(id__in=list(roles)) | Q(project_creator_id=user.id)
+    ).order_by('name').values('id', 'name', 'is_public', 'project_creator_id', 'created')
+    return [
+        {
+            'created_date': p.get('created'),
+            'is_public': p.get('is_public'),
+            'membership': {
+                'is_project_creator': p.get('project_creator_id') == user.id,
+                'is_project_member': UserProject.RoleType.PROJECT_MEMBER in roles.get(p.get('id'), ()),
+                'is_project_owner': UserProject.RoleType.PROJECT_OWNER in roles.get(p.get('id'), ())
+            },
+            'name': p.get('name'),
+            'project_id': p.get('id')
+        } for p in projects
+    ]
+
+
+def _experiment_data(e: dict) -> dict:
+    return {
+        'experiment_id': e.get('id'),
+        'experiment_state': e.get('experiment_state'),
+        'is_canonical': e.get('is_canonical'),
+        'is_retired': e.get('is_retired'),
+        'modified_date': e.get('modified'),
+        'name': e.get('name'),
+        'project_id': e.get('project_id')
+    }
+
+
+def build_dashboard(user: AerpawUser) -> dict:
+    """
+    projects, experiments, active sessions and pending deployments of the user (set based queries)
+    - operators see the pending deployments of every experiment
+    """
+    fields = ['id', 'name', 'project_id', 'experiment_state', 'is_canonical', 'is_retired', 'modified']
+    experiments = list(AerpawExperiment.objects.filter(
+        Q(id__in=UserExperiment.objects.filter(user_id=user.id).values('experiment_id')) | Q(experiment_creator_id=user.id)
+    ).order_by('name').values(*fields))
+    experiment_ids = [e.get('id') for e in experiments]
+    sessions = ExperimentSession.objects.filter(
+        experiment_id__in=experiment_ids, end_date_time__isnull=True
+    ).order_by('-created').values('id', 'experiment_id', 'session_type', 'started_by_id', 'created')
+    if user.is_operator():
+        pending = AerpawExperiment.objects.filter(
+            experiment_state__in=PENDING_STATES).order_by('modified').values(*fields)
+    else:
+        pending = [e for e in experiments if e.get('experiment_state') in PENDING_STATES]
+    return {
+        'active_sessions': [
+            {
+                'experiment_id': s.get('experiment_id'),
+                'session_id': s.get('id'),
+                'session_type': s.get('session_type'),
+                'start_date_time': s.get('created'),
+                'started_by': s.get('started_by_id')
+            } for s in sessions
+        ],
+        'experiments': [_experiment_data(e) for e in experiments],
+        'pending_deployments': [_experiment_data(e) for e in pending],
+        'projects': _projects(user)
+    }
+
+
+def get_dashboard(user: AerpawUser) -> dict:
+    """
+    cached build_dashboard, invalidated by the users signals on membership / state changes
+    """
+    key = DASHBOARD_CACHE_KEY.format(user.id)
+    dashboard = cache.get(key)
+    if dashboard is None:
+        dashboard = build_dashboard(user)
+        cache.set(key, dashboard, getattr(settings, 'USER_DASHBOARD_CACHE_SECONDS', 300))
+    return dashboard
+
+
+def invalidate_dashboards(user_ids) -> None:
+    cache.delete_many([DASHBOARD_CACHE_KEY.format(user_id) for user_id in set(user_ids) if user_id])
+
+
+def project_user_ids(project_id: int) -> list:
+    return list(UserProject.objects.filter(project_id=project_id).values_list('user_id', flat=True)) + \
+        list(AerpawProject.all_objects.filter(pk=project_id).values_list('project_creator_id', flat=True))
+
+
+def experiment_user_ids(experiment_id: int) -> list:
+    return list(UserExperiment.objects.filter(experiment_id=experiment_id).values_list('user_id', flat=True)) + \
+        list(AerpawExperiment.all_objects.filter(pk=experiment_id).values_list('experiment_creator_id', flat=True))
@@ -40,6 +40,7 @@ class AerpawUser(BaseModel, AuditModelMixin, AbstractUser):
     - openid_sub
     - password (from AbstractUser)
     - profile
+    - token_version
     - user_permissions (from AbstractUser)
     - username (from AbstractUser)
     - uuid
@@ -53,6 +54,8 @@ class AerpawUser(BaseModel, AuditModelMixin, AbstractUser):
         on_delete=models.CASCADE,
         null=True
     )
+    # bumped to revoke issued API tokens (role change, deactivation)
+    token_version = models.IntegerField(default=0)
     uuid = models.CharField(max_length=255, primary_key=False, editable=False)
 
     class Meta:
@@ -61,14 +64,55 @@ class AerpawUser(BaseModel, AuditModelMixin, AbstractUser):
     def __str__(self):
         return self.username
 
+    def role_names(self) -> frozenset:
+        """
+        group names of the user, loaded once per instance
+        """
+        if getattr(self, '_role_names', None) is None:
+            self._role_names = frozenset(self.groups.values_list('name', flat=True))
+        return self._role_names
+
     def is_experimenter(self):
-        return self.groups.filter(name=AerpawRolesEnum.EXPERIMENTER.value).exists()
+        return AerpawRolesEnum.EXPERIMENTER.value in self.role_names()
 
     def is_pi(self):
-        return self.groups.filter(name=AerpawRolesEnum.PI.value).exists()
+        return AerpawRolesEnum.PI.value in self.role_names()
 
     def is_operator(self):
-        return self.groups.filter(name=AerpawRolesEnum.OPERATOR.value).exists()
+        return AerpawRolesEnum.OPERATOR.value in self.role_names()
 
     def is_site_admin(self):
-        return self.groups.filter(name=AerpawRolesEnum.SITE_ADMIN.value).exists()
+        return AerpawRolesEnum.SITE_ADMIN.value in self.role_names()
+
+
+class IssuedToken(BaseModel, models.Model):
+    """
+    Issued API token metadata (the token itself is never stored)
+    - expires
+    - id (from Basemodel)
+    - issued
+    - jti
+    - token_hash (sha256)
+    - token_type
+    - user
+    """
+
+    class TokenType(models.TextChoices):
+        ACCESS = 'access', 'Access'
+        REFRESH = 'refresh', 'Refresh'
+
+    expires = models.DateTimeField()
+    issued = models.DateTimeField()
+    jti = models.CharField(max_length=255, unique=True)
+    token_hash = models.CharField(max_length=64)
+    token_type = models.CharField(max_length=255, choices=TokenType.choices)
+    user = models.ForeignKey(AerpawUser, related_name='issued_tokens', on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'token_type', '-issued']),
+            models.Index(fields=['expires'])
+        ]
+
+    def __str__(self):
+        return self.jti
@@ -1,28 +1,25 @@
+import logging
 import unicodedata
+from datetime import timedelta
 from uuid import uuid4
 
-from django.contrib.auth.models import update_last_login
+import jwt
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousOperation
+from django.utils import timezone
+from django.utils.encoding import smart_str
 from mozilla_django_oidc.auth import OIDCAuthenticationBackend
-from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
 from portal.apps.profiles.models import AerpawUserProfile
 
+logger = logging.getLogger(__name__)
 
-def get_tokens_for_user(user) -> None:
-    profile = AerpawUserProfile.objects.get(pk=user.profile_id)
-    refresh = RefreshToken.for_user(user)
-    profile.refresh_token = str(refresh)
-    profile.access_token = str(refresh.access_token)
-    profile.modified_by = user.email
-    profile.save()
-
-
-def refresh_access_token_for_user(user) -> None:
-    profile = AerpawUserProfile.objects.get(pk=user.profile_id)
-    access = AccessToken.for_user(user)
-    profile.access_token = str(access)
-    profile.save()
-    print(access)
+# constants
+JWKS_CACHE_KEY = 'users:oidc:jwks'
+JWKS_REFRESH_LOCK_KEY = 'users:oidc:jwks:refresh'
+JWKS_REFRESH_MIN_SECONDS = 60
 
 
 def generate_username(email):
@@ -32,7 +29,90 @@ def generate_username(email):
     return unicodedata.normalize('NFKC', email)[:150]
 
 
+def get_jwks(refresh: bool = False) -> dict:
+    """
+    JWKS of the OpenID provider (OIDC_OP_JWKS_ENDPOINT), cached for OIDC_JWKS_CACHE_SECONDS
+    - refresh=True refetches (key rotation), at most once per JWKS_REFRESH_MIN_SECONDS
+    """
+    jwks = cache.get(JWKS_CACHE_KEY)
+    if jwks is not None and not (refresh and cache.add(JWKS_REFRESH_LOCK_KEY, True, JWKS_REFRESH_MIN_SECONDS)):
+        return jwks
+    response = requests.get(
+        settings.OIDC_OP_JWKS_ENDPOINT,
+        verify=getattr(settings, 'OIDC_VERIFY_SSL', True),
+        timeout=getattr(settings, 'OIDC_TIMEOUT', None),
+        proxies=getattr(settings, 'OIDC_PROXY', None)
+    )
+    response.raise_for_status()
+    jwks = response.json()
+    cache.set(JWKS_CACHE_KEY, jwks, getattr(settings, 'OIDC_JWKS_CACHE_SECONDS', 3600))
+    cache.add(JWKS_REFRESH_LOCK_KEY, True, JWKS_REFRESH_MIN_SECONDS)
+    logger.info('oidc jwks fetched: %s keys', len(jwks.get('keys', [])))
+    return jwks
+
+
+def _matching_jwk(jwks: dict, header: dict):
+    for jwk in jwks.get('keys', []):
+        if getattr(settings, 'OIDC_VERIFY_KID', True) and jwk.get('kid') != smart_str(header.get('kid')):
+            continue
+        if 'alg' in jwk and jwk.get('alg') != smart_str(header.get('alg')):
+            continue
+        return jwk
+    return None
+
+
+def touch_last_login(user) -> None:
+    """
+    update last_login at most once per OIDC_LAST_LOGIN_INTERVAL seconds (one UPDATE, no full row save)
+    """
+    now = timezone.now()
+    interval = timedelta(seconds=getattr(settings, 'OIDC_LAST_LOGIN_INTERVAL', 300))
+    if user.last_login is None or now - user.last_login >= interval:
+        type(user).objects.filter(pk=user.pk).update(last_login=now)
+        user.last_login = now
+
+
 class MyOIDCAB(OIDCAuthenticationBackend):
+    def retrieve_matching_jwk(self, token):
+        # cached JWKS, refetched once when the key id is unknown (provider key rotation)
+        header = jwt.get_unverified_header(token)
+        jwk = _matching_jwk(get_jwks(), header)
+        if jwk is None:
+            jwk = _matching_jwk(get_jwks(refresh=True), header)
+        if jwk is None:
+            raise SuspiciousOperation('Could not find a valid JWKS.')
+        return jwt.PyJWK(jwk)
+
+    def verify_bearer_token(self, token: str):
+        """
+        verify a JWT bearer token (ID token or JWT access token) locally against the cached JWKS
+        - returns the claims, or None when the token can not be verified locally (opaque access
+          token, other algorithm or no email claim) and the userinfo endpoint must be used
+        - raises SuspiciousOperation for invalid / expired tokens
+        """
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.DecodeError:
+            return None
+        if header.get('alg') != self.OIDC_RP_SIGN_ALGO or not self.OIDC_RP_SIGN_ALGO.startswith(('RS', 'ES')):
+            return None
+        key = self.OIDC_RP_IDP_SIGN_KEY if self.OIDC_RP_IDP_SIGN_KEY is not None else self.retrieve_matching_jwk(token)
+        try:
+            claims = jwt.decode(
+                token, key, algorithms=[self.OIDC_RP_SIGN_ALGO], audience=self.OIDC_RP_CLIENT_ID,
+                issuer=self.get_settings('OIDC_OP_ISSUER', None),
+                options={'require': ['exp', 'sub'], 'verify_iss': bool(self.get_settings('OIDC_OP_ISSUER', None))}
+            )
+        except jwt.InvalidTokenError as exc:
+            raise SuspiciousOperation('JWT verification failed: {0}'.format(exc))
+        return claims if claims.get('email') else None
+
+    def get_userinfo(self, access_token, id_token, payload):
+        # bearer tokens verified by verify_bearer_token already carry the user claims
+        if payload is not None and id_token is None:
+            return payload
+        return super(MyOIDCAB, self).get_userinfo(access_token, id_token, payload)
+
     def create_user(self, claims):
         user = super(MyOIDCAB, self).create_user(claims)
         user.created_by = claims.get('email', '')
@@ -52,9 +132,15 @@ class MyOIDCAB(OIDCAuthenticationBackend):
         return user
 
     def update_user(self, user, claims):
-        user.first_name = claims.get('given_name', '')
-        user.last_name = claims.get('family_name', '')
-        update_last_login(None, user)
-        user.save()
+        # save only the claims that changed, last_login is throttled
+        changed = []
+        for field, claim in [('first_name', 'given_name'), ('last_name', 'family_name')]:
+            value = claims.get(claim, '')
+            if getattr(user, field) != value:
+                setattr(user, field, value)
+                changed.append(field)
+        if changed:
+            user.save(update_fields=changed)
+        touch_last_login(user)
 
         return user
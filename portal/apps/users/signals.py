@@ -0,0 +1,79 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from portal.apps.experiments.models import AerpawExperiment, ExperimentSession, UserExperiment
+from portal.apps.projects.models import AerpawProject, UserProject
+from portal.apps.users.authentication import TOKEN_VERSION_CACHE_KEY, revoke_user_tokens
+from portal.apps.users.dashboard import experiment_user_ids, invalidate_dashboards, project_user_ids
+from portal.apps.users.models import AerpawRolesEnum, AerpawUser
+
+
+@receiver(m2m_changed, sender=AerpawUser.groups.through)
+def revoke_tokens_on_role_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    role changes invalidate the roles embedded in issued tokens (and the user dashboard)
+    - user.groups.add/remove/clear and group.user_set.add/remove/clear
+    """
+    if action == 'pre_clear' and reverse:
+        instance._cleared_user_ids = list(instance.user_set.values_list('id', flat=True))
+        return
+    if action not in ['post_add', 'post_remove', 'post_clear']:
+        return
+    if not reverse:
+        instance._role_names = None
+        user_ids = [instance.pk]
+    else:
+        user_ids = pk_set if action != 'post_clear' else getattr(instance, '_cleared_user_ids', [])
+    for user_id in user_ids or []:
+        revoke_user_tokens(user_id)
+    # operator dashboards list every pending deployment
+    invalidate_dashboards(user_ids or [])
+
+
+@receiver(pre_save, sender=AerpawUser)
+def revoke_tokens_on_deactivation(sender, instance, **kwargs):
+    """
+    deactivating a user invalidates the tokens issued to it
+    """
+    if instance.pk and not instance.is_active:
+        was_active, version = AerpawUser.objects.filter(pk=instance.pk).values_list(
+            'is_active', 'token_version').first() or (False, instance.token_version)
+        if was_active:
+            instance.token_version = version + 1
+            cache.delete(TOKEN_VERSION_CACHE_KEY.format(instance.pk))
+
+
+def _invalidate_on_commit(user_ids):
+    transaction.on_commit(lambda: invalidate_dashboards(user_ids))
+
+
+@receiver([post_save, post_delete], sender=UserProject)
+@receiver([post_save, post_delete], sender=UserExperiment)
+def invalidate_dashboard_on_membership(sender, instance, **kwargs):
+    """
+    project / experiment membership changes update the member dashboard
+    """
+    _invalidate_on_commit([instance.user_id])
+
+
+@receiver(post_save, sender=AerpawProject)
+def invalidate_dashboard_on_project(sender, instance, **kwargs):
+    _invalidate_on_commit(project_user_ids(instance.pk))
+
+
+@receiver(post_save, sender=AerpawExperiment)
+def invalidate_dashboard_on_experiment(sender, instance, **kwargs):
+    """
+    experiment changes (state, name, deletion) update the member dashboards and, as pending
+    deployments are listed to operators, the operator dashboards
+    """
+    operator_ids = AerpawUser.objects.filter(
+        groups__name=AerpawRolesEnum.OPERATOR.value).values_list('id', flat=True)
+    _invalidate_on_commit(experiment_user_ids(instance.pk) + list(operator_ids))
+
+
+@receiver(post_save, sender=ExperimentSession)
+def invalidate_dashboard_on_session(sender, instance, **kwargs):
+    _invalidate_on_commit(experiment_user_ids(instance.experiment_id))
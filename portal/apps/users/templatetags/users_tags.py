@@ -1,9 +1,11 @@
+import logging
 from datetime import datetime
 
 from django import template
 
 from portal.apps.users.models import AerpawUser
 
+logger = logging.getLogger(__name__)
 register = template.Library()
 
 
@@ -13,7 +15,7 @@ def id_to_display_name(user_id):
         user = AerpawUser.objects.get(pk=int(user_id))
         return user.display_name
     except Exception as exc:
-        print(exc)
+        logger.warning(exc)
         return 'not found'
 
 
@@ -23,7 +25,7 @@ def id_to_username(user_id):
         user = AerpawUser.objects.get(pk=int(user_id))
         return user.username
     except Exception as exc:
-        print(exc)
+        logger.warning(exc)
         return 'not found'
 
 
@@ -32,5 +34,5 @@ def str_to_datetime(datetime_str):
     try:
         return datetime.strptime(datetime_str, "%Y-%m-%dT%H:%M:%S.%f%z")
     except Exception as exc:
-        print(exc)
+        logger.warning(exc)
         return datetime_str
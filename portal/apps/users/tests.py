@@ -1 +1,230 @@
-# Create your tests here.
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from portal.apps.users.authentication import PortalAccessToken, TOKEN_VERSION_CACHE_KEY, revoke_user_tokens, \
+    token_version
+from portal.apps.users.models import AerpawUser
+from portal.apps.users.oidc_users import JWKS_REFRESH_LOCK_KEY, MyOIDCAB
+
+# constants
+TEST_API_PATH = '/api/projects'
+TEST_USERINFO = {'sub': 'opaque-sub', 'email': 'opaque@example.org', 'given_name': 'Opaque', 'family_name': 'User'}
+
+
+def _rsa_jwk(kid: str) -> (object, dict):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+    jwk.update(kid=kid, alg='RS256', use='sig')
+    return key, jwk
+
+
+class StandInIdentityProvider:
+    """
+    Local OpenID provider stand-in: JWKS and userinfo endpoints on 127.0.0.1, counting requests
+    - keys: kid -> RSA private key, only the keys in `published` are served by the JWKS endpoint
+    """
+
+    def __init__(self):
+        self.keys = {}
+        self.published = []
+        self.requests = {'jwks': 0, 'userinfo': 0}
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/jwks':
+                    provider.requests['jwks'] += 1
+                    body = {'keys': [provider.keys[kid][1] for kid in provider.published]}
+                elif self.path == '/userinfo' and self.headers.get('Authorization') == 'Bearer opaque-token':
+                    provider.requests['userinfo'] += 1
+                    body = TEST_USERINFO
+                else:
+                    self.send_response(401)
+                    self.end_headers()
+                    return
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{0}'.format(self.server.server_address[1])
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def add_key(self, kid: str, publish: bool = True):
+        self.keys[kid] = _rsa_jwk(kid)
+        if publish:
+            self.published.append(kid)
+
+    def token(self, kid: str, **claims) -> str:
+        payload = {
+            'aud': settings.OIDC_RP_CLIENT_ID,
+            'email': 'idp-user@example.org',
+            'exp': int(time.time()) + 600,
+            'family_name': 'User',
+            'given_name': 'Idp',
+            'sub': 'idp-sub'
+        }
+        payload.update(claims)
+        return jwt.encode(payload, self.keys[kid][0], algorithm='RS256', headers={'kid': kid})
+
+
+class OIDCBearerAuthenticationTestCase(TestCase):
+    fixtures = ['aerpaw_roles']
+
+    @classmethod
+    def setUpClass(cls):
+        cls.provider = StandInIdentityProvider()
+        cls.provider.start()
+        cls.settings_override = override_settings(
+            OIDC_OP_JWKS_ENDPOINT=cls.provider.url + '/jwks',
+            OIDC_OP_USER_ENDPOINT=cls.provider.url + '/userinfo'
+        )
+        cls.settings_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.settings_override.disable()
+        cls.provider.stop()
+
+    def setUp(self):
+        cache.clear()
+        self.provider.keys.clear()
+        self.provider.published.clear()
+        self.provider.requests.update(jwks=0, userinfo=0)
+        self.provider.add_key('k1')
+
+    def get(self, token: str):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + token)
+        return client.get(TEST_API_PATH)
+
+    def test_jwks_cached_between_requests(self):
+        self.assertEqual(self.get(self.provider.token('k1', given_name='One')).status_code, 200)
+        self.assertEqual(self.get(self.provider.token('k1', given_name='Two')).status_code, 200)
+        self.assertEqual(self.provider.requests['jwks'], 1)
+
+    def test_jwks_refreshed_on_unknown_kid(self):
+        self.assertEqual(self.get(self.provider.token('k1')).status_code, 200)
+        # provider key rotation, after the refresh interval has passed
+        self.provider.add_key('k2')
+        cache.delete(JWKS_REFRESH_LOCK_KEY)
+        self.assertEqual(self.get(self.provider.token('k2')).status_code, 200)
+        self.assertEqual(self.provider.requests['jwks'], 2)
+        # unknown key ids do not refetch again within the refresh interval
+        self.provider.add_key('k3', publish=False)
+        self.assertEqual(self.get(self.provider.token('k3')).status_code, 401)
+        self.assertEqual(self.provider.requests['jwks'], 2)
+
+    def test_bearer_token_verified_locally(self):
+        token = self.provider.token('k1')
+        self.assertEqual(self.get(token).status_code, 200)
+        user = AerpawUser.objects.get(email='idp-user@example.org')
+        self.assertEqual((user.first_name, user.last_name, user.openid_sub), ('Idp', 'User', 'idp-sub'))
+        self.assertIsNotNone(user.profile_id)
+        self.assertEqual(self.provider.requests['userinfo'], 0)
+        # cached token -> user: no provider request, a single user lookup and no writes
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get(token).status_code, 200)
+        sql = [q['sql'] for q in queries.captured_queries]
+        self.assertEqual(len([q for q in sql if 'FROM "users_aerpawuser" WHERE' in q]), 1)
+        self.assertFalse([q for q in sql if q.startswith(('INSERT', 'UPDATE'))])
+        self.assertEqual(self.provider.requests['jwks'], 1)
+
+    def test_bearer_token_rejected(self):
+        self.assertEqual(self.get(self.provider.token('k1', exp=int(time.time()) - 5)).status_code, 401)
+        self.assertEqual(self.get(self.provider.token('k1', aud='other-client')).status_code, 401)
+        self.provider.add_key('forged', publish=False)
+        self.assertEqual(self.get(self.provider.token('forged')).status_code, 401)
+        self.assertFalse(AerpawUser.objects.filter(email='idp-user@example.org').exists())
+
+    def test_opaque_token_resolved_once(self):
+        self.assertEqual(self.get('opaque-token').status_code, 200)
+        self.assertEqual(self.get('opaque-token').status_code, 200)
+        self.assertEqual(self.provider.requests['userinfo'], 1)
+        self.assertTrue(AerpawUser.objects.filter(email=TEST_USERINFO['email']).exists())
+
+    def test_update_user_writes_changed_fields_only(self):
+        self.assertEqual(self.get(self.provider.token('k1')).status_code, 200)
+        user = AerpawUser.objects.get(email='idp-user@example.org')
+        backend = MyOIDCAB()
+        claims = {'email': user.email, 'given_name': 'Idp', 'family_name': 'User', 'sub': 'idp-sub'}
+        # first login: last_login only
+        with CaptureQueriesContext(connection) as queries:
+            backend.update_user(user, claims)
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertIn('last_login', queries.captured_queries[0]['sql'])
+        self.assertNotIn('first_name', queries.captured_queries[0]['sql'])
+        # unchanged claims within OIDC_LAST_LOGIN_INTERVAL: no write
+        with CaptureQueriesContext(connection) as queries:
+            backend.update_user(user, claims)
+        self.assertEqual(len(queries.captured_queries), 0)
+        claims['given_name'] = 'Renamed'
+        with CaptureQueriesContext(connection) as queries:
+            backend.update_user(user, claims)
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('first_name', updates[0])
+        self.assertNotIn('last_name', updates[0])
+        self.assertNotIn('last_login', updates[0])
+        self.assertEqual(AerpawUser.objects.get(pk=user.pk).first_name, 'Renamed')
+
+
+class TokenVersionTestCase(TestCase):
+    fixtures = ['aerpaw_roles']
+
+    def setUp(self):
+        cache.clear()
+        self.user = AerpawUser.objects.create(username='token-user@example.org', email='token-user@example.org')
+
+    def get(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(token))
+        return client.get(TEST_API_PATH)
+
+    def test_token_version_cached(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(token_version(self.user.pk), self.user.token_version)
+        with self.assertNumQueries(0):
+            self.assertEqual(token_version(self.user.pk), self.user.token_version)
+        self.assertIsNone(token_version(self.user.pk + 1000))
+        self.assertIsNone(cache.get(TOKEN_VERSION_CACHE_KEY.format(self.user.pk + 1000)))
+
+    def test_revoke_clears_cached_version(self):
+        token = PortalAccessToken.for_user(self.user)
+        self.assertEqual(self.get(token).status_code, 200)
+        revoke_user_tokens(self.user.pk)
+        self.assertIsNone(cache.get(TOKEN_VERSION_CACHE_KEY.format(self.user.pk)))
+        self.assertEqual(self.get(token).status_code, 401)
+        self.assertEqual(token_version(self.user.pk), self.user.token_version + 1)
+        self.assertEqual(self.get(PortalAccessToken.for_user(self.user)).status_code, 200)
+
+    def test_inactive_user_rejected(self):
+        token = PortalAccessToken.for_user(self.user)
+        AerpawUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        cache.delete(TOKEN_VERSION_CACHE_KEY.format(self.user.pk))
+        self.assertEqual(self.get(token).status_code, 401)
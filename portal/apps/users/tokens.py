@@ -0,0 +1,72 @@
+import hashlib
+import logging
+from datetime import datetime, timezone
+
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone as dj_timezone
+
+from portal.apps.users.authentication import PortalAccessToken, PortalRefreshToken
+from portal.apps.users.models import AerpawUser, IssuedToken
+
+logger = logging.getLogger(__name__)
+
+
+def _record(user: AerpawUser, token, token_type: str) -> IssuedToken:
+    return IssuedToken(
+        expires=datetime.fromtimestamp(token['exp'], tz=timezone.utc),
+        issued=datetime.fromtimestamp(token['iat'], tz=timezone.utc),
+        jti=token['jti'],
+        token_hash=hashlib.sha256(str(token).encode()).hexdigest(),
+        token_type=token_type,
+        user=user
+    )
+
+
+def _token_data(record: IssuedToken, token: str = None) -> dict:
+    return {
+        'token': token,
+        'issued': record.issued,
+        'expires': record.expires
+    }
+
+
+def issue_tokens(user: AerpawUser) -> dict:
+    """
+    issue a new refresh / access token pair, only the metadata is stored
+    - the token strings are returned once, they can not be shown again
+    """
+    refresh = PortalRefreshToken.for_user(user)
+    access = refresh.access_token
+    records = [_record(user, refresh, IssuedToken.TokenType.REFRESH),
+               _record(user, access, IssuedToken.TokenType.ACCESS)]
+    IssuedToken.objects.filter(user=user, expires__lt=dj_timezone.now()).delete()
+    IssuedToken.objects.bulk_create(records)
+    logger.info('api tokens issued for user %s', user.id)
+    return {
+        'refresh_token': _token_data(records[0], str(refresh)),
+        'access_token': _token_data(records[1], str(access))
+    }
+
+
+def issue_access_token(user: AerpawUser) -> dict:
+    """
+    issue a new access token, only the metadata is stored
+    """
+    access = PortalAccessToken.for_user(user)
+    record = _record(user, access, IssuedToken.TokenType.ACCESS)
+    record.save()
+    logger.info('access token refreshed for user %s', user.id)
+    return {'access_token': _token_data(record, str(access))}
+
+
+def token_summary(user: AerpawUser) -> dict:
+    """
+    latest issued access / refresh token metadata of the user (one query, no JWT decoding)
+    - access_token / refresh_token: {'token': None, 'issued', 'expires'} or None
+    """
+    latest = IssuedToken.objects.filter(user=user, token_type=OuterRef('token_type')).order_by('-issued')
+    records = IssuedToken.objects.filter(id__in=Subquery(latest.values('id')[:1]), user=user)
+    summary = {'access_token': None, 'refresh_token': None}
+    for record in records:
+        summary['{0}_token'.format(record.token_type)] = _token_data(record)
+    return summary
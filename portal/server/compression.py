@@ -0,0 +1,100 @@
+import gzip
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - gzip only
+    brotli = None
+
+# constants
+COMPRESSIBLE_TYPES = ('application/json', 'text/csv', 'text/plain')
+
+
+def accepted_encoding(accept_encoding: str) -> str:
+    """
+    preferred supported encoding of an Accept-Encoding header (br > gzip), None for identity
+    """
+    accepted = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for coding in ('br', 'gzip'):
+        if coding == 'br' and brotli is None:
+            continue
+        if accepted.get(coding, accepted.get('*', 0.0)) > 0:
+            return coding
+    return None
+
+
+def _brotli_sequence(sequence, quality: int):
+    compressor = brotli.Compressor(quality=quality)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    gzip / brotli compression of API responses negotiated with Accept-Encoding
+    - only paths under COMPRESSION_PATH_PREFIXES and COMPRESSIBLE_TYPES content are compressed
+    - COMPRESSION_ENABLED                    - bool, middleware is skipped entirely when False
+    - COMPRESSION_MIN_SIZE                   - int, smaller responses are sent as is
+    - COMPRESSION_GZIP_LEVEL                 - int, 1 (fast) .. 9 (small)
+    - COMPRESSION_BROTLI_QUALITY             - int, 0 (fast) .. 11 (small), brotli when installed
+    - streamed responses (csv exports) are compressed chunk by chunk
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'COMPRESSION_ENABLED', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.gzip_level = getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4)
+        self.prefixes = tuple(getattr(settings, 'COMPRESSION_PATH_PREFIXES', ['/api/']))
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not request.path.startswith(self.prefixes) or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').split(';')[0].strip() in COMPRESSIBLE_TYPES:
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+        if response.streaming:
+            if coding == 'br':
+                response.streaming_content = _brotli_sequence(response.streaming_content, self.brotli_quality)
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content)
+            del response['Content-Length']
+        else:
+            if coding == 'br':
+                content = brotli.compress(response.content, quality=self.brotli_quality)
+            else:
+                content = gzip.compress(response.content, compresslevel=self.gzip_level, mtime=0)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+        # a strong ETag no longer matches the encoded bytes
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+        return response
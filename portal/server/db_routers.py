@@ -0,0 +1,206 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+# constants
+PIN_CACHE_KEY = 'db-replica-pin:{0}'
+# read from the primary even on replica routed requests (login sessions, permissions)
+REPLICA_EXCLUDED_APPS = {'auth', 'contenttypes', 'sessions'}
+READ_ONLY_STATEMENTS = {'RELEASE', 'ROLLBACK', 'SAVEPOINT', 'SELECT', 'SET', 'SHOW'}
+PG_REPLICA_LAG_SQL = (
+    'SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+)
+
+# database alias for the reads of the current request (None: default)
+read_alias = ContextVar('db_read_alias', default=None)
+
+
+def replica_aliases() -> list:
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+class ReplicaRouter:
+    """
+    Database router sending the reads of replica routed requests (see ReplicaMiddleware) to a replica
+    - writes always go to the default (primary) database, also for instances loaded from a replica
+    - migrations only run on the primary, replicas receive them through replication
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = read_alias.get()
+        if alias is None or model._meta.app_label in REPLICA_EXCLUDED_APPS:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaMonitor:
+    """
+    Per process replica lag check
+    - the lag of every replica is measured at most every `check_seconds`
+    - replicas lagging more than `max_lag_seconds` or failing the check are skipped until the next check
+    """
+
+    def __init__(self, aliases: list, max_lag_seconds: float, check_seconds: float):
+        self.aliases = aliases
+        self.max_lag_seconds = max_lag_seconds
+        self.check_seconds = check_seconds
+        self.checked = 0.0
+        self.healthy = list(aliases)
+        self.lock = threading.Lock()
+
+    def lag(self, alias: str) -> float:
+        """
+        seconds the replica is behind the primary (0 when it has replayed everything it received)
+        """
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0.0
+        with connection.cursor() as cursor:
+            cursor.execute(PG_REPLICA_LAG_SQL)
+            return float(cursor.fetchone()[0])
+
+    def check(self):
+        healthy = []
+        for alias in self.aliases:
+            try:
+                lag = self.lag(alias)
+            except Exception as exc:
+                logger.warning('replica %s unavailable: %s', alias, exc)
+                connections[alias].close()
+                continue
+            if lag > self.max_lag_seconds:
+                logger.warning('replica %s skipped, %.1fs behind the primary', alias, lag)
+                continue
+            healthy.append(alias)
+        self.healthy = healthy
+
+    def choose(self) -> str:
+        """
+        a random healthy replica, None when every replica lags or is down
+        """
+        now = time.monotonic()
+        if now - self.checked >= self.check_seconds and self.lock.acquire(blocking=False):
+            try:
+                self.checked = now
+                self.check()
+            finally:
+                self.lock.release()
+        return random.choice(self.healthy) if self.healthy else None
+
+
+class WriteDetector:
+    """
+    DB execute wrapper flagging the requests that wrote to the primary
+    """
+
+    def __init__(self):
+        self.wrote = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.wrote:
+            statement = str(sql).lstrip().split(None, 1)
+            self.wrote = bool(statement) and statement[0].upper() not in READ_ONLY_STATEMENTS
+        return execute(sql, params, many, context)
+
+
+def _routed(content, alias: str):
+    """
+    streaming content read on `alias` (the body of streamed exports is produced after the view returns)
+    """
+    iterator = iter(content)
+    while True:
+        token = read_alias.set(alias)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            read_alias.reset(token)
+        yield chunk
+
+
+class ReplicaMiddleware:
+    """
+    Read only API traffic on read replicas
+    - DATABASE_REPLICAS                      - list of database aliases, middleware is skipped when empty
+    - DATABASE_REPLICA_ACTIONS               - viewset actions routed to a replica on GET / HEAD
+    - DATABASE_REPLICA_STICKY_SECONDS        - a client that wrote reads from the primary for this long
+    - DATABASE_REPLICA_MAX_LAG_SECONDS       - replicas further behind are not used
+    - DATABASE_REPLICA_LAG_CHECK_SECONDS     - interval of the replica lag check
+    - clients are told apart by their Authorization header or session cookie
+    """
+
+    def __init__(self, get_response):
+        aliases = replica_aliases()
+        if not aliases:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.actions = set(getattr(settings, 'DATABASE_REPLICA_ACTIONS', ['list', 'retrieve']))
+        self.sticky_seconds = getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 15)
+        self.monitor = ReplicaMonitor(
+            aliases,
+            max_lag_seconds=getattr(settings, 'DATABASE_REPLICA_MAX_LAG_SECONDS', 5),
+            check_seconds=getattr(settings, 'DATABASE_REPLICA_LAG_CHECK_SECONDS', 5)
+        )
+
+    @staticmethod
+    def client_key(request) -> str:
+        credential = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if not credential:
+            return None
+        return PIN_CACHE_KEY.format(hashlib.sha256(credential.encode()).hexdigest())
+
+    def __call__(self, request):
+        token = read_alias.set(None)
+        detector = WriteDetector()
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(detector):
+                response = self.get_response(request)
+            alias = read_alias.get()
+        finally:
+            read_alias.reset(token)
+        if alias is not None and response.streaming:
+            response.streaming_content = _routed(response.streaming_content, alias)
+        if detector.wrote or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            key = self.client_key(request)
+            if key:
+                cache.set(key, True, self.sticky_seconds)
+        if alias is not None:
+            response['X-Database-Replica'] = alias
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        actions = getattr(view_func, 'actions', None) or {}
+        # HEAD is served by the GET action
+        if request.method not in ('GET', 'HEAD') or actions.get('get') not in self.actions:
+            return None
+        key = self.client_key(request)
+        if key and cache.get(key):
+            return None
+        read_alias.set(self.monitor.choose())
+        return None
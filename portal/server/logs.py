@@ -0,0 +1,170 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.config import ConvertingList
+from logging.handlers import QueueHandler, QueueListener
+from uuid import uuid4
+
+# per request logging context: request_id, user_id, view, method, path
+request_context = ContextVar('request_context', default=None)
+
+# constants
+CONTEXT_FIELDS = ('request_id', 'user_id', 'view', 'method', 'path')
+REQUEST_ID_HEADER = 'HTTP_X_REQUEST_ID'
+# attributes of every LogRecord, anything else was passed as `extra`
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+logger = logging.getLogger('portal.request')
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Copy the current request context onto each record (runs in the logging thread of the request)
+    """
+
+    def filter(self, record) -> bool:
+        context = request_context.get() or {}
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field))
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line
+    - timestamp, level, logger, message
+    - request_id, user_id, view, method, path (from RequestContextFilter)
+    - any `extra` fields (e.g. status, latency_ms) and the exception text
+    """
+
+    def format(self, record) -> str:
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def _resolve_handlers(handlers) -> list:
+    # dictConfig passes 'cfg://handlers.name' references lazily, indexing resolves them
+    if isinstance(handlers, ConvertingList):
+        return [handlers[i] for i in range(len(handlers))]
+    return list(handlers)
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    Non-blocking handler: records are queued by the request thread and written by a
+    background QueueListener thread to the configured `handlers`
+    - the listener is (re)started lazily per process, so it survives pre-fork servers
+    """
+
+    def __init__(self, handlers, respect_handler_level: bool = True):
+        super().__init__(queue.SimpleQueue())
+        self.handlers = _resolve_handlers(handlers)
+        self.respect_handler_level = respect_handler_level
+        self._listener = None
+        self._listener_pid = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def _start(self):
+        with self._start_lock:
+            if self._listener_pid == os.getpid():
+                return
+            self.queue = queue.SimpleQueue()
+            self._listener = QueueListener(
+                self.queue, *self.handlers, respect_handler_level=self.respect_handler_level)
+            self._listener.start()
+            self._listener_pid = os.getpid()
+
+    def stop(self):
+        if self._listener is not None and self._listener_pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._listener_pid = None
+
+    def prepare(self, record):
+        # merge args and render the traceback here, the record crosses threads
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self._listener_pid != os.getpid():
+            self._start()
+        self.queue.put_nowait(record)
+
+
+def view_name(request) -> str:
+    """
+    DRF viewset class and action (ExperimentViewSet.list) or the view function path
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    view_class = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    if view_class is None:
+        return '{0}.{1}'.format(match.func.__module__, match.func.__name__)
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower())
+    return '{0}.{1}'.format(view_class.__name__, action) if action else view_class.__name__
+
+
+class RequestLogMiddleware:
+    """
+    Bind request_id / method / path (and user_id / view once known) to every log record
+    of the request, then emit one access record with status and latency_ms
+    - request_id is taken from X-Request-ID when present and echoed in the response
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        context = {
+            'request_id': request.META.get(REQUEST_ID_HEADER) or uuid4().hex,
+            'method': request.method,
+            'path': request.path
+        }
+        token = request_context.set(context)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            user = getattr(request, 'user', None)
+            context['user_id'] = user.id if user is not None and user.is_authenticated else None
+            context['view'] = view_name(request)
+            logger.info('%s %s %s', request.method, request.path, response.status_code, extra={
+                'status': response.status_code,
+                'latency_ms': round((time.perf_counter() - start) * 1000, 1)
+            })
+            response['X-Request-ID'] = context.get('request_id')
+            return response
+        finally:
+            request_context.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        context = request_context.get()
+        if context is not None:
+            context['view'] = view_name(request)
+        return None
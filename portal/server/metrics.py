@@ -0,0 +1,202 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+
+# constants
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+RESPONSE_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+METRICS_PATH = '/metrics'
+
+
+class Histogram:
+    """
+    Prometheus style cumulative histogram keyed by label values
+    - name
+    - help_text
+    - buckets (upper bounds, +Inf is implicit)
+    """
+
+    def __init__(self, name: str, help_text: str, buckets: tuple, label_names: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label_names = label_names
+        self._series = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            # [bucket counts..., +Inf count, sum]
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def expose(self) -> [str]:
+        lines = [
+            '# HELP {0} {1}'.format(self.name, self.help_text),
+            '# TYPE {0} histogram'.format(self.name)
+        ]
+        for labels, series in sorted(self._series.items()):
+            label_str = ','.join('{0}="{1}"'.format(k, _escape(v)) for k, v in zip(self.label_names, labels))
+            cumulative = 0
+            for upper, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                lines.append('{0}_bucket{{{1},le="{2}"}} {3}'.format(self.name, label_str, upper, cumulative))
+            lines.append('{0}_sum{{{1}}} {2}'.format(self.name, label_str, round(series[-1], 6)))
+            lines.append('{0}_count{{{1}}} {2}'.format(self.name, label_str, cumulative))
+        return lines
+
+
+class Counter:
+    """
+    Prometheus style counter keyed by label values
+    """
+
+    def __init__(self, name: str, help_text: str, label_names: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._series = {}
+
+    def inc(self, labels: tuple, value: int = 1):
+        self._series[labels] = self._series.get(labels, 0) + value
+
+    def expose(self) -> [str]:
+        lines = [
+            '# HELP {0} {1}'.format(self.name, self.help_text),
+            '# TYPE {0} counter'.format(self.name)
+        ]
+        for labels, value in sorted(self._series.items()):
+            label_str = ','.join('{0}="{1}"'.format(k, _escape(v)) for k, v in zip(self.label_names, labels))
+            lines.append('{0}{{{1}}} {2}'.format(self.name, label_str, value))
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """
+    In-process registry of the per endpoint request metrics
+    - one registry per worker process, scrape each worker (or aggregate upstream)
+    """
+    LABELS = ('view', 'action', 'method')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter(
+            'portal_requests_total', 'Requests handled', self.LABELS + ('status',))
+        self.duration = Histogram(
+            'portal_request_duration_seconds', 'Request wall time', DURATION_BUCKETS, self.LABELS)
+        self.db_queries = Histogram(
+            'portal_request_db_queries', 'Database queries per request', QUERY_COUNT_BUCKETS, self.LABELS)
+        self.db_duration = Histogram(
+            'portal_request_db_duration_seconds', 'Database time per request', DURATION_BUCKETS, self.LABELS)
+        self.response_size = Histogram(
+            'portal_response_size_bytes', 'Serialized response size', RESPONSE_SIZE_BUCKETS, self.LABELS)
+
+    def record(self, labels: tuple, status: int, duration: float, queries: int, query_seconds: float,
+               response_size: int = None):
+        with self._lock:
+            self.requests.inc(labels + ('{0}xx'.format(status // 100),))
+            self.duration.observe(labels, duration)
+            self.db_queries.observe(labels, queries)
+            self.db_duration.observe(labels, query_seconds)
+            if response_size is not None:
+                self.response_size.observe(labels, response_size)
+
+    def expose(self) -> str:
+        with self._lock:
+            lines = []
+            for metric in [self.requests, self.duration, self.db_queries, self.db_duration, self.response_size]:
+                lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class QueryStats:
+    """
+    DB execute wrapper counting the queries (and their time) issued by one request
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+def view_labels(request) -> tuple:
+    """
+    (view, action, method) of the resolved view
+    - DRF viewsets are keyed by class name and action (list, retrieve, export, ...)
+    """
+    view_func = getattr(request, '_metrics_view_func', None)
+    method = request.method
+    if view_func is None:
+        return 'unresolved', '', method
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if view_class is None:
+        return '{0}.{1}'.format(view_func.__module__, view_func.__name__), '', method
+    actions = getattr(view_func, 'actions', None) or {}
+    return view_class.__name__, actions.get(method.lower(), method.lower()), method
+
+
+class RequestMetricsMiddleware:
+    """
+    Record per view wall time, query count, query time and response size
+    - enabled by settings.METRICS_ENABLED
+    - placed below CompressionMiddleware: response sizes are serialized (uncompressed) sizes
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+
+    def __call__(self, request):
+        if not self.enabled or request.path == METRICS_PATH:
+            return self.get_response(request)
+        stats = QueryStats()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(stats))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        response_size = None if response.streaming else len(response.content)
+        registry.record(view_labels(request), response.status_code, duration, stats.queries, stats.seconds,
+                        response_size)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view_func = view_func
+        return None
+
+
+def metrics_view(request):
+    """
+    GET: Prometheus text format exposition of the request metrics
+    - requires `Authorization: Bearer <METRICS_TOKEN>`, not served (404) when settings.METRICS_TOKEN is not set
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        return HttpResponseNotFound()
+    if request.META.get('HTTP_AUTHORIZATION', '') != 'Bearer {0}'.format(token):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.expose(), content_type=METRICS_CONTENT_TYPE)
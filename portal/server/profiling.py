@@ -0,0 +1,236 @@
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+
+from portal.server.logs import view_name
+
+logger = logging.getLogger(__name__)
+
+# constants
+PROFILE_HEADER = 'HTTP_X_PORTAL_PROFILE'
+PROFILE_SIGNING_SALT = 'portal.server.profiling'
+PROFILE_SUFFIX = '.folded'
+PROFILE_LIST_LIMIT = 50
+SOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _frame_label(code, cache: dict) -> str:
+    label = cache.get(code)
+    if label is None:
+        filename = code.co_filename
+        if filename.startswith(SOURCE_ROOT):
+            filename = 'portal/' + os.path.relpath(filename, SOURCE_ROOT)
+        elif 'site-packages' + os.sep in filename:
+            filename = filename.split('site-packages' + os.sep, 1)[1]
+        label = cache[code] = '{0}:{1}'.format(filename, code.co_name).replace(';', ':').replace(' ', '_')
+    return label
+
+
+class StackSampler(threading.Thread):
+    """
+    Sample the stack of one thread every `interval` seconds into folded stacks
+    - folded stack: root;...;leaf -> sample count (flamegraph.pl / speedscope input)
+    - overhead is bounded by the interval, unlike cProfile which traces every call
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._done = threading.Event()
+        self._labels = {}
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code, self._labels))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def profile_token() -> str:
+    """
+    signed value for the X-Portal-Profile header (valid for PROFILING_TOKEN_MAX_AGE seconds)
+    """
+    return signing.TimestampSigner(salt=PROFILE_SIGNING_SALT).sign(uuid4().hex)
+
+
+def _valid_token(token: str) -> bool:
+    try:
+        signing.TimestampSigner(salt=PROFILE_SIGNING_SALT).unsign(
+            token, max_age=getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600))
+        return True
+    except signing.BadSignature:
+        return False
+
+
+def _profile_dir() -> str:
+    return str(getattr(settings, 'PROFILING_DIR', os.path.join(settings.BASE_DIR, 'profiles')))
+
+
+def save_profile(view: str, method: str, status: int, duration_ms: int, samples: int, stacks: Counter) -> str:
+    """
+    write the folded stacks to PROFILING_DIR, metadata is kept in the file name so that
+    listing never reads profile contents
+    - <duration_ms>__<captured>__<view>__<method>__<status>__<samples>__<id>.folded
+    - returns the profile id
+    """
+    profile_id = uuid4().hex[:12]
+    name = '__'.join([
+        '{0:09d}'.format(duration_ms),
+        datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S'),
+        (view or 'unresolved').replace('__', '_').replace(os.sep, '.'),
+        method,
+        str(status),
+        str(samples),
+        profile_id
+    ]) + PROFILE_SUFFIX
+    directory = _profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, name), 'w') as file:
+        for stack, count in stacks.most_common():
+            file.write('{0} {1}\n'.format(stack, count))
+    _prune(directory)
+    return profile_id
+
+
+def _prune(directory: str):
+    keep = getattr(settings, 'PROFILING_MAX_FILES', 500)
+    profiles = list_profiles(limit=None, order='captured')
+    for profile in profiles[keep:]:
+        try:
+            os.remove(os.path.join(directory, profile.get('filename')))
+        except OSError:
+            pass
+
+
+def list_profiles(limit: int = PROFILE_LIST_LIMIT, order: str = 'duration') -> [dict]:
+    """
+    captured profiles, slowest first (order='duration') or newest first (order='captured')
+    """
+    directory = _profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith(PROFILE_SUFFIX):
+                continue
+            parts = entry.name[:-len(PROFILE_SUFFIX)].split('__')
+            if len(parts) != 7:
+                continue
+            profiles.append({
+                'duration_ms': int(parts[0]),
+                'captured': datetime.strptime(parts[1], '%Y%m%dT%H%M%S').replace(tzinfo=timezone.utc),
+                'view': parts[2],
+                'method': parts[3],
+                'status': parts[4],
+                'samples': int(parts[5]),
+                'profile_id': parts[6],
+                'filename': entry.name
+            })
+    profiles.sort(key=lambda p: p.get('duration_ms' if order == 'duration' else 'captured'), reverse=True)
+    return profiles[:limit] if limit else profiles
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in sampling profiler for live requests
+    - PROFILING_ENABLED                      - bool, middleware is skipped entirely when False
+    - PROFILING_SAMPLE_RATE                  - float, fraction of requests profiled (0.0 - 1.0)
+    - PROFILING_INTERVAL_MS                  - float, stack sampling interval
+    - PROFILING_DIR / PROFILING_MAX_FILES    - storage of the folded stack files
+    - header `X-Portal-Profile: <profile_token()>` forces profiling of a request
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.interval = getattr(settings, 'PROFILING_INTERVAL_MS', 5) / 1000
+
+    def _should_profile(self, request) -> bool:
+        token = request.META.get(PROFILE_HEADER)
+        if token:
+            return _valid_token(token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self._should_profile(request):
+            return self.get_response(request)
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop()
+        duration_ms = int((time.perf_counter() - start) * 1000)
+        try:
+            response['X-Profile-Id'] = save_profile(
+                view_name(request), request.method, response.status_code, duration_ms, sampler.samples,
+                sampler.stacks)
+        except OSError as exc:
+            logger.warning('unable to save request profile: %s', exc)
+        return response
+
+
+@login_required
+def request_profiles(request):
+    """
+    Operator page: slowest captured request profiles and a profiling header token
+    """
+    if not request.user.is_operator():
+        return render(request, 'request_profiles.html', {
+            'user': request.user,
+            'message': 'PermissionDenied: unable to view request profiles'
+        }, status=403)
+    return render(request, 'request_profiles.html', {
+        'user': request.user,
+        'enabled': getattr(settings, 'PROFILING_ENABLED', False),
+        'profiles': list_profiles(),
+        'sample_rate': getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0),
+        'token': profile_token(),
+        'token_max_age': getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600)
+    })
+
+
+@login_required
+def request_profile_download(request, profile_id: str):
+    """
+    Operator download of one profile as folded stacks (flamegraph.pl / speedscope input)
+    """
+    if not request.user.is_operator():
+        raise Http404()
+    for profile in list_profiles(limit=None):
+        if profile.get('profile_id') == profile_id:
+            response = FileResponse(
+                open(os.path.join(_profile_dir(), profile.get('filename')), 'rb'), content_type='text/plain')
+            response['Content-Disposition'] = 'attachment; filename="{0}"'.format(profile.get('filename'))
+            return response
+    raise Http404()
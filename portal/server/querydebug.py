@@ -0,0 +1,175 @@
+import logging
+import os
+import re
+import time
+import traceback
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# constants
+IN_LIST_RE = re.compile(r'\bIN \((?:%s, )*%s\)')
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+SERVER_ROOT = os.path.dirname(os.path.abspath(__file__))
+SOURCE_ROOT = os.path.dirname(SERVER_ROOT)
+STACK_DEPTH = 6
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    raised when a request (or query_budget block) issues more queries than allowed
+    """
+    pass
+
+
+def fingerprint(sql: str) -> str:
+    """
+    normalize SQL so that queries differing only by parameters compare equal
+    - literals become ?, IN lists of any length collapse to IN (...)
+    """
+    return LITERAL_RE.sub('?', IN_LIST_RE.sub('IN (...)', sql))
+
+
+def call_site() -> [str]:
+    """
+    innermost portal app frames of the current stack (file:line function), middleware excluded
+    """
+    frames = [
+        f for f in traceback.extract_stack()[:-2]
+        if f.filename.startswith(SOURCE_ROOT) and not f.filename.startswith(SERVER_ROOT)
+    ]
+    return ['{0}:{1} {2}'.format(os.path.relpath(f.filename, SOURCE_ROOT), f.lineno, f.name)
+            for f in frames[-STACK_DEPTH:]]
+
+
+class QueryInspector:
+    """
+    DB execute wrapper that fingerprints every query of a request
+    - duplicate: same SQL and same parameters issued more than once
+    - n+1: same fingerprint with differing parameters issued `repeat_threshold` times or more
+    - the call site stack is captured once per fingerprint, on its first repeat
+    """
+
+    def __init__(self, budget: int = None, slow_ms: float = None, repeat_threshold: int = 3,
+                 raise_on_budget: bool = False):
+        self.budget = budget
+        self.slow_ms = slow_ms
+        self.repeat_threshold = repeat_threshold
+        self.raise_on_budget = raise_on_budget
+        self.count = 0
+        self.seconds = 0.0
+        # fingerprint -> [count, set of (sql, params), stack]
+        self.fingerprints = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        if self.budget is not None and self.count > self.budget and self.raise_on_budget:
+            raise QueryBudgetExceeded(
+                'query budget of {0} exceeded at: {1}'.format(self.budget, ' <- '.join(reversed(call_site()))))
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.seconds += elapsed
+            self._record(sql, params, elapsed)
+
+    def _record(self, sql: str, params, elapsed: float):
+        key = fingerprint(sql)
+        entry = self.fingerprints.get(key)
+        if entry is None:
+            entry = self.fingerprints[key] = [0, set(), None]
+        entry[0] += 1
+        try:
+            entry[1].add((sql, repr(params)))
+        except TypeError:
+            pass
+        if entry[0] == 2:
+            entry[2] = call_site()
+        if self.slow_ms is not None and elapsed * 1000 >= self.slow_ms:
+            logger.warning('slow query %.1fms: %s | %s',
+                           elapsed * 1000, sql[:1000], ' <- '.join(reversed(call_site())))
+
+    def problems(self) -> [dict]:
+        """
+        repeated fingerprints, most frequent first
+        """
+        found = []
+        for key, (count, distinct, stack) in self.fingerprints.items():
+            if count < 2:
+                continue
+            if len(distinct) < count:
+                kind = 'duplicate'
+            elif count >= self.repeat_threshold:
+                kind = 'n+1'
+            else:
+                continue
+            found.append({'kind': kind, 'count': count, 'fingerprint': key, 'stack': stack or []})
+        return sorted(found, key=lambda p: -p.get('count'))
+
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.count > self.budget
+
+    @contextmanager
+    def installed(self):
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self))
+            yield self
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    """
+    fail a block (e.g. a test client request) that issues more than max_queries queries
+
+        with query_budget(10):
+            client.get('/api/experiments')
+    """
+    inspector = QueryInspector(budget=max_queries, raise_on_budget=True)
+    with inspector.installed():
+        yield inspector
+
+
+class QueryDebugMiddleware:
+    """
+    Per request slow / duplicate / n+1 query detector (development and staging)
+    - QUERY_DEBUG_ENABLED                    - bool, middleware is skipped entirely when False
+    - QUERY_DEBUG_BUDGET                     - int, max queries per request (None = no budget)
+    - QUERY_DEBUG_RAISE                      - bool, raise QueryBudgetExceeded instead of logging
+    - QUERY_DEBUG_REPEAT_THRESHOLD           - int, repeats of one fingerprint reported as n+1
+    - QUERY_DEBUG_SLOW_MS                    - float, log queries slower than this
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_DEBUG_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.budget = getattr(settings, 'QUERY_DEBUG_BUDGET', None)
+        self.raise_on_budget = getattr(settings, 'QUERY_DEBUG_RAISE', False)
+        self.repeat_threshold = getattr(settings, 'QUERY_DEBUG_REPEAT_THRESHOLD', 3)
+        self.slow_ms = getattr(settings, 'QUERY_DEBUG_SLOW_MS', 100)
+
+    def __call__(self, request):
+        inspector = QueryInspector(
+            budget=self.budget,
+            slow_ms=self.slow_ms,
+            repeat_threshold=self.repeat_threshold,
+            raise_on_budget=self.raise_on_budget
+        )
+        with inspector.installed():
+            response = self.get_response(request)
+        for problem in inspector.problems():
+            logger.warning('%s query x%d on %s %s: %s | %s', problem.get('kind'), problem.get('count'),
+                           request.method, request.path, problem.get('fingerprint')[:1000],
+                           ' <- '.join(reversed(problem.get('stack'))))
+        if inspector.over_budget():
+            logger.error('query budget exceeded on %s %s: %d queries (budget %d)',
+                         request.method, request.path, inspector.count, inspector.budget)
+        response['X-Query-Count'] = str(inspector.count)
+        response['X-Query-Time-Ms'] = '{0:.1f}'.format(inspector.seconds * 1000)
+        return response
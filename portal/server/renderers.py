@@ -0,0 +1,77 @@
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - pure python fallback
+    orjson = None
+
+# constants
+# datetimes as isoformat() with Z for UTC, the same representation as the DRF encoder
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z if orjson else 0
+
+
+def fast_json_enabled() -> bool:
+    return orjson is not None and getattr(settings, 'FAST_JSON_ENABLED', True)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson, falls back to the DRF encoder when orjson is not installed
+    - output matches JSONRenderer: compact utf-8, types orjson does not know (decimals, lazy
+      strings, querysets, ...) are passed to the DRF encoder
+    - indented output (Accept: application/json; indent=4) uses the DRF encoder
+    """
+    _encoder = encoders.JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not fast_json_enabled() or not self.compact or not api_settings.UNICODE_JSON or \
+                self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        ret = orjson.dumps(data, default=self._encoder.default, option=ORJSON_OPTIONS)
+        # U+2028 / U+2029 are valid JSON but not valid javascript, escaped as in JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser decoding with orjson, falls back to the DRF parser when orjson is not installed
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if not fast_json_enabled():
+            return super().parse(stream, media_type, parser_context)
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            body = stream.read() if stream is not None else b''
+            if codecs.lookup(encoding).name != 'utf-8':
+                body = body.decode(encoding).encode('utf-8')
+            return orjson.loads(body)
+        except (ValueError, UnicodeError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    text/event-stream negotiation for server-sent event views (the view streams the events)
+    - data rendered through the renderer (errors) is sent as a single `error` event
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b'event: error\ndata: ' + FastJSONRenderer().render(data) + b'\n\n'
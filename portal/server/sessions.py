@@ -0,0 +1,92 @@
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends import cache as cache_backend, cached_db as cached_db_backend, \
+    db as db_backend
+from django.contrib.sessions.middleware import SessionMiddleware as DjangoSessionMiddleware
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# constants
+SESSION_CLEANUP_BATCH_SIZE = 1000
+SESSION_STORES = {
+    'cache': cache_backend.SessionStore,
+    'cached_db': cached_db_backend.SessionStore,
+    'db': db_backend.SessionStore
+}
+
+
+def _digest(store, data: dict) -> str:
+    return hashlib.sha256(store.serializer().dumps(data)).hexdigest()
+
+
+class CoalescingSessionMixin:
+    """
+    Session store that only writes when the session data changed
+    - `request.session[key] = value` marks the session modified even when the value is the same
+      (login hash, messages, oidc state), the write is skipped when the data equals what was loaded
+    - the expiry is extended on the writes only (as with SESSION_SAVE_EVERY_REQUEST = False)
+    """
+    _loaded_digest = None
+
+    def load(self):
+        data = super().load()
+        self._loaded_digest = _digest(self, data)
+        return data
+
+    def save(self, must_create=False):
+        if not must_create and self.session_key is not None and self._loaded_digest is not None and \
+                _digest(self, self._get_session(no_load=must_create)) == self._loaded_digest:
+            return
+        super().save(must_create=must_create)
+        self._loaded_digest = _digest(self, self._get_session(no_load=must_create))
+
+    @classmethod
+    def clear_expired(cls, batch_size: int = SESSION_CLEANUP_BATCH_SIZE, pause: float = 0.0) -> int:
+        """
+        delete expired database sessions in batches of primary keys (short statements, no long table lock)
+        - the cache backend expires its entries by itself
+        - returns the number of sessions deleted
+        """
+        if not issubclass(cls, db_backend.SessionStore):
+            return 0
+        model = cls.get_model_class()
+        deleted = 0
+        while True:
+            keys = list(model.objects.filter(expire_date__lt=timezone.now()).values_list(
+                'session_key', flat=True)[:batch_size])
+            if not keys:
+                return deleted
+            deleted += model.objects.filter(session_key__in=keys).delete()[0]
+            if pause:
+                time.sleep(pause)
+
+
+class SessionStore(CoalescingSessionMixin, SESSION_STORES[getattr(settings, 'SESSION_STORE', 'cached_db')]):
+    """
+    SESSION_ENGINE = 'portal.server.sessions', backend chosen with SESSION_STORE (cache, cached_db, db)
+    """
+    pass
+
+
+class SessionMiddleware(DjangoSessionMiddleware):
+    """
+    Django session middleware without sessions on the stateless API path
+    - requests authenticated with `Authorization: Bearer ...` get an empty session that is never loaded
+      or saved (no session read / write, no cookie, no CSRF: DRF only enforces it for session logins)
+    """
+
+    def process_request(self, request):
+        if request.META.get('HTTP_AUTHORIZATION', '').startswith('Bearer '):
+            request.session = self.SessionStore(None)
+            request.stateless_session = True
+            return
+        super().process_request(request)
+
+    def process_response(self, request, response):
+        if getattr(request, 'stateless_session', False):
+            return response
+        return super().process_response(request, response)
@@ -58,6 +58,11 @@ INSTALLED_APPS = [
     'portal.apps.projects',  # aerpaw projects
     'portal.apps.experiments',  # aerpaw experiments
     'portal.apps.operations',  # aerpaw operations
+    'portal.apps.analytics',  # testbed usage analytics
+    'portal.apps.changes',  # change feed
+    'portal.apps.audit',  # audit history
+    'portal.apps.tasks',  # background task queue
+    'portal.apps.notifications',  # notification digests
 ]
 
 # Add 'mozilla_django_oidc' authentication backend
@@ -67,8 +72,15 @@ AUTHENTICATION_BACKENDS = (
 )
 
 MIDDLEWARE = [
+    'portal.server.logs.RequestLogMiddleware',  # request id / user / view bound to log records
+    'portal.server.querydebug.QueryDebugMiddleware',  # slow / duplicate query detector (opt-in)
+    'portal.server.profiling.ProfilingMiddleware',  # sampling request profiler (opt-in)
+    'portal.server.compression.CompressionMiddleware',  # gzip / brotli api responses
+    'portal.server.metrics.RequestMetricsMiddleware',  # per endpoint request metrics (uncompressed sizes)
+    'portal.apps.audit.middleware.AuditMiddleware',  # audit history written once per request
+    'portal.server.db_routers.ReplicaMiddleware',  # read only api actions on read replicas
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'portal.server.sessions.SessionMiddleware',  # no session on bearer token api requests
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -83,8 +95,8 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'mozilla_django_oidc.contrib.drf.OIDCAuthentication',
+        'portal.apps.users.authentication.PortalJWTAuthentication',
+        'portal.apps.users.authentication.CachedOIDCAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -92,6 +104,16 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 5,
     # metadata settings
     'DEFAULT_METADATA_CLASS': 'portal.server.drf_settings.MinimalMetadata',
+    # orjson encoding / decoding (DRF json module when orjson is not installed)
+    'DEFAULT_RENDERER_CLASSES': [
+        'portal.server.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'portal.server.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 SIMPLE_JWT = {
@@ -124,8 +146,38 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
+
+    # tokens carry the user roles and token version (see portal.apps.users.authentication)
+    'TOKEN_OBTAIN_SERIALIZER': 'portal.apps.users.authentication.PortalTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'portal.apps.users.authentication.PortalTokenRefreshSerializer',
 }
 
+# Cache: shared Redis when REDIS_URL is set, otherwise per process local memory
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+    USER_TOKEN_VERSION_CACHE_SECONDS = 300
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    # per process cache: bounds how long a revoked token stays usable on other workers
+    USER_TOKEN_VERSION_CACHE_SECONDS = 30
+# Sessions: cached_db (default), cache (sessions only in the cache) or db, written only when they change
+SESSION_ENGINE = 'portal.server.sessions'
+SESSION_STORE = os.getenv('SESSION_STORE', 'cached_db')
+if SESSION_STORE in ('cache', 'cached_db') and not os.getenv('REDIS_URL'):
+    # per process cache: a logout / flush in one worker would leave the session cached in the others
+    SESSION_STORE = 'db'
+# /users/{pk}/dashboard cache (invalidated by signals, the timeout bounds bulk updates)
+USER_DASHBOARD_CACHE_SECONDS = 300
+
 ROOT_URLCONF = 'portal.server.urls'
 
 TEMPLATES = [
@@ -168,6 +220,24 @@ DATABASES = {
     }
 }
 
+# Read replicas: comma separated host[:port] of streaming replicas of the default database, read only
+# API actions are sent to them by portal.server.db_routers.ReplicaMiddleware
+DATABASE_REPLICAS = []
+for _index, _replica in enumerate(filter(None, os.getenv('POSTGRES_REPLICA_HOSTS', '').split(',')), start=1):
+    _host, _, _port = _replica.strip().partition(':')
+    DATABASES['replica{0}'.format(_index)] = dict(
+        DATABASES.get('default'), HOST=_host, PORT=_port or DATABASES.get('default').get('PORT'),
+        TEST={'MIRROR': 'default'}
+    )
+    DATABASE_REPLICAS.append('replica{0}'.format(_index))
+DATABASE_ROUTERS = ['portal.server.db_routers.ReplicaRouter']
+DATABASE_REPLICA_ACTIONS = ['export', 'list', 'retrieve', 'usage']
+# a client reads from the primary for this long after a write (pins are shared through the cache,
+# set REDIS_URL with more than one worker process), keep it above the max lag + lag check interval
+DATABASE_REPLICA_STICKY_SECONDS = int(os.getenv('DATABASE_REPLICA_STICKY_SECONDS', '15'))
+DATABASE_REPLICA_MAX_LAG_SECONDS = float(os.getenv('DATABASE_REPLICA_MAX_LAG_SECONDS', '5'))
+DATABASE_REPLICA_LAG_CHECK_SECONDS = 5
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -240,26 +310,128 @@ SESSION_COOKIE_SAMESITE = None
 # SessionRefresh expiry
 OIDC_RENEW_ID_TOKEN_EXPIRY_SECONDS = 3600
 
-OIDC_DRF_AUTH_BACKEND = 'mozilla_django_oidc.auth.OIDCAuthenticationBackend'
-
-# Default Django logging is WARNINGS+ to console
-# so visible via docker-compose logs django
+OIDC_DRF_AUTH_BACKEND = 'portal.apps.users.oidc_users.MyOIDCAB'
+# provider JWKS cache (keys are refetched early when an unknown key id is seen)
+OIDC_JWKS_CACHE_SECONDS = 3600
+# bearer token -> user cache of the DRF OIDC authentication (bounded by the token expiry)
+OIDC_TOKEN_CACHE_SECONDS = 300
+# minimum interval between last_login updates of API logins
+OIDC_LAST_LOGIN_INTERVAL = 300
+
+# Structured (JSON) logging: records are queued by the request thread and written to
+# stdout by a background listener, so visible via docker-compose logs django
+LOG_LEVEL = os.getenv('DJANGO_LOG_LEVEL', 'INFO').upper()
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'request_context': {
+            '()': 'portal.server.logs.RequestContextFilter',
+        },
+    },
+    'formatters': {
+        'json': {
+            '()': 'portal.server.logs.JsonFormatter',
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
+            'formatter': 'json',
         },
+        'queue': {
+            'class': 'portal.server.logs.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console'],
+            'filters': ['request_context'],
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': 'WARNING',
     },
     'loggers': {
+        'django': {
+            'handlers': ['queue'],
+            'level': 'INFO',
+            'propagate': False,
+        },
         'mozilla_django_oidc': {
-            'handlers': ['console'],
-            'level': 'DEBUG'
+            'level': 'DEBUG' if DEBUG else 'INFO',
+        },
+        'portal': {
+            'level': LOG_LEVEL,
         },
     },
 }
 
+# Request metrics exposed at /metrics in Prometheus text format
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').casefold() == 'true'
+# /metrics requires header `Authorization: Bearer <METRICS_TOKEN>`, it is not served (404) without a token
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', None)
+
+# Slow / duplicate / n+1 query detector (development and staging)
+QUERY_DEBUG_ENABLED = os.getenv('QUERY_DEBUG_ENABLED', 'false').casefold() == 'true'
+# max queries per request, None for no budget
+QUERY_DEBUG_BUDGET = int(os.getenv('QUERY_DEBUG_BUDGET')) if os.getenv('QUERY_DEBUG_BUDGET') else None
+# raise QueryBudgetExceeded (e.g. under tests) instead of logging an error
+QUERY_DEBUG_RAISE = os.getenv('QUERY_DEBUG_RAISE', 'false').casefold() == 'true'
+QUERY_DEBUG_REPEAT_THRESHOLD = 3
+QUERY_DEBUG_SLOW_MS = float(os.getenv('QUERY_DEBUG_SLOW_MS', '100'))
+
+# Sampling request profiler, profiles listed for operators at /request-profiles
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').casefold() == 'true'
+# fraction of requests profiled, requests with a signed X-Portal-Profile header are always profiled
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0.0'))
+PROFILING_INTERVAL_MS = 5
+PROFILING_TOKEN_MAX_AGE = 3600
+PROFILING_DIR = os.getenv('PROFILING_DIR') or os.path.join(BASE_DIR, 'profiling')
+PROFILING_MAX_FILES = 500
+
+# API response encoding: orjson renderer / parser and gzip / brotli compression
+FAST_JSON_ENABLED = os.getenv('FAST_JSON_ENABLED', 'true').casefold() == 'true'
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').casefold() == 'true'
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 4
+COMPRESSION_PATH_PREFIXES = ['/api/']
+
+# Change feed: events younger than this are held back (out of order commits)
+CHANGE_FEED_SETTLE_SECONDS = 1
+# Change stream (server-sent events): wake up through PostgreSQL LISTEN / NOTIFY, otherwise poll
+CHANGE_STREAM_HEARTBEAT_SECONDS = 15
+# open streams per process (each holds a worker thread under sync WSGI), above it the stream returns 503
+CHANGE_STREAM_MAX_CONNECTIONS = int(os.getenv('CHANGE_STREAM_MAX_CONNECTIONS', '10'))
+CHANGE_STREAM_MAX_SECONDS = 300
+CHANGE_STREAM_PG_NOTIFY = True
+CHANGE_STREAM_POLL_SECONDS = 5
+
+# Background tasks (python manage.py run_tasks), TASKS_EAGER runs them in process after the commit
+TASKS_EAGER = os.getenv('TASKS_EAGER', 'false').casefold() == 'true'
+# running tasks older than this are considered lost (worker died) and queued again
+TASKS_LOCK_SECONDS = 600
+TASKS_POLL_SECONDS = 2
+TASKS_RETENTION_DAYS = 7
+# max tasks running at once per queue across all workers (other queues use the 'default' limit)
+TASK_QUEUE_CONCURRENCY = {
+    'default': 4,
+    'notifications': 2,
+    'rollups': 1
+}
+
+# Notifications (membership and experiment state changes), one digest per user and window
+NOTIFICATION_BACKEND = os.getenv('NOTIFICATION_BACKEND', 'portal.apps.notifications.backends.ConsoleBackend')
+NOTIFICATION_DIGEST_SECONDS = int(os.getenv('NOTIFICATION_DIGEST_SECONDS', '900'))
+# FileBackend output (JSON lines)
+NOTIFICATION_FILE_PATH = os.getenv('NOTIFICATION_FILE_PATH') or os.path.join(BASE_DIR, 'notifications.jsonl')
+NOTIFICATION_RETENTION_DAYS = 30
+# EmailBackend (django.core.mail)
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'webmaster@localhost')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '25'))
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'false').casefold() == 'true'
+
 # Auth user model (custom user account)
 AUTH_USER_MODEL = 'users.AerpawUser'
 
@@ -0,0 +1,9 @@
+"""
+Test settings: python manage.py test --settings=portal.server.settings_test
+- replica1: second connection to the default test database (TEST MIRROR) for the read replica routing
+  tests, replica routing itself stays off unless a test enables it (DATABASE_REPLICAS)
+"""
+from portal.server.settings import *  # noqa: F401,F403
+
+if 'replica1' not in DATABASES:
+    DATABASES['replica1'] = dict(DATABASES.get('default'), TEST={'MIRROR': 'default'})
@@ -0,0 +1,146 @@
+from unittest import mock, skipUnless
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from portal.apps.profiles.models import AerpawUserProfile
+from portal.apps.projects.models import AerpawProject, UserProject
+from portal.apps.users.authentication import PortalAccessToken
+from portal.apps.users.models import AerpawRolesEnum, AerpawUser
+from portal.server.db_routers import ReplicaMonitor, read_alias
+
+# constants
+# mirror of the default test database, configured by portal.server.settings_test
+TEST_REPLICA = 'replica1'
+
+
+def _user(name: str, roles: list) -> AerpawUser:
+    profile = AerpawUserProfile.objects.create(created_by=name, modified_by=name, uuid=str(uuid4()))
+    user = AerpawUser.objects.create(
+        username=name, email=name, display_name=name, created_by=name, modified_by=name, profile=profile,
+        uuid=str(uuid4()))
+    user.groups.set(Group.objects.filter(name__in=roles))
+    return user
+
+
+@skipUnless(TEST_REPLICA in settings.DATABASES, 'run with --settings=portal.server.settings_test')
+@override_settings(DATABASE_REPLICAS=[TEST_REPLICA], DATABASE_REPLICA_LAG_CHECK_SECONDS=0)
+class ReplicaRoutingTestCase(TransactionTestCase):
+    """
+    read replica routing with a second local database alias mirroring the default (test) database
+    - TransactionTestCase: rows are committed and visible to the replica connection
+    """
+    databases = {DEFAULT_DB_ALIAS, TEST_REPLICA} if TEST_REPLICA in settings.DATABASES else {DEFAULT_DB_ALIAS}
+    fixtures = ['aerpaw_roles']
+
+    def setUp(self):
+        cache.clear()
+        self.operator = _user('operator@example.org', [AerpawRolesEnum.OPERATOR.value, AerpawRolesEnum.PI.value])
+        self.pi = _user('pi@example.org', [AerpawRolesEnum.PI.value, AerpawRolesEnum.EXPERIMENTER.value])
+        self.project = AerpawProject.objects.create(
+            name='Replica Project', description='replica routing project', project_creator=self.pi,
+            created_by=self.pi.username, modified_by=self.pi.username, uuid=str(uuid4()))
+        UserProject.objects.create(
+            project=self.project, user=self.pi, granted_by=self.pi, project_role=UserProject.RoleType.PROJECT_OWNER)
+
+    def client_for(self, user: AerpawUser) -> APIClient:
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(PortalAccessToken.for_user(user)))
+        return client
+
+    def assertReplicaRead(self, client: APIClient, path: str):
+        with CaptureQueriesContext(connections[TEST_REPLICA]) as replica_queries:
+            response = client.get(path)
+            # streamed exports are read while the content is consumed
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+        self.assertEqual(response.status_code, 200, content)
+        self.assertEqual(response.get('X-Database-Replica'), TEST_REPLICA)
+        self.assertTrue(replica_queries.captured_queries)
+        return content
+
+    def assertPrimaryRead(self, client: APIClient, path: str):
+        with CaptureQueriesContext(connections[TEST_REPLICA]) as replica_queries:
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.get('X-Database-Replica'))
+        self.assertFalse(replica_queries.captured_queries)
+
+    def test_read_actions_on_replica(self):
+        client = self.client_for(self.operator)
+        self.assertIn(b'Replica Project', self.assertReplicaRead(client, '/api/projects'))
+        self.assertIn(b'Replica Project', self.assertReplicaRead(client, '/api/projects/{0}'.format(self.project.pk)))
+        self.assertIn(b'Replica Project', self.assertReplicaRead(client, '/api/projects/export'))
+        self.assertReplicaRead(client, '/api/analytics/usage')
+
+    def test_writes_on_primary(self):
+        client = self.client_for(self.pi)
+        with CaptureQueriesContext(connections[TEST_REPLICA]) as replica_queries:
+            response = client.post('/api/projects', {'name': 'Written Project', 'description': 'written on the primary'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.get('X-Database-Replica'))
+        self.assertFalse(replica_queries.captured_queries)
+        # writes of a replica routed request still go to the primary
+        token = read_alias.set(TEST_REPLICA)
+        try:
+            self.assertEqual(router.db_for_read(AerpawProject), TEST_REPLICA)
+            self.assertEqual(router.db_for_write(AerpawProject), DEFAULT_DB_ALIAS)
+            # login sessions and permissions are always read from the primary
+            self.assertEqual(router.db_for_read(Group), DEFAULT_DB_ALIAS)
+        finally:
+            read_alias.reset(token)
+
+    def test_sticky_primary_after_write(self):
+        client = self.client_for(self.pi)
+        self.assertReplicaRead(client, '/api/projects')
+        response = client.patch('/api/projects/{0}'.format(self.project.pk), {'description': 'updated description'})
+        self.assertEqual(response.status_code, 200)
+        # the writing client reads its own changes from the primary
+        self.assertPrimaryRead(client, '/api/projects')
+        # other clients are not pinned
+        self.assertReplicaRead(self.client_for(self.operator), '/api/projects')
+        cache.clear()
+        self.assertReplicaRead(client, '/api/projects')
+
+    def test_lagging_replica_skipped(self):
+        with mock.patch.object(ReplicaMonitor, 'lag', return_value=60.0):
+            self.assertPrimaryRead(self.client_for(self.operator), '/api/projects')
+
+    def test_unavailable_replica_skipped(self):
+        with mock.patch.object(ReplicaMonitor, 'lag', side_effect=ConnectionError('replica down')):
+            self.assertPrimaryRead(self.client_for(self.operator), '/api/projects')
+
+
+class ReplicaMonitorTestCase(SimpleTestCase):
+    """
+    replica lag checks, without a database
+    """
+
+    def test_choose_skips_lagging_and_down_replicas(self):
+        lags = {'replica1': 1.0, 'replica2': 30.0, 'replica3': ConnectionError('replica down')}
+
+        def lag(alias):
+            if isinstance(lags[alias], Exception):
+                raise lags[alias]
+            return lags[alias]
+
+        monitor = ReplicaMonitor(list(lags), max_lag_seconds=5, check_seconds=60)
+        with mock.patch.object(monitor, 'lag', side_effect=lag), \
+                mock.patch('portal.server.db_routers.connections') as replica_connections:
+            self.assertEqual(monitor.choose(), 'replica1')
+            self.assertEqual(monitor.healthy, ['replica1'])
+            # the failed connection is closed and reopened by the next check
+            replica_connections.__getitem__.assert_called_once_with('replica3')
+            # no new check within check_seconds
+            lags['replica1'] = 30.0
+            self.assertEqual(monitor.choose(), 'replica1')
+            monitor.checked -= 60
+            self.assertIsNone(monitor.choose())
+            lags.update(replica2=0.0, replica3=0.0)
+            monitor.checked -= 60
+            self.assertIn(monitor.choose(), ['replica2', 'replica3'])
@@ -20,18 +20,26 @@ from django.views.generic.base import TemplateView
 from rest_framework import routers
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
 
+from portal.apps.analytics.api.viewsets import UsageViewSet
+from portal.apps.audit.api.viewsets import AuditViewSet
+from portal.apps.changes.api.viewsets import ChangeViewSet
 from portal.apps.experiments.api.viewsets import CanonicalExperimentResourceViewSet, ExperimentSessionViewSet, \
     ExperimentViewSet, UserExperimentViewSet
 from portal.apps.operations.api.viewsets import CanonicalNumberViewSet
 from portal.apps.projects.api.viewsets import ProjectViewSet, UserProjectViewSet
 from portal.apps.resources.api.viewsets import ResourceViewSet
 from portal.apps.users.api.viewsets import UserViewSet
+from portal.server.metrics import metrics_view
+from portal.server.profiling import request_profile_download, request_profiles
 
 # Routers provide an easy way of automatically determining the URL conf.
 # Ordering is important for overloaded API slugs with differing ViewSet definitions
 router = routers.DefaultRouter(trailing_slash=False)
+router.register(r'analytics', UsageViewSet, basename='analytics')
+router.register(r'audit', AuditViewSet, basename='audit')
 router.register(r'canonical-experiment-resource', CanonicalExperimentResourceViewSet,
                 basename='canonical-experiment-resource')
+router.register(r'changes', ChangeViewSet, basename='changes')
 router.register(r'experiments', ExperimentViewSet, basename='experiments')
 router.register(r'p-canonical-experiment-number', CanonicalNumberViewSet, basename='canonical-experiment-number')
 router.register(r'projects', ProjectViewSet, basename='projects')
@@ -52,6 +60,9 @@ urlpatterns = [
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
     path('auth/', include('django.contrib.auth.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('request-profiles', request_profiles, name='request_profiles'),
+    path('request-profiles/<str:profile_id>', request_profile_download, name='request_profile_download'),
     path('oidc/', include('mozilla_django_oidc.urls')),
     path('experiments/', include('portal.apps.experiments.urls')),  # experiments app
     path('profile/', include('portal.apps.profiles.urls')),  # profiles app
@@ -8,6 +8,11 @@ APPS_LIST=(
     "projects"
     "experiments"
     "operations"
+    "analytics"
+    "changes"
+    "audit"
+    "tasks"
+    "notifications"
 )
 
 FIXTURES_LIST=(
@@ -22,12 +27,17 @@ done
 python manage.py makemigrations
 python manage.py showmigrations
 python manage.py migrate
+# monthly partitions of the experiment session table (PostgreSQL)
+python manage.py partition_sessions
 
 for fixture in "${FIXTURES_LIST[@]}";do
     python manage.py loaddata $fixture
 done
 python manage.py collectstatic --noinput
 
+# background task worker
+python manage.py run_tasks &
+
 # development server
 python manage.py runserver
 
@@ -0,0 +1,95 @@
+"""
+JSON renderer / parser and response compression benchmark on export size payloads
+
+    python scripts/benchmark/json_renderers.py --rows 10000 --repeat 5
+
+- rows are shaped like the /experiments/export rows (ints, strings, datetimes, nested id lists)
+- reports the best of --repeat runs per renderer / parser and the size / time of each encoding
+"""
+import argparse
+import gzip
+import io
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portal.server.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from portal.server import compression  # noqa: E402
+from portal.server.renderers import FastJSONParser, FastJSONRenderer, fast_json_enabled  # noqa: E402
+
+
+def export_rows(count: int) -> list:
+    start = datetime(2022, 6, 1, tzinfo=timezone.utc)
+    return [
+        {
+            'created': start + timedelta(minutes=i, microseconds=i),
+            'description': 'synthetic experiment {0} for the renderer benchmark'.format(i),
+            'experiment_creator': i % 250 + 1,
+            'experiment_id': i + 1,
+            'experiment_members': [i % 250 + 1, (i + 7) % 250 + 1, (i + 13) % 250 + 1],
+            'experiment_state': ['saved', 'active_development', 'wait_sandbox_deploy'][i % 3],
+            'is_canonical': i % 2 == 0,
+            'is_retired': False,
+            'modified': start + timedelta(hours=i),
+            'name': 'experiment-{0:05d}'.format(i),
+            'project_id': i % 40 + 1,
+            'resources': list(range(i % 10, i % 10 + 5))
+        } for i in range(count)
+    ]
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = export_rows(args.rows)
+    payload = JSONRenderer().render(rows)
+    print('rows: {0}, payload: {1:,} bytes, orjson: {2}'.format(args.rows, len(payload), fast_json_enabled()))
+    if FastJSONRenderer().render(rows) != payload:
+        print('WARNING: FastJSONRenderer output differs from JSONRenderer')
+
+    print('\nrender')
+    for renderer in (JSONRenderer(), FastJSONRenderer()):
+        seconds = best_of(args.repeat, lambda: renderer.render(rows))
+        print('  {0:<20} {1:8.1f} ms'.format(type(renderer).__name__, seconds * 1000))
+    print('\nparse')
+    for json_parser in (JSONParser(), FastJSONParser()):
+        seconds = best_of(args.repeat, lambda: json_parser.parse(io.BytesIO(payload), parser_context={}))
+        print('  {0:<20} {1:8.1f} ms'.format(type(json_parser).__name__, seconds * 1000))
+
+    print('\ncompression')
+    encoders = [('gzip-{0}'.format(level), lambda level=level: gzip.compress(payload, compresslevel=level, mtime=0))
+                for level in (1, 6)]
+    if compression.brotli is not None:
+        encoders += [('br-{0}'.format(quality), lambda quality=quality: compression.brotli.compress(
+            payload, quality=quality)) for quality in (1, 4)]
+    for name, encode in encoders:
+        size = len(encode())
+        seconds = best_of(args.repeat, encode)
+        print('  {0:<20} {1:8.1f} ms {2:>12,} bytes ({3:.1%})'.format(
+            name, seconds * 1000, size, size / len(payload)))
+
+
+if __name__ == '__main__':
+    main()
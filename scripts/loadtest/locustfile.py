@@ -0,0 +1,137 @@
+"""
+Portal load test scenarios (https://locust.io, not a portal requirement: pip install locust)
+
+    python manage.py generate_synthetic_data --tokens-file scripts/loadtest/tokens.json
+    locust -f scripts/loadtest/locustfile.py --host http://127.0.0.1:8000 \
+        --headless -u 50 -r 5 -t 5m --csv loadtest
+
+- LOADTEST_TOKENS   - tokens file written by generate_synthetic_data (default: tokens.json next to this file)
+- LOADTEST_REPORT   - latency percentile summary written on exit (default: loadtest-report.json)
+"""
+import json
+import os
+import random
+
+from locust import HttpUser, between, events, task
+
+# constants
+PERCENTILES = [0.5, 0.75, 0.9, 0.95, 0.99]
+TOKENS_FILE = os.getenv('LOADTEST_TOKENS', os.path.join(os.path.dirname(__file__), 'tokens.json'))
+REPORT_FILE = os.getenv('LOADTEST_REPORT', 'loadtest-report.json')
+
+with open(TOKENS_FILE, 'r') as file:
+    TOKENS = json.load(file)
+
+
+class PortalUser(HttpUser):
+    """
+    Experimenter browsing the API: list / detail / membership / resources flows
+    """
+    wait_time = between(0.5, 2.0)
+
+    def on_start(self):
+        token = random.choice(TOKENS)
+        self.client.headers.update({
+            'Authorization': 'Bearer {0}'.format(token.get('access_token')),
+            'Accept': 'application/json'
+        })
+        self.experiment_ids = []
+        self.project_ids = []
+        self.resource_ids = []
+
+    def _collect(self, response, key: str, ids: list):
+        if response.ok:
+            ids[:] = [r.get(key) for r in response.json().get('results', [])] or ids
+
+    # list flows
+
+    @task(6)
+    def experiment_list(self):
+        page = random.randint(1, 3)
+        with self.client.get('/api/experiments?page={0}'.format(page), name='/api/experiments?page',
+                             catch_response=True) as response:
+            if response.status_code == 404:
+                response.success()
+            self._collect(response, 'experiment_id', self.experiment_ids)
+
+    @task(2)
+    def experiment_search(self):
+        self.client.get('/api/experiments?search={0}'.format(random.choice(['radio', 'drone', 'mesh', 'link'])),
+                        name='/api/experiments?search')
+
+    @task(4)
+    def project_list(self):
+        response = self.client.get('/api/projects', name='/api/projects')
+        self._collect(response, 'project_id', self.project_ids)
+
+    @task(3)
+    def resource_list(self):
+        response = self.client.get('/api/resources', name='/api/resources')
+        self._collect(response, 'resource_id', self.resource_ids)
+
+    @task(1)
+    def session_list(self):
+        self.client.get('/api/sessions', name='/api/sessions')
+
+    # detail flows
+
+    @task(6)
+    def experiment_detail(self):
+        if self.experiment_ids:
+            self.client.get('/api/experiments/{0}'.format(random.choice(self.experiment_ids)),
+                            name='/api/experiments/[id]')
+
+    @task(3)
+    def experiment_membership(self):
+        if self.experiment_ids:
+            self.client.get('/api/experiments/{0}/membership'.format(random.choice(self.experiment_ids)),
+                            name='/api/experiments/[id]/membership')
+
+    @task(3)
+    def experiment_resources(self):
+        if self.experiment_ids:
+            self.client.get('/api/experiments/{0}/resources'.format(random.choice(self.experiment_ids)),
+                            name='/api/experiments/[id]/resources')
+
+    @task(4)
+    def project_detail(self):
+        if self.project_ids:
+            self.client.get('/api/projects/{0}'.format(random.choice(self.project_ids)),
+                            name='/api/projects/[id]')
+
+    @task(2)
+    def project_membership(self):
+        if self.project_ids:
+            self.client.get('/api/projects/{0}/membership'.format(random.choice(self.project_ids)),
+                            name='/api/projects/[id]/membership')
+
+    @task(2)
+    def project_experiments(self):
+        if self.project_ids:
+            self.client.get('/api/projects/{0}/experiments'.format(random.choice(self.project_ids)),
+                            name='/api/projects/[id]/experiments')
+
+    @task(2)
+    def resource_detail(self):
+        if self.resource_ids:
+            self.client.get('/api/resources/{0}'.format(random.choice(self.resource_ids)),
+                            name='/api/resources/[id]')
+
+
+@events.quitting.add_listener
+def write_report(environment, **kwargs):
+    """
+    latency percentiles (ms) per endpoint name, plus request / failure counts
+    """
+    report = {}
+    for (name, method), entry in sorted(environment.stats.entries.items()):
+        report['{0} {1}'.format(method, name)] = {
+            'requests': entry.num_requests,
+            'failures': entry.num_failures,
+            'rps': round(entry.total_rps, 2),
+            'percentiles_ms': {
+                'p{0}'.format(int(p * 100)): entry.get_response_time_percentile(p) for p in PERCENTILES
+            }
+        }
+    with open(REPORT_FILE, 'w') as file:
+        json.dump(report, file, indent=2)